@@ -0,0 +1,252 @@
+"""
+A load test of the storefront, add to cart and cart page views under three deployments:
+
+    - wsgi       : the sync views served by `WSGIHandler` from a pool of `WSGI_THREADS` threads,
+                   like a threaded WSGI server (e.g. gunicorn with `--threads`).
+    - asgi-sync  : the sync views served by `ASGIHandler`, each request is run in a thread
+                   through `sync_to_async`.
+    - asgi-async : the async views (`ASYNC_VIEWS = True`) served by `ASGIHandler` on the event loop.
+
+Every client loads the storefront once and then repeatedly adds a product to its cart, views
+its cart and views the storefront again, with its own session and CSRF cookies. The requests
+are made straight to the django handlers (no sockets), so only the cost of the handlers and
+the views is measured.
+
+Usage:
+    python -m benchmarks.bench_async_views [number of clients]
+"""
+import asyncio
+import json
+import re
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from importlib import reload
+from io import BytesIO
+from statistics import quantiles
+from threading import Event, Thread, active_count
+from time import perf_counter
+
+from benchmarks.utils import (create_benchmark_database,
+                              create_products,
+                              destroy_benchmark_database,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+from product.models import Product
+
+
+DEFAULT_NUM_OF_CLIENTS = 300
+NUM_OF_CYCLES          = 5
+NUM_OF_PRODUCTS        = 200
+WSGI_THREADS           = 32
+
+CSRF_TOKEN_PATTERN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def use_async_views(is_async: bool) -> None:
+    """Routes the sync or the async views by reloading the url configuration with `ASYNC_VIEWS` set."""
+    import cart.urls
+    import cart_backend.urls
+    import store.urls
+
+    with override_settings(ASYNC_VIEWS=is_async):
+        for module in (store.urls, cart.urls, cart_backend.urls):
+            reload(module)
+    clear_url_caches()
+
+
+class BenchmarkClient:
+    """A client with its own cookies that records the latency of every request it makes."""
+
+    def __init__(self, product_id: int):
+        self.product_id = product_id
+        self.cookies    = SimpleCookie()
+        self.token      = ""
+        self.latencies  = []
+        self.failures   = 0
+
+    def get_requests(self):
+        """Yields the `(method, path, body)` of every request made by the client."""
+        yield "GET", "/", b""
+
+        for _ in range(NUM_OF_CYCLES):
+            yield "POST", "/store/basket/add/", json.dumps({"productID": self.product_id}).encode()
+            yield "GET", "/cart/", b""
+            yield "GET", "/", b""
+
+    def get_headers(self, body: bytes) -> dict:
+        headers = {"COOKIE": "; ".join(f"{name}={morsel.value}" for name, morsel in self.cookies.items())}
+
+        if body:
+            headers.update({"X_CSRFTOKEN": self.token, "CONTENT_TYPE": "application/json"})
+        return headers
+
+    def record(self, status: int, set_cookies: list, content: bytes, elapsed: float) -> None:
+        self.latencies.append(elapsed)
+
+        if status != 200:
+            self.failures += 1
+
+        for cookie in set_cookies:
+            self.cookies.load(cookie)
+
+        if not self.token and (match := CSRF_TOKEN_PATTERN.search(content.decode())):
+            self.token = match.group(1)
+
+
+def run_wsgi(clients: list) -> None:
+    """Runs every client against `WSGIHandler` in a pool of `WSGI_THREADS` threads."""
+    handler = WSGIHandler()
+
+    def send(client, method, path, body):
+        environ = {"REQUEST_METHOD": method,
+                   "PATH_INFO": path,
+                   "QUERY_STRING": "",
+                   "SERVER_NAME": "testserver",
+                   "SERVER_PORT": "80",
+                   "SERVER_PROTOCOL": "HTTP/1.1",
+                   "CONTENT_LENGTH": str(len(body)),
+                   "wsgi.input": BytesIO(body),
+                   "wsgi.url_scheme": "http",
+                   }
+        for name, value in client.get_headers(body).items():
+            environ[name if name == "CONTENT_TYPE" else f"HTTP_{name}"] = value
+
+        started = {}
+
+        def start_response(status, headers):
+            started["status"]  = int(status.split()[0])
+            started["cookies"] = [value for name, value in headers if name == "Set-Cookie"]
+
+        start   = perf_counter()
+        content = b"".join(handler(environ, start_response))
+        client.record(started["status"], started["cookies"], content, perf_counter() - start)
+
+    def run_client(client):
+        try:
+            for request in client.get_requests():
+                send(client, *request)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=WSGI_THREADS) as executor:
+        list(executor.map(run_client, clients))
+
+
+async def run_asgi(clients: list) -> None:
+    """Runs every client concurrently against `ASGIHandler`."""
+    handler = ASGIHandler()
+
+    async def send(client, method, path, body):
+        headers  = [(b"host", b"testserver")]
+        headers += [(name.lower().replace("_", "-").encode(), value.encode()) for name, value in client.get_headers(body).items()]
+        scope    = {"type": "http",
+                    "asgi": {"version": "3.0"},
+                    "http_version": "1.1",
+                    "method": method,
+                    "scheme": "http",
+                    "path": path,
+                    "raw_path": path.encode(),
+                    "query_string": b"",
+                    "headers": headers,
+                    "client": ("127.0.0.1", 50000),
+                    "server": ("testserver", 80),
+                    }
+        messages     = [{"type": "http.request", "body": body, "more_body": False}]
+        disconnected = asyncio.Event()
+        response     = {"content": b""}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # The handler listens for a disconnect while the view runs, the client never disconnects
+            await disconnected.wait()
+
+        async def send_message(message):
+            if message["type"] == "http.response.start":
+                response["status"]  = message["status"]
+                response["cookies"] = [value.decode() for name, value in message["headers"] if name.lower() == b"set-cookie"]
+            else:
+                response["content"] += message.get("body", b"")
+
+        start = perf_counter()
+        await handler(scope, receive, send_message)
+        client.record(response["status"], response["cookies"], response["content"], perf_counter() - start)
+
+    async def run_client(client):
+        for request in client.get_requests():
+            await send(client, *request)
+
+    await asyncio.gather(*(run_client(client) for client in clients))
+
+
+def measure(mode: str, product_ids: list, num_of_clients: int) -> dict:
+    """Runs the clients in the given mode and returns the throughput, latencies and peak thread count."""
+    use_async_views(mode == "asgi-async")
+
+    clients     = [BenchmarkClient(product_ids[index % len(product_ids)]) for index in range(num_of_clients)]
+    peak        = {"threads": active_count()}
+    is_finished = Event()
+
+    def sample_threads():
+        while not is_finished.wait(0.01):
+            peak["threads"] = max(peak["threads"], active_count())
+
+    sampler = Thread(target=sample_threads, daemon=True)
+    sampler.start()
+
+    start = perf_counter()
+    if mode == "wsgi":
+        run_wsgi(clients)
+    else:
+        asyncio.run(run_asgi(clients))
+    elapsed = perf_counter() - start
+
+    is_finished.set()
+    sampler.join()
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    cuts      = quantiles(latencies, n=100)
+
+    return {"rps": len(latencies) / elapsed,
+            "p50": cuts[49] * 1000,
+            "p99": cuts[98] * 1000,
+            "failures": sum(client.failures for client in clients),
+            "threads": peak["threads"] - 1,  # the sampler itself
+            }
+
+
+def main():
+    num_of_clients = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_OF_CLIENTS
+    old_name       = create_benchmark_database(on_disk=True)
+
+    try:
+        create_products(NUM_OF_PRODUCTS)
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        rows        = []
+
+        for mode in ("wsgi", "asgi-sync", "asgi-async"):
+            result = measure(mode, product_ids, num_of_clients)
+            rows.append((f"{mode} (requests/sec)", f"{result['rps']:.1f}"))
+            rows.append((f"{mode} (p50 / p99 ms)", f"{result['p50']:.1f} / {result['p99']:.1f}"))
+            rows.append((f"{mode} (peak threads, failures)", f"{result['threads']}, {result['failures']}"))
+
+        print_results(f"{num_of_clients} concurrent clients x {1 + NUM_OF_CYCLES * 3} requests", rows)
+    finally:
+        use_async_views(False)
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
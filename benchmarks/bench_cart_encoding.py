@@ -0,0 +1,78 @@
+"""
+Measures the session blob size and the serialization time of a cart stored in the legacy
+(wide dictionary) layout against the compact encoding, for carts of 1, 50 and 500 lines.
+
+Usage:
+    python -m benchmarks.bench_cart_encoding
+"""
+import json
+
+from time import perf_counter
+
+from benchmarks.utils import print_results, setup_django
+
+setup_django()
+
+from django.contrib.sessions.backends.db import SessionStore
+
+from product.cart_encoding import encode_cart
+
+
+CART_SIZES     = (1, 50, 500)
+NUM_OF_ENCODES = 200
+DESCRIPTION    = ("Step out in style with these classic white trainers, designed for both comfort and versatility. "
+                  "Featuring a sleek, minimalist design, they pair effortlessly with any outfit.")
+
+
+def create_legacy_cart(num_of_lines: int) -> dict:
+    """Creates a cart stored in the legacy layout, where each line is the full product dictionary."""
+    return {str(id): {"id": str(id),
+                      "product_name": f"PureStride White Trainers {id}",
+                      "price": "100.00",
+                      "description": DESCRIPTION,
+                      "current_stock": 50,
+                      "img": f"/media/product/p{id}.jpg",
+                      "in_stock": True,
+                      "qty": 1,
+                      } for id in range(1, num_of_lines + 1)}
+
+
+def create_compact_cart(num_of_lines: int) -> dict:
+    """Creates the same cart in the compact encoding."""
+    return encode_cart({str(id): [1, "100.00"] for id in range(1, num_of_lines + 1)})
+
+
+def measure(cart: dict) -> tuple:
+    """
+    Returns the size (in bytes) of the cart as plain JSON, the size of the encoded (signed and
+    compressed) session blob and the average time (in µs) to encode the session.
+    """
+    store = SessionStore()
+    blob  = store.encode({"cart": cart})
+
+    start = perf_counter()
+    for _ in range(NUM_OF_ENCODES):
+        store.encode({"cart": cart})
+    elapsed = (perf_counter() - start) / NUM_OF_ENCODES
+
+    return len(json.dumps(cart, separators=(",", ":"))), len(blob), elapsed * 1_000_000
+
+
+def main():
+    for num_of_lines in CART_SIZES:
+        legacy_json,  legacy_size,  legacy_time  = measure(create_legacy_cart(num_of_lines))
+        compact_json, compact_size, compact_time = measure(create_compact_cart(num_of_lines))
+
+        print_results(f"Cart with {num_of_lines} line(s)", [
+            ("legacy JSON size (bytes)", legacy_json),
+            ("compact JSON size (bytes)", compact_json),
+            ("legacy blob size (bytes)", legacy_size),
+            ("compact blob size (bytes)", compact_size),
+            ("size reduction", f"{legacy_size / compact_size:.1f}x"),
+            ("legacy serialization (µs)", f"{legacy_time:.1f}"),
+            ("compact serialization (µs)", f"{compact_time:.1f}"),
+        ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+A load benchmark of concurrent `add_to_basket` calls for each cart storage backend
+(session, cached_db, locmem and redis, the latter served by an in-process fake Redis server).
+
+Usage:
+    python -m benchmarks.bench_cart_storage
+"""
+import json
+import re
+
+from benchmarks.fake_redis import FakeRedisServer
+from benchmarks.utils import (create_benchmark_database,
+                              create_products,
+                              destroy_benchmark_database,
+                              measure_concurrent_rate,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from product.models import Product
+
+
+NUM_OF_PRODUCTS = 50
+NUM_OF_CLIENTS  = 8
+NUM_OF_ADDS     = 50
+
+LOCMEM_CACHE = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark-carts"}
+DB_SESSIONS  = "utils.sessions.db"
+
+
+def get_backend_settings(redis_url: str) -> dict:
+    """Returns the settings to override for each of the cart storage backends."""
+    default_cache = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmark-default"}
+    return {
+        "session": {"SESSION_ENGINE": DB_SESSIONS,
+                    "CACHES": {"default": default_cache, "carts": LOCMEM_CACHE}},
+        "cached_db": {"SESSION_ENGINE": "utils.sessions.cached_db",
+                      "CACHES": {"default": default_cache, "carts": LOCMEM_CACHE}},
+        "locmem": {"SESSION_ENGINE": DB_SESSIONS,
+                   "CACHES": {"default": default_cache, "carts": LOCMEM_CACHE}},
+        "redis": {"SESSION_ENGINE": DB_SESSIONS,
+                  "CACHES": {"default": default_cache,
+                             "carts": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": redis_url}}},
+    }
+
+
+def run_clients(product_ids: list) -> tuple:
+    """Runs concurrent clients that each add products to their cart, returns the rate and the failures."""
+    failures = []
+
+    def add_products(index):
+        try:
+            send_requests(index)
+        except Exception as error:
+            failures.append(error)
+
+    def send_requests(index):
+        client = Client()
+        page   = client.get(reverse("storefront")).content.decode()
+        token  = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+
+        for call in range(NUM_OF_ADDS):
+            product_id = product_ids[(index + call) % len(product_ids)]
+            response   = client.post(reverse("add_to_basket"),
+                                     data=json.dumps({"productID": product_id}),
+                                     content_type="application/json",
+                                     HTTP_X_CSRFTOKEN=token,
+                                     )
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+    rate = measure_concurrent_rate(add_products, NUM_OF_CLIENTS, NUM_OF_ADDS)
+    return rate, failures
+
+
+def main():
+    old_name = create_benchmark_database(on_disk=True)
+    server   = FakeRedisServer.start()
+
+    try:
+        create_products(NUM_OF_PRODUCTS)
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        results     = []
+
+        for backend, overrides in get_backend_settings(server.url).items():
+            with override_settings(CART_STORAGE_BACKEND=backend, **overrides):
+                rate, failures = run_clients(product_ids)
+            results.append((f"{backend} (adds/sec, failures)", f"{rate:.1f}, {len(failures)}"))
+
+        print_results(f"{NUM_OF_CLIENTS} concurrent clients x {NUM_OF_ADDS} add_to_basket calls", results)
+    finally:
+        server.stop()
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Imports a generated JSON Lines catalog feed with `product.catalog_import` and reports the
+rows imported per second and how the memory of the process grows as the import goes on.
+
+The peak resident memory should level off after the first few batches however many rows the
+feed has. Pass the number of rows as an argument to try a bigger feed (e.g. 1000000).
+
+Usage:
+    python -m benchmarks.bench_catalog_import [num_of_rows]
+"""
+import json
+import os
+import resource
+import sys
+
+from tempfile import NamedTemporaryFile
+
+from benchmarks.utils import (create_benchmark_database,
+                              destroy_benchmark_database,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from product.catalog_import import import_catalog
+from product.models import Product
+
+
+DEFAULT_NUM_OF_ROWS = 200_000
+BATCH_SIZE          = 1000
+
+
+def write_feed(num_of_rows: int) -> str:
+    """Writes a feed of generated products to a temporary file and returns its path."""
+    with NamedTemporaryFile("w", suffix=".jsonl", delete=False) as file:
+        for index in range(num_of_rows):
+            file.write(json.dumps({"sku": f"BENCH-{index:08d}",
+                                   "name": f"Benchmark product {index}",
+                                   "description": f"A product used to benchmark the catalog import, number {index}.",
+                                   "price": f"{10 + index % 90}.99",
+                                   "quantity": index % 500,
+                                   "image": f"p{index % 8 + 1}.jpg",
+                                   }) + "\n")
+    return file.name
+
+
+def get_peak_memory_in_mb() -> float:
+    """Returns the peak resident memory of the process so far (Linux reports it in KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    num_of_rows = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_OF_ROWS
+    old_name    = create_benchmark_database(on_disk=True)
+    path        = write_feed(num_of_rows)
+    memory      = {}
+
+    def record_memory(report):
+        memory.setdefault("after_first_batch", get_peak_memory_in_mb())
+
+    try:
+        report = import_catalog(path, batch_size=BATCH_SIZE, on_progress=record_memory)
+
+        print_results(f"Importing a feed of {num_of_rows} rows", [
+            ("rows imported", report.num_of_imported),
+            ("products in the database", Product.objects.count()),
+            ("rows/sec", f"{report.rows_per_second:.0f}"),
+            ("peak memory after the first batch (MB)", f"{memory['after_first_batch']:.1f}"),
+            ("peak memory at the end (MB)", f"{get_peak_memory_in_mb():.1f}"),
+        ])
+    finally:
+        os.remove(path)
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
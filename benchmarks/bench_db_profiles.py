@@ -0,0 +1,107 @@
+"""
+A concurrency benchmark of `add_to_basket` under the configured database profile.
+
+Every client loads the storefront and then adds products to its cart over and over, every
+add writes the session (the cart is stored in the database backed session), so the sessions
+table is hammered by concurrent writers. The requests are served by `WSGIHandler` from a pool
+of threads, with the connection handling of a real server (connections are closed, or kept
+for `CONN_MAX_AGE`, at the end of each request).
+
+With the SQLite profile it is compared against SQLite as it was configured before the
+database profiles (no PRAGMAs, deferred transactions and a new connection per request).
+
+Usage:
+    python -m benchmarks.bench_db_profiles
+    DATABASE_PROFILE=postgres python -m benchmarks.bench_db_profiles
+"""
+import json
+import logging
+
+from benchmarks.bench_async_views import BenchmarkClient, run_wsgi
+from benchmarks.utils import (create_benchmark_database,
+                              create_products,
+                              destroy_benchmark_database,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import override_settings
+
+from product.models import Product
+
+
+NUM_OF_CLIENTS  = 64
+NUM_OF_ADDS     = 25
+NUM_OF_PRODUCTS = 50
+
+# SQLite as it was configured before the database profiles
+UNTUNED_SQLITE = {"OPTIONS": {}, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}
+
+
+class AddToBasketClient(BenchmarkClient):
+    """A client that only adds products to its cart once it has loaded the storefront."""
+
+    def get_requests(self):
+        yield "GET", "/", b""
+
+        for _ in range(NUM_OF_ADDS):
+            yield "POST", "/store/basket/add/", json.dumps({"productID": self.product_id}).encode()
+
+
+def measure(product_ids: list) -> tuple:
+    """Runs the clients and returns the adds per second and the number of failed requests."""
+    clients = [AddToBasketClient(product_ids[index % len(product_ids)]) for index in range(NUM_OF_CLIENTS)]
+
+    start = perf_counter()
+    run_wsgi(clients)
+    elapsed = perf_counter() - start
+
+    connections.close_all()
+    return NUM_OF_CLIENTS * NUM_OF_ADDS / elapsed, sum(client.failures for client in clients)
+
+
+def run_profile(label: str, overrides: dict = None, pragmas: dict = None) -> tuple:
+    """Measures a profile on its own fresh database, so that a journal mode doesn't carry over."""
+    settings_dict = connection.settings_dict
+    original      = {key: settings_dict.get(key) for key in (overrides or {})}
+
+    settings_dict.update(overrides or {})
+    connections.close_all()
+
+    try:
+        with override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRAGMAS if pragmas is None else pragmas):
+            old_name = create_benchmark_database(on_disk=True)
+            try:
+                create_products(NUM_OF_PRODUCTS)
+                rate, failures = measure(list(Product.objects.values_list("id", flat=True)))
+            finally:
+                destroy_benchmark_database(old_name)
+    finally:
+        settings_dict.update(original)
+        connections.close_all()
+
+    return (f"{label} (adds/sec, failed requests)", f"{rate:.1f}, {failures}")
+
+
+def main():
+    # A locked database fails the request with a 500, counted rather than logged
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+    rows = []
+
+    if connection.vendor == "sqlite":
+        rows.append(run_profile("sqlite untuned", overrides=UNTUNED_SQLITE, pragmas={}))
+
+    rows.append(run_profile(settings.DATABASE_PROFILE))
+
+    print_results(f"{NUM_OF_CLIENTS} concurrent clients x {NUM_OF_ADDS} add_to_basket calls", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compares the products discounted per second by `Discount.apply_discount`, which saves one
+product at a time, with the set-based `apply_discount_to_products`.
+
+The per-product loop is only run against a sample of the catalog, running it against every
+product would take minutes.
+
+Usage:
+    python -m benchmarks.bench_discount_engine
+"""
+from datetime import timedelta
+from time import perf_counter
+
+from benchmarks.utils import (create_benchmark_database,
+                              create_products,
+                              destroy_benchmark_database,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from product.discount_engine import apply_discount_to_products, revert_discount_from_products
+from product.models import Discount, Product
+
+
+NUM_OF_PRODUCTS        = 100_000
+NUM_OF_LOOPED_PRODUCTS = 2_000
+
+
+def main():
+    old_name = create_benchmark_database(on_disk=True)
+
+    try:
+        create_products(NUM_OF_PRODUCTS)
+
+        discount = Discount.objects.create(name="save25%",
+                                           discount=25,
+                                           code="BENCH-25",
+                                           end_date=now() + timedelta(days=1),
+                                           )
+        discount.refresh_from_db()  # load `discount` back as a Decimal
+
+        start = perf_counter()
+        for product in Product.objects.all()[:NUM_OF_LOOPED_PRODUCTS]:
+            discount.apply_discount(product)
+        loop_rate = NUM_OF_LOOPED_PRODUCTS / (perf_counter() - start)
+
+        # put the catalog back to its original state before the bulk run
+        Product.objects.update(effective_price=F("price"), discount=None, has_discount=False, is_discount_applied=False)
+
+        with CaptureQueriesContext(connection) as context:
+            start        = perf_counter()
+            num_of_rows  = apply_discount_to_products(discount, Product.objects.all())
+            bulk_elapsed = perf_counter() - start
+
+        num_of_reapplied = apply_discount_to_products(discount, Product.objects.all())
+
+        start          = perf_counter()
+        num_reverted   = revert_discount_from_products(discount, Product.objects.all())
+        revert_elapsed = perf_counter() - start
+
+        print_results(f"Applying a 25% discount ({NUM_OF_PRODUCTS} products)", [
+            ("apply_discount loop (products/sec)", f"{loop_rate:.0f}"),
+            ("bulk apply (products/sec)", f"{num_of_rows / bulk_elapsed:.0f}"),
+            ("bulk revert (products/sec)", f"{num_reverted / revert_elapsed:.0f}"),
+            ("speed up", f"{(num_of_rows / bulk_elapsed) / loop_rate:.1f}x"),
+            ("queries for the bulk apply", len(context.captured_queries)),
+            ("rows changed when re-applied", num_of_reapplied),
+        ])
+    finally:
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Compares the latency of searching the catalog with `LIKE` (`icontains` over the name and the
+description, what the admin search does) with the in-memory inverted index and the SQLite FTS5
+table of `product.search`.
+
+The products are given names and descriptions drawn from a small vocabulary, so that common
+words match thousands of products and rare combinations only a few, like a real catalog. Every
+search runs the same mix of one and two word queries, some of them prefixes e.g. "runn".
+
+Usage:
+    python -m benchmarks.bench_product_search [number of products]
+"""
+import sys
+
+from random import Random
+from statistics import quantiles
+from time import perf_counter
+
+from benchmarks.utils import (create_benchmark_database,
+                              destroy_benchmark_database,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from django.db.models import Q
+
+from product.models import Product
+from product.search import InvertedIndexSearchBackend, SQLiteFTS5SearchBackend, search_products, tokenize
+
+
+DEFAULT_NUM_OF_PRODUCTS = 100_000
+NUM_OF_QUERIES          = 500
+LIMIT                   = 20
+
+COLOURS    = ["red", "blue", "green", "black", "white", "grey", "navy", "olive", "pink", "amber", "ivory", "teal"]
+MATERIALS  = ["cotton", "leather", "wool", "linen", "denim", "suede", "canvas", "silk", "nylon", "velvet"]
+ITEMS      = ["trainers", "jacket", "hoodie", "socks", "scarf", "backpack", "boots", "shirt", "gloves", "beanie",
+              "sandals", "blazer", "jeans", "cap", "raincoat", "wallet", "belt", "sweater", "shorts", "loafers"]
+USES       = ["running", "hiking", "office", "travel", "winter", "summer", "festival", "gym", "weekend", "wedding"]
+DESCRIBERS = ["lightweight", "waterproof", "breathable", "handmade", "recycled", "durable", "slim", "relaxed",
+              "padded", "stretch", "organic", "vintage", "classic", "premium", "everyday", "limited"]
+
+
+def create_catalog(num_of_products: int, random: Random) -> None:
+    products = []
+
+    for index in range(num_of_products):
+        name        = f"{random.choice(COLOURS)} {random.choice(MATERIALS)} {random.choice(USES)} {random.choice(ITEMS)}"
+        description = " ".join(random.sample(DESCRIBERS, 4) + [random.choice(USES), "style", f"model{index % 5000}"])
+
+        products.append(Product(name=name.title(),
+                                description=f"{description.capitalize()}.",
+                                price=10 + (index % 90),
+                                effective_price=10 + (index % 90),
+                                quantity=50,
+                                image="product/p1.jpg",
+                                ))
+    Product.objects.bulk_create(products, batch_size=2000)
+
+
+def create_queries(random: Random) -> list:
+    words   = COLOURS + MATERIALS + ITEMS + USES + DESCRIBERS
+    queries = []
+
+    for _ in range(NUM_OF_QUERIES):
+        query = [random.choice(words) for _ in range(random.choice((1, 2)))]
+
+        if random.random() < 0.3:
+            query[-1] = query[-1][:max(3, len(query[-1]) - 3)]  # a word still being typed
+        queries.append(" ".join(query))
+    return queries
+
+
+def search_with_like(query: str) -> list:
+    """Returns the products containing every word of the query in their name or description, as `LIKE` finds them."""
+    products = Product.objects.all()
+
+    for word in tokenize(query):
+        products = products.filter(Q(name__icontains=word) | Q(description__icontains=word))
+    return list(products.order_by("name").values_list("id", flat=True)[:LIMIT])
+
+
+def measure(search, queries: list) -> dict:
+    latencies = []
+
+    for query in queries:
+        start = perf_counter()
+        search(query)
+        latencies.append(perf_counter() - start)
+
+    cuts = quantiles(latencies, n=100)
+    return {"p50": cuts[49] * 1000, "p99": cuts[98] * 1000}
+
+
+def main():
+    num_of_products = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_OF_PRODUCTS
+    old_name        = create_benchmark_database(on_disk=True)
+    random          = Random(42)
+
+    try:
+        create_catalog(num_of_products, random)
+        queries = create_queries(random)
+        rows    = []
+
+        memory = InvertedIndexSearchBackend()
+        start  = perf_counter()
+        memory.build()
+        rows.append(("memory index build (sec)", f"{perf_counter() - start:.2f}"))
+
+        fts5  = SQLiteFTS5SearchBackend()
+        start = perf_counter()
+        fts5.build()
+        rows.append(("fts5 table build (sec)", f"{perf_counter() - start:.2f}"))
+
+        # Warms the product index up, the products shown for the results are then served from memory
+        for query in queries:
+            search_products(query, limit=LIMIT, backend=memory)
+
+        for label, search in (("LIKE scan", search_with_like),
+                              ("memory index", lambda query: search_products(query, limit=LIMIT, backend=memory)),
+                              ("fts5", lambda query: search_products(query, limit=LIMIT, backend=fts5)),
+                              ):
+            result = measure(search, queries)
+            rows.append((f"{label} (p50 / p99 ms)", f"{result['p50']:.2f} / {result['p99']:.2f}"))
+
+        print_results(f"Searching {num_of_products} products ({NUM_OF_QUERIES} queries, top {LIMIT})", rows)
+    finally:
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
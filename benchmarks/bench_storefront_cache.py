@@ -0,0 +1,67 @@
+"""
+Compares the requests per second served by `store.views.home` with the catalog cache
+cold (invalidated before every request) and warm.
+
+Usage:
+    python -m benchmarks.bench_storefront_cache
+"""
+from benchmarks.utils import (create_benchmark_database,
+                              create_products,
+                              destroy_benchmark_database,
+                              measure_rate,
+                              print_results,
+                              setup_django,
+                              )
+
+setup_django()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from store.catalog_cache import invalidate_catalog
+
+
+NUM_OF_PRODUCTS = 200
+NUM_OF_REQUESTS = 200
+
+
+def main():
+    old_name = create_benchmark_database()
+
+    try:
+        create_products(NUM_OF_PRODUCTS)
+
+        client = Client()
+        url    = reverse("storefront")
+
+        def cold_request():
+            invalidate_catalog()
+            client.get(url)
+
+        def warm_request():
+            client.get(url)
+
+        cold_rps = measure_rate(cold_request, NUM_OF_REQUESTS)
+
+        client.get(url)  # warm the cache
+        warm_rps = measure_rate(warm_request, NUM_OF_REQUESTS)
+
+        with CaptureQueriesContext(connection) as context:
+            warm_request()
+
+        catalog_queries = [query for query in context.captured_queries if "product_product" in query["sql"]]
+
+        print_results(f"store.views.home with {NUM_OF_PRODUCTS} products", [
+            ("cold cache (requests/sec)", f"{cold_rps:.1f}"),
+            ("warm cache (requests/sec)", f"{warm_rps:.1f}"),
+            ("speed up", f"{warm_rps / cold_rps:.2f}x"),
+            ("catalog queries per warm request", len(catalog_queries)),
+        ])
+    finally:
+        destroy_benchmark_database(old_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+A minimal, in-process server speaking the Redis protocol (RESP).
+
+It only implements the handful of commands that django's `RedisCache` uses to store carts,
+which is enough to benchmark the "redis" cart storage backend without a real Redis server.
+"""
+import socketserver
+
+from threading import Lock, Thread
+from time import monotonic
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Reads RESP commands from a client connection and replies to each of them."""
+    protocol = 2
+
+    def _read_command(self):
+        """Reads a single command sent as a RESP array of bulk strings, returns None on disconnect."""
+        header = self.rfile.readline()
+
+        if not header:
+            return None
+
+        num_of_args = int(header[1:])
+        args        = []
+
+        for _ in range(num_of_args):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _write(self, value):
+        """Writes a reply encoded as RESP."""
+        if value is None:
+            reply = b"_\r\n" if self.protocol == 3 else b"$-1\r\n"
+        elif isinstance(value, dict):
+            reply = b"%%%d\r\n" % len(value)
+            for key, item in value.items():
+                reply += b"$%d\r\n%s\r\n" % (len(key), key) + (b":%d\r\n" % item if isinstance(item, int)
+                                                                 else b"$%d\r\n%s\r\n" % (len(item), item))
+        elif isinstance(value, int):
+            reply = b":%d\r\n" % value
+        elif isinstance(value, str):
+            reply = b"+%s\r\n" % value.encode()
+        else:
+            reply = b"$%d\r\n%s\r\n" % (len(value), value)
+        self.wfile.write(reply)
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            if command[0].upper() == b"HELLO" and len(command) > 1:
+                self.protocol = int(command[1])
+            self._write(self.server.execute(command[0].upper(), command[1:]))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """
+    A threaded TCP server holding the data of the fake Redis store.
+
+    Usage:
+        server = FakeRedisServer.start()
+        url    = server.url
+        ...
+        server.stop()
+    """
+    allow_reuse_address = True
+    daemon_threads      = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        super().__init__(address, FakeRedisHandler)
+        self._data = {}
+        self._lock = Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    @classmethod
+    def start(cls):
+        """Starts a server listening on a free port in a background thread and returns it."""
+        server = cls()
+        Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, name: bytes, args: list):
+        """Executes a single command against the store and returns its reply."""
+        with self._lock:
+            if name == b"GET":
+                return self._get(args[0])
+
+            if name == b"SET":
+                expires_at = None
+                options    = [arg.upper() for arg in args[2:]]
+                if b"EX" in options:
+                    expires_at = monotonic() + int(args[2 + options.index(b"EX") + 1])
+                if b"NX" in options and self._get(args[0]) is not None:
+                    return None
+                self._data[args[0]] = (args[1], expires_at)
+                return "OK"
+
+            if name == b"DEL":
+                return sum(1 for key in args if self._data.pop(key, None) is not None)
+
+            if name == b"EXISTS":
+                return sum(1 for key in args if self._get(key) is not None)
+
+            if name == b"HELLO":
+                # Clients negotiating RESP3 (e.g. redis-py >= 8) expect a map describing the server
+                return {b"server": b"redis", b"version": b"7.0.0", b"proto": int(args[0]) if args else 2}
+
+            if name == b"FLUSHDB":
+                self._data.clear()
+                return "OK"
+
+            # PING, SELECT, CLIENT SETINFO, ... are accepted and ignored
+            return "PONG" if name == b"PING" else "OK"
@@ -0,0 +1,134 @@
+import django
+
+from os import environ, mkdir
+from os.path import abspath, dirname, exists, join
+from tempfile import gettempdir
+from threading import Thread
+from time import perf_counter
+from typing import Callable
+
+
+BASE_DIR = dirname(dirname(abspath(__file__)))
+LOG_DIR  = join(BASE_DIR, "logs")
+
+
+def setup_django() -> None:
+    """
+    Sets up django so that a benchmark can be run as a plain python script
+    e.g `python -m benchmarks.bench_storefront_cache`.
+
+    The benchmarks never touch `db.sqlite3`, instead they run against a throw away
+    test database created by `create_benchmark_database`.
+    """
+    from django.apps import apps
+
+    if apps.ready:
+        return
+
+    if not exists(LOG_DIR):
+        mkdir(LOG_DIR)
+
+    environ.setdefault("DJANGO_SETTINGS_MODULE", "cart_backend.settings")
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+
+    # DEBUG is turned off (as the test runner does) so that every query isn't logged in memory
+    setup_test_environment(debug=False)
+
+
+def create_benchmark_database(on_disk: bool = False) -> str:
+    """
+    Creates (and migrates) a throw away test database and returns its name.
+
+    Args:
+        on_disk (bool): SQLite test databases are created in memory by default, which
+                        doesn't behave like the real database when several threads write
+                        to it at the same time. Set to True for the concurrent benchmarks
+                        so the database is created as a file instead.
+    """
+    from django.db import connection
+
+    if on_disk and connection.vendor == "sqlite":
+        connection.settings_dict["TEST"]["NAME"] = join(gettempdir(), "cart_backend_benchmark.sqlite3")
+
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def destroy_benchmark_database(old_name: str) -> None:
+    """Destroys the test database created by `create_benchmark_database`."""
+    from django.db import connection
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def create_products(num_of_products: int, **fields) -> None:
+    """
+    Bulk creates a given number of products to benchmark against.
+
+    Args:
+        num_of_products (int): The number of products to create.
+        fields (dict): Any field values that should override the defaults.
+    """
+    from product.models import Product
+
+    products = [Product(name=f"Benchmark product {index}",
+                        description=f"A product used to benchmark the cart backend, number {index}.",
+                        price=10 + (index % 90),
+                        effective_price=10 + (index % 90),
+                        quantity=50,
+                        image="product/p1.jpg",
+                        **fields,
+                        ) for index in range(num_of_products)]
+    Product.objects.bulk_create(products, batch_size=1000)
+
+
+def measure_rate(func: Callable, num_of_calls: int) -> float:
+    """
+    Calls a function a given number of times and returns the calls made per second.
+
+    Args:
+        func (Callable): A function that takes no arguments.
+        num_of_calls (int): How many times the function should be called.
+    """
+    start = perf_counter()
+    for _ in range(num_of_calls):
+        func()
+    elapsed = perf_counter() - start
+    return num_of_calls / elapsed
+
+
+def measure_concurrent_rate(func: Callable, num_of_threads: int, num_of_calls: int) -> float:
+    """
+    Runs a function in several threads at the same time and returns the total calls made per second.
+
+    Args:
+        func (Callable): A function that takes the thread index and performs `num_of_calls` calls.
+        num_of_threads (int): How many threads to run the function in.
+        num_of_calls (int): How many calls each thread makes, used to compute the rate.
+    """
+    from django.db import connections
+
+    def run(index):
+        try:
+            func(index)
+        finally:
+            connections.close_all()
+
+    threads = [Thread(target=run, args=(index,)) for index in range(num_of_threads)]
+
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+
+    return (num_of_threads * num_of_calls) / elapsed
+
+
+def print_results(title: str, rows: list[tuple]) -> None:
+    """Prints the benchmark results as a simple two column table."""
+    print(f"\n{title}")
+    print("-" * len(title))
+    for label, value in rows:
+        print(f"{label:<40} {value}")
@@ -0,0 +1,25 @@
+"""
+The async version of the cart page, routed instead of `cart.views` when `ASYNC_VIEWS` is on.
+
+See `store.async_views`.
+"""
+from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+
+from product.views_helper import CartRequestSession
+from store.etags import acondition, aget_cart_etag
+
+
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=aget_cart_etag)
+async def cart(request):
+    """The async version of `cart.views.cart`."""
+    cart     = await CartRequestSession.acreate(request)
+    products = await cart.aget_products_from_request(to_class_object=True)
+    
+    context = {
+        "products": products,
+        "pricing": await cart.aget_pricing(),
+        "cart_total": cart.number_of_items_in_cart_session,
+    }
+    return render(request, "cart.html", context=context)
@@ -1,3 +1,146 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from product.models import Discount, Product, StockReservation
+from product.stock import release_expired_reservations
+from product.stock_snapshot import stock_snapshot
+from product.views_helper import CartRequestSession
+
+
+class RedeemDiscountTest(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Trainers",
+                                              description="Running trainers",
+                                              price=40,
+                                              quantity=5,
+                                              image="product/p1.jpg",
+                                              )
+        self.discount = Discount.objects.create(name="save10%",
+                                                discount=10,
+                                                code="EGBIE-GET10-OFFFI-RSTIM",
+                                                end_date=now() + timedelta(days=1),
+                                                )
+        self.client.get(reverse("storefront"))
+        self.token = self.client.cookies["csrftoken"].value
+
+        # The attempts are counted per client IP too, which every test shares
+        cache.clear()
+
+    def _post(self, url, body):
+        return self.client.post(url, json.dumps(body), content_type="application/json", HTTP_X_CSRFTOKEN=self.token)
+
+    def _redeem(self, code):
+        return self._post(reverse("redeem_discount"), {"discountCode": code})
+
+    def test_redeemed_discount_is_taken_off_the_cart_total(self):
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+
+        response = self._redeem(self.discount.code)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["PRICING"]["discount"], "4.00")
+        self.assertEqual(self.client.get(reverse("cart_pricing")).json()["PRICING"]["discount"], "4.00")
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, 40)
+
+    def test_unknown_or_expired_codes_are_refused(self):
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+        Discount.objects.filter(pk=self.discount.pk).update(end_date=now() - timedelta(days=1))
+
+        for code in ("NOT-A-CODE", self.discount.code):
+            response = self._redeem(code)
+
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["PRICING"]["discount"], "0.00")
+
+    @override_settings(DISCOUNT_REDEMPTION_RATE_LIMIT=2)
+    def test_attempts_are_rate_limited_per_session(self):
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+
+        statuses = [self._redeem("NOT-A-CODE").status_code for _ in range(3)]
+
+        self.assertEqual(statuses, [400, 400, 429])
+
+    @override_settings(DISCOUNT_REDEMPTION_RATE_LIMIT=10, DISCOUNT_REDEMPTION_IP_RATE_LIMIT=2)
+    def test_attempts_are_rate_limited_per_ip_across_sessions(self):
+        statuses = []
+
+        for _ in range(3):
+            # A new session for every attempt, as a client dropping its session cookie gets
+            self.client.cookies.pop(settings.SESSION_COOKIE_NAME, None)
+            statuses.append(self._redeem("NOT-A-CODE").status_code)
+
+        self.assertEqual(statuses, [400, 400, 429])
+
+    def test_codes_of_product_discounts_are_refused(self):
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+        Product.objects.filter(pk=self.product.pk).update(discount=self.discount)
+
+        response = self._redeem(self.discount.code)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["PRICING"]["discount"], "0.00")
+
+    def test_single_use_codes_are_refused_to_other_visitors(self):
+        Discount.objects.filter(pk=self.discount.pk).update(is_single_use=True)
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+
+        self.assertEqual(self._redeem(self.discount.code).status_code, 200)
+        self.assertEqual(self._redeem(self.discount.code).status_code, 200)
+
+        # Another visitor, with a session of their own
+        self.client.cookies.pop(settings.SESSION_COOKIE_NAME, None)
+        self._post(reverse("add_to_basket"), {"productID": self.product.id})
+
+        response = self._redeem(self.discount.code)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["PRICING"]["discount"], "0.00")
+
+
+@override_settings(STOCK_RESERVATIONS=True)
+class CartStockLevelsTest(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Trainers",
+                                              description="Running trainers",
+                                              price=40,
+                                              quantity=5,
+                                              image="product/p1.jpg",
+                                              )
+        self.client.get(reverse("storefront"))
+        self.client.post(reverse("add_to_basket"),
+                         json.dumps({"productID": self.product.id}),
+                         content_type="application/json",
+                         HTTP_X_CSRFTOKEN=self.client.cookies["csrftoken"].value,
+                         )
+
+    def _get_stock_levels(self):
+        stock_snapshot.invalidate()
+
+        request         = RequestFactory().get("/")
+        request.session = SessionStore(session_key=self.client.session.session_key)
+        return CartRequestSession(request).get_stock_levels()
+
+    def test_units_held_for_the_visitor_are_counted_as_in_stock(self):
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 4)
+        self.assertEqual(self._get_stock_levels(), {self.product.id: 5})
+
+    def test_units_of_an_expired_reservation_are_not_counted_twice(self):
+        StockReservation.objects.update(expires_at=now() - timedelta(minutes=1))
+
+        self.assertEqual(self._get_stock_levels(), {self.product.id: 4})
+
+        release_expired_reservations()
+
+        self.assertEqual(self._get_stock_levels(), {self.product.id: 5})
@@ -1,9 +1,13 @@
-
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
 
+# The async version of the view is routed when `ASYNC_VIEWS` is on
+page_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path("",  view=views.cart, name="cart"),
+    path("",  view=page_views.cart, name="cart"),
+    path("pricing/", view=views.cart_pricing, name="cart_pricing"),
+    path("discount/", view=views.redeem_discount, name="redeem_discount"),
 ]
-
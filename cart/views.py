@@ -1,16 +1,28 @@
+import json
+
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 
 from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.db.models import Sum
 
 
 from product.models import Product
+from product.discount_redemption import redeem_discount_code
 from product.views_helper import CartRequestSession
+from store.etags import get_cart_etag
+from utils.custom_errors import RateLimitExceededError
+from utils.sessions import ensure_guest_session
+from utils.validator import validate_csrf_token
 
 # Create your views here.
 
 
+# Revalidated on every visit, an unchanged cart is answered with a 304 before it is hydrated (see `store.etags`)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=get_cart_etag)
 def cart(request):
     
     
@@ -19,5 +31,74 @@ def cart(request):
    
     context = {
         "products": products,
+        "pricing": cart.get_pricing(),
     }
-    return render(request, "cart.html", context=context)
\ No newline at end of file
+    return render(request, "cart.html", context=context)
+
+
+@cache_control(private=True, no_cache=True)
+def cart_pricing(request):
+    """
+    Returns the price of the visitor's cart as JSON, see `CartRequestSession.get_pricing`.
+
+    Every amount is sent as a string e.g. `{"PRICING": {"subtotal": "39.98", "total": "68.18", "lines": {"5": "39.98"}, ...}}`
+    so that no precision is lost in the client.
+    """
+    if request.method != "GET":
+        return JsonResponse({"ERROR": "Only a GET request is allowed"}, status=405)
+    
+    cart = CartRequestSession(request)
+    return JsonResponse({"PRICING": cart.get_pricing().to_json(), "NUM_OF_ITEMS_IN_CART": cart.number_of_items_in_cart_session})
+
+
+def redeem_discount(request):
+    """
+    Redeems a discount code against the visitor's cart, see `product.discount_redemption`.
+
+    Expects a JSON body in the form of `{"discountCode": "EGBIE-GET10-OFFFI-RSTIM"}` and returns the
+    redeemed discount together with the repriced cart, so the client can render the new totals
+    without another request.
+    """
+    if request.method != "POST":
+        return JsonResponse({"ERROR": "Only a POST request is allowed"}, status=405)
+    
+    response = validate_csrf_token(request)
+    
+    if response.get("error"):
+        FORBIDDEN_CODE = 403
+        return JsonResponse({"ERROR": response["error"], "isSuccess": False}, status=FORBIDDEN_CODE)
+    
+    ensure_guest_session(request, response["token"])
+    
+    cart = CartRequestSession(request)
+    
+    try:
+        code     = json.loads(request.body.decode("utf-8")).get("discountCode")
+        discount = redeem_discount_code(cart, code, request.META.get("REMOTE_ADDR"))
+        
+    except (AttributeError, json.JSONDecodeError):
+        return _create_discount_json(cart, error="Expected a JSON object with a discount code", status_code=400)
+    
+    except RateLimitExceededError as error:
+        TOO_MANY_REQUESTS_CODE = 429
+        return _create_discount_json(cart, error=str(error), status_code=TOO_MANY_REQUESTS_CODE)
+    
+    except ValueError as error:
+        return _create_discount_json(cart, error=str(error), status_code=400)
+    
+    return _create_discount_json(cart, 
+                                 is_success=True, 
+                                 message=f"Your {discount.discount.normalize():f}% discount has been successfully applied.", 
+                                 discount={"code": discount.code, "percentage": str(discount.discount)},
+                                 )
+
+
+def _create_discount_json(cart, status_code=200, error='', is_success=False, message='', discount=None):
+    return JsonResponse({'ERROR': error,
+                         'isSuccess': is_success,
+                         'MESSAGE': message,
+                         'DISCOUNT': discount,
+                         'PRICING': cart.get_pricing().to_json(),
+                         },
+                         status=status_code,
+                         )
@@ -0,0 +1,96 @@
+"""
+The database profiles the project can run against, selected by the `DATABASE_PROFILE`
+environment variable:
+
+    - "sqlite"   : the `db.sqlite3` file (the default), tuned for concurrent requests.
+    - "postgres" : a PostgreSQL server configured by the `POSTGRES_*` environment variables.
+                   Requires the `psycopg` package to be installed.
+
+Both profiles keep their connections open between requests for `DB_CONN_MAX_AGE` seconds
+(checking them before reuse), rather than opening a new connection for every request.
+
+SQLite is tuned through the PRAGMAs in `SQLITE_PRAGMAS`, run on every new connection by the
+`connection_created` receiver below:
+
+    - journal_mode=WAL     : readers no longer block the writer (and vice versa).
+    - synchronous=NORMAL   : in WAL mode a commit no longer waits for an fsync, the database
+                             still can't be corrupted by a crash, at worst the last commits are lost
+                             by a power failure.
+    - mmap_size            : reads are served from a memory map rather than through read() calls.
+    - busy_timeout         : a connection waits up to this many milliseconds for a lock rather than
+                             failing with "database is locked".
+
+Transactions are also started with `BEGIN IMMEDIATE`, so that a transaction which reads before
+it writes (e.g. saving a session) takes the write lock up front. A deferred transaction that
+has to upgrade its lock fails straight away when another connection is writing, whatever
+the busy timeout.
+"""
+from os import getenv
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+
+DATABASE_PROFILES = ("sqlite", "postgres")
+
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 128 * 1024 * 1024,
+    "busy_timeout": 5000,
+}
+
+
+def get_databases(profile: str, base_dir) -> dict:
+    """
+    Returns the `DATABASES` setting of a database profile.
+
+    Args:
+        profile (str): Either "sqlite" or "postgres".
+        base_dir (Path): The directory the SQLite database is created in.
+
+    Raises:
+        ImproperlyConfigured: If the profile doesn't exist.
+    """
+    conn_max_age = int(getenv("DB_CONN_MAX_AGE", 60))
+
+    if profile == "sqlite":
+        database = {"ENGINE": "django.db.backends.sqlite3",
+                    "NAME": getenv("SQLITE_PATH") or base_dir / "db.sqlite3",
+                    "OPTIONS": {"transaction_mode": "IMMEDIATE"},
+                    # An in-memory test database fails concurrent writers straight away ("database
+                    # table is locked") rather than waiting for the lock, tests run against a file
+                    "TEST": {"NAME": base_dir / "test_db.sqlite3"},
+                    }
+
+    elif profile == "postgres":
+        database = {"ENGINE": "django.db.backends.postgresql",
+                    "NAME": getenv("POSTGRES_DB", "cart_backend"),
+                    "USER": getenv("POSTGRES_USER", "postgres"),
+                    "PASSWORD": getenv("POSTGRES_PASSWORD", ""),
+                    "HOST": getenv("POSTGRES_HOST", "127.0.0.1"),
+                    "PORT": getenv("POSTGRES_PORT", "5432"),
+                    }
+
+    else:
+        raise ImproperlyConfigured(f"Unknown database profile: {profile}. Expected one of {', '.join(DATABASE_PROFILES)}")
+
+    database.update({"CONN_MAX_AGE": conn_max_age, "CONN_HEALTH_CHECKS": conn_max_age > 0})
+    return {"default": database}
+
+
+def configure_sqlite_connection(sender, connection, **kwargs) -> None:
+    """Runs the `SQLITE_PRAGMAS` on every new SQLite connection."""
+    from django.conf import settings
+
+    if connection.vendor != "sqlite":
+        return
+
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", DEFAULT_SQLITE_PRAGMAS)
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+connection_created.connect(configure_sqlite_connection, dispatch_uid="configure_sqlite_connection")
@@ -16,6 +16,8 @@ from os import getenv
 from os.path import join
 from dotenv import load_dotenv
 
+from cart_backend.db_profiles import DEFAULT_SQLITE_PRAGMAS, get_databases
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -57,6 +59,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'utils.middleware.CartCountCookieMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -90,13 +93,141 @@ WSGI_APPLICATION = 'cart_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# The database is selected by the `DATABASE_PROFILE` environment variable, either "sqlite"
+# (the default) or "postgres", see `cart_backend.db_profiles`.
+
+DATABASE_PROFILE = getenv("DATABASE_PROFILE", "sqlite")
+DATABASES        = get_databases(DATABASE_PROFILE, BASE_DIR)
+
+# Run on every new SQLite connection
+SQLITE_PRAGMAS = DEFAULT_SQLITE_PRAGMAS
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.1/topics/http/sessions/
+# The session engines in `utils.sessions` only write a session when its data actually changes.
+
+SESSION_ENGINE = 'utils.sessions.db'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cart-backend-default',
     }
 }
 
+# The cache alias holding the rendered storefront catalog and how long (in seconds) an entry
+# lives. `None` keeps it until a `Product` or `Discount` change invalidates it.
+CATALOG_CACHE_ALIAS   = 'default'
+CATALOG_CACHE_TIMEOUT = None
+
+# The catalog version also changes when a discount starts or ends (see `store.catalog_cache.DiscountEpoch`),
+# as the discount scheduler runs in another process. For `DISCOUNT_TRANSITION_GRACE` seconds after a
+# discount boundary, the time the scheduler is given to re-price the products, it changes every
+# `DISCOUNT_TRANSITION_STEP` seconds.
+DISCOUNT_TRANSITION_GRACE = 60
+DISCOUNT_TRANSITION_STEP  = 5
+
+# When True the storefront only renders the first `STORE_PAGE_SIZE` products, the rest are fetched
+# on demand from the product listing API as the visitor scrolls.
+STORE_INFINITE_SCROLL = True
+STORE_PAGE_SIZE       = 24
+
+# Part of the ETag of the storefront and cart pages, bump it when a deploy changes their
+# templates without changing any static asset, so that browsers don't keep the old pages
+PAGE_ETAG_VERSION = 1
+
+
+# Cart
+# When True, `add_to_basket` only uses the `productID` sent by the client and resolves the product
+# through the in-process product index. When False the product payload posted by the client is
+# trusted (the legacy behaviour).
+CART_SERVER_SIDE_LOOKUP = True
+
+# When True the units of a product are reserved for a visitor when they put it in their cart, for
+# `STOCK_RESERVATION_TTL` seconds after the last change to the cart line (see `product.stock`).
+# Expired reservations are put back in stock by the `sweep_stock_reservations` command.
+STOCK_RESERVATIONS    = True
+STOCK_RESERVATION_TTL = 15 * 60
+
+# How a cart is priced on the server (see `product.cart_pricing`). Shipping is free once the subtotal,
+# after any discount, reaches `CART_FREE_SHIPPING_THRESHOLD`. Amounts are strings so they are read as
+# exact decimals.
+CART_SHIPPING_COST           = "25.00"
+CART_FREE_SHIPPING_THRESHOLD = "1000.00"
+CART_TAX_RATE                = "0.20"
+
+# When True the storefront and cart pages and the add to cart endpoint are routed to their async
+# versions (`store.async_views` and `cart.async_views`), which only pay off when served under ASGI
+# (`cart_backend.asgi`). The sync views are always used under WSGI otherwise.
+ASYNC_VIEWS = getenv("ASYNC_VIEWS", "False").lower() in ("true", "1")
+
+# How long (in seconds) a product stays in the in-process product index before it is reloaded
+PRODUCT_INDEX_TTL = 60
+
+# The backend of the product search (see `product.search`): "memory" for the in-process inverted index
+# or "fts5" for an SQLite FTS5 table (SQLite only).
+PRODUCT_SEARCH_BACKEND = getenv("PRODUCT_SEARCH_BACKEND", "memory")
+
+# How long (in seconds) the stock level of a product shown in the cart is served from the
+# in-process stock snapshot before it is reloaded (see `product.stock_snapshot`)
+STOCK_SNAPSHOT_TTL = 2
+
+# The in-process discount code cache (see `product.discount_cache`). A found discount is cached until it
+# expires or for `DISCOUNT_CACHE_TTL` seconds, whichever comes first, and a code that doesn't exist is cached
+# as a miss for `DISCOUNT_CACHE_NEGATIVE_TTL` seconds.
+DISCOUNT_CACHE_TTL                  = 60
+DISCOUNT_CACHE_NEGATIVE_TTL         = 30
+DISCOUNT_CACHE_MAX_NEGATIVE_ENTRIES = 10000
+
+# How many discount codes a visitor (session) may try every `DISCOUNT_REDEMPTION_RATE_WINDOW` seconds,
+# counted in the `DISCOUNT_REDEMPTION_CACHE_ALIAS` cache (see `product.discount_redemption`), and how
+# many may be tried from a single client IP, whatever the session. The cache should be shared by every
+# process (e.g. Redis) for the limits to hold across them.
+DISCOUNT_REDEMPTION_RATE_LIMIT    = 5
+DISCOUNT_REDEMPTION_IP_RATE_LIMIT = 20
+DISCOUNT_REDEMPTION_RATE_WINDOW   = 60
+DISCOUNT_REDEMPTION_CACHE_ALIAS   = 'default'
+
+# The resized variants generated for every product image (see `product.image_variants`). The storefront
+# serves the JPEG variant closest to `PRODUCT_IMAGE_DEFAULT_WIDTH` and lets the browser pick a better fit
+# from the rest through `srcset`.
+PRODUCT_IMAGE_WIDTHS        = (160, 320, 640)
+PRODUCT_IMAGE_FORMATS       = ("webp", "jpeg")
+PRODUCT_IMAGE_DEFAULT_WIDTH = 320
+
+# The signed cookie caching the number of items in the cart, so pages can display it without loading the session
+CART_COUNT_COOKIE_NAME = 'cart_total'
+CART_COUNT_COOKIE_SALT = 'utils.context_processors.cart_total'
+
+# Cart storage
+# Selects where the carts are stored (see `product.cart_storage`), one of:
+#   - "session"   : inside the django session (the default, database backed)
+#   - "cached_db" : inside the django session, using the write-through `cached_db` session engine
+#   - "locmem"    : in the local-memory cache, keyed by the session key
+#   - "redis"     : in a Redis (or Redis protocol compatible) server at `REDIS_URL`, keyed by the session key.
+#                   Requires the `redis` package to be installed.
+CART_STORAGE_BACKEND = getenv("CART_STORAGE_BACKEND", "session")
+REDIS_URL            = getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
+
+if CART_STORAGE_BACKEND == "cached_db":
+    SESSION_ENGINE = 'utils.sessions.cached_db'
+
+if CART_STORAGE_BACKEND == "redis":
+    CACHES['carts'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    CACHES['carts'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cart-backend-carts',
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -147,6 +278,13 @@ MEDIA_ROOT = join(BASE_DIR, 'media')
 
 STATICFILES_DIRS = [ join(BASE_DIR, 'static') ]
 
+# `collectstatic` (see the `build_static_assets` command) writes content hashed, precompressed copies of the
+# static files to `STATIC_ROOT`, which `{% static %}` then resolves to (see `utils.staticfiles`)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "utils.staticfiles.HashedCompressedStaticFilesStorage"},
+}
+
 
 
 LOGGING = {
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from cart_backend.db_profiles import get_databases
+
+
+class DatabaseProfileTest(SimpleTestCase):
+
+    def test_unknown_profiles_are_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_databases("mysql", Path("/tmp"))
+
+    def test_sqlite_profile_starts_immediate_transactions(self):
+        database = get_databases("sqlite", Path("/tmp"))["default"]
+
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertEqual(database["NAME"], Path("/tmp") / "db.sqlite3")
+
+
+class SQLiteConnectionTest(TransactionTestCase):
+
+    def setUp(self):
+        # A connection of its own, so the PRAGMAs are those run when a connection is created
+        self.connection = connections.create_connection("default")
+        self.addCleanup(self.connection.close)
+
+    def _get_pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_run_on_new_connections(self):
+        self.assertEqual(self._get_pragma("journal_mode"), "wal")
+        self.assertEqual(self._get_pragma("busy_timeout"), 5000)
+        self.assertEqual(self._get_pragma("synchronous"), 1)  # NORMAL
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            pass
+
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        self.assertIn("BEGIN IMMEDIATE", [query["sql"] for query in queries])
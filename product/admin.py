@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Product, Discount
+from .models import Product, Discount, StockReservation
 
 # Register your models here.
 
@@ -11,19 +11,28 @@ class DiscountAdmin(admin.ModelAdmin):
     list_display_links = ["id", "name"]
     list_per_page      = 25
     search_fields      = ["name", "id"]
-    readonly_fields    = ["start_date"]
     
 
 
 class ProductAdmin(admin.ModelAdmin):
     
-    list_display       = ["id", "name", "price", "quantity", "has_discount", "created_on", "modified_on"]
+    list_display       = ["id", "name", "price", "effective_price", "quantity", "has_discount", "created_on", "modified_on"]
     list_display_links = ["id", "name"]
     list_per_page      = 25
     search_fields      = ["name", "id"]
-    readonly_fields    = ["created_on", "modified_on"]
+    readonly_fields    = ["effective_price", "created_on", "modified_on"]
+    
+
+
+class StockReservationAdmin(admin.ModelAdmin):
+    
+    list_display       = ["id", "product", "session_key", "quantity", "expires_at", "modified_on"]
+    list_display_links = ["id", "product"]
+    list_per_page      = 25
+    search_fields      = ["session_key", "product__name"]
     
 
 
 admin.site.register(Product, ProductAdmin)
-admin.site.register(Discount, DiscountAdmin)
\ No newline at end of file
+admin.site.register(Discount, DiscountAdmin)
+admin.site.register(StockReservation, StockReservationAdmin)
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+The compact encoding used to store a cart in the session.
+
+A cart is stored in the session as a small versioned structure:
+
+    {"v": 2, "l": [[id, qty, price], [id, qty, price], ...], "h": "3f2a9c1d5e7b8a90"}
+
+where each line only holds the product id, the quantity and a snapshot of the price
+(as a string so that it survives the JSON session serializer without losing precision),
+and `h` is a hash of the lines (see `get_cart_hash`), used to tell whether the cart has
+changed without having to encode it again.
+Everything else needed to display a line (name, description, image, stock) is looked
+up through the product index when the cart is rendered.
+
+In memory, a decoded cart is an (ordered) dictionary that maps the product id (str) to
+a `[qty, price]` list.
+
+Carts stored by older versions are migrated transparently by `decode_cart`:
+
+    - version 1 (no version key): `{id: {"id": .., "product_name": .., "price": .., "qty": .., ...}}`
+    - the `{id: qty}` layout stored when products were added by id only.
+
+A cart that can't be decoded at all (e.g. a corrupt or tampered session) is dropped and
+decoded as an empty cart, rather than failing every request of the visitor.
+"""
+import hashlib
+import json
+import logging
+
+from product.product_index import product_index
+
+
+logger = logging.getLogger(__name__)
+
+CART_FORMAT_VERSION = 2
+VERSION_KEY         = "v"
+LINES_KEY           = "l"
+HASH_KEY            = "h"
+
+# The position of each value inside an encoded line
+ID, QTY, PRICE = 0, 1, 2
+
+
+def encode_cart(lines: dict) -> dict:
+    """
+    Encodes the in-memory cart lines into the compact session format.
+
+    Args:
+        lines (dict): A dictionary mapping the product id to a `[qty, price]` list.
+
+    Returns:
+        dict: The versioned, array-backed representation of the cart.
+    """
+    encoded_lines = [[int(id), qty, price] for id, (qty, price) in lines.items()]
+
+    return {VERSION_KEY: CART_FORMAT_VERSION,
+            LINES_KEY: encoded_lines,
+            HASH_KEY: _hash_lines(encoded_lines),
+            }
+
+
+def get_cart_hash(raw, lines: dict) -> str:
+    """
+    Returns the hash of a cart's content, taken from the stored cart when it has one.
+
+    Args:
+        raw (dict | None): The cart as it was found in the session.
+        lines (dict): The decoded lines of the same cart, hashed if the stored cart has no hash.
+
+    Returns:
+        str: A short hexadecimal digest that changes whenever a line is added, removed or changed.
+    """
+    # The stored hash of a cart that was dropped (see `decode_cart`) no longer matches its lines
+    if lines and is_current_format(raw) and raw.get(HASH_KEY):
+        return raw[HASH_KEY]
+    return _hash_lines([[int(id), qty, price] for id, (qty, price) in lines.items()])
+
+
+def _hash_lines(encoded_lines: list) -> str:
+    content = json.dumps(encoded_lines, separators=(",", ":"))
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def is_current_format(raw) -> bool:
+    """Returns True if a cart found in the session is stored in the current format, and so can be decoded without the product index."""
+    return isinstance(raw, dict) and raw.get(VERSION_KEY) == CART_FORMAT_VERSION
+
+
+def is_legacy_format(raw) -> bool:
+    """Returns True if a cart found in the session is stored in a legacy layout, which is migrated through the product index."""
+    return isinstance(raw, dict) and bool(raw) and raw.get(VERSION_KEY) != CART_FORMAT_VERSION
+
+
+def decode_cart(raw) -> dict:
+    """
+    Decodes a cart stored in the session into its in-memory lines.
+
+    Any cart stored in an older layout is migrated on the fly, which means that the next
+    write to the session stores it in the current compact format.
+
+    Args:
+        raw (dict | None): The cart as it was found in the session.
+
+    Returns:
+        dict: A dictionary mapping the product id (str) to a `[qty, price]` list, empty if
+              the cart couldn't be decoded.
+    """
+    if not raw:
+        return {}
+
+    if not isinstance(raw, dict):
+        logger.warning(f"[-] Dropping a cart stored as a {type(raw).__name__} instead of a dictionary")
+        return {}
+
+    if raw.get(VERSION_KEY) == CART_FORMAT_VERSION:
+        try:
+            return {str(int(line[ID])): [int(line[QTY]), line[PRICE]] for line in raw[LINES_KEY]}
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            logger.warning(f"[-] Dropping a cart that couldn't be decoded: {e!r}")
+            return {}
+
+    return _migrate_legacy_cart(raw)
+
+
+def _migrate_legacy_cart(raw: dict) -> dict:
+    """
+    Migrates a cart stored in one of the legacy layouts into the in-memory lines.
+
+    Lines stored as the full product dictionary already carry a price snapshot. Lines
+    stored as `{id: qty}` do not, so their prices are resolved through the product index
+    with a single lookup. Lines that can't be migrated are dropped.
+    """
+    qty_only_ids = [id for id, line in raw.items() if isinstance(line, int)]
+    indexed      = product_index.get_many(qty_only_ids) if qty_only_ids else {}
+    lines        = {}
+
+    for id, line in raw.items():
+        try:
+            if isinstance(line, int):
+                lines[str(id)] = [line, str(indexed[int(id)]["price"])]
+            else:
+                lines[str(id)] = [int(line["qty"]), str(line["price"])]
+
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"[*] Dropping cart line {id} that couldn't be migrated: {e}")
+
+    logger.debug(f"Migrated a legacy cart with {len(lines)} lines to version {CART_FORMAT_VERSION}")
+    return lines
@@ -0,0 +1,147 @@
+"""
+Prices a cart on the server: the line totals, the subtotal, the discount, the shipping, the tax
+and the grand total.
+
+Every amount is a `Decimal` rounded half up to 2 decimal places, the line totals and the
+subtotal are computed together in a single pass over the cart lines:
+
+    subtotal = sum(price * qty for each line)
+    discount = subtotal * discount percentage / 100
+    shipping = CART_SHIPPING_COST, taken off again (`shipping_discount`) once the discounted
+               subtotal reaches CART_FREE_SHIPPING_THRESHOLD
+    tax      = (subtotal - discount) * CART_TAX_RATE
+    total    = subtotal - discount + shipping - shipping_discount + tax
+
+The prices are the snapshots stored with the cart lines (see `product.cart_encoding`), so pricing
+a cart never touches the database. `CartRequestSession.get_pricing` caches the result in the
+cart storage (the session by default) under a key made of the cart's content hash and the
+pricing rules, so a cart is only priced again once it, or the rules, change.
+"""
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import ClassVar
+
+from django.conf import settings
+
+
+CENTS = Decimal("0.01")
+ZERO  = Decimal("0.00")
+
+
+def to_money(amount) -> Decimal:
+    """Rounds an amount half up to 2 decimal places."""
+    return Decimal(amount).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def get_line_total(price, qty: int) -> Decimal:
+    """Returns the total of a cart line, its price times its quantity."""
+    return to_money(Decimal(price) * qty)
+
+
+def get_pricing_rules(discount_percentage=0) -> dict:
+    """
+    Returns the rules a cart is priced with, from the settings and the given discount.
+
+    Args:
+        discount_percentage (Decimal | int, optional): The percentage taken off the subtotal.
+
+    Returns:
+        dict: The `discount_percentage`, `shipping_cost`, `free_shipping_threshold` and `tax_rate`.
+    """
+    return {"discount_percentage": Decimal(discount_percentage),
+            "shipping_cost": Decimal(getattr(settings, "CART_SHIPPING_COST", "25.00")),
+            "free_shipping_threshold": Decimal(getattr(settings, "CART_FREE_SHIPPING_THRESHOLD", "1000.00")),
+            "tax_rate": Decimal(getattr(settings, "CART_TAX_RATE", "0.20")),
+            }
+
+
+def get_pricing_key(content_hash: str, rules: dict) -> str:
+    """Returns the key a cart's pricing is cached under, which changes with the cart or any of the rules."""
+    return ":".join([content_hash, *(str(rules[name]) for name in sorted(rules))])
+
+
+@dataclass(frozen=True, slots=True)
+class CartPricing:
+    """
+    The price of a cart, see `price_cart`.
+
+    Attributes:
+        lines (dict): Maps the product id (str) of each line to its total.
+        subtotal (Decimal): The sum of the line totals.
+        discount (Decimal): The amount taken off the subtotal by the discount.
+        shipping (Decimal): The shipping and handling cost.
+        shipping_discount (Decimal): The amount taken off the shipping, all of it once shipping is free.
+        tax (Decimal): The tax on the discounted subtotal.
+        total (Decimal): The grand total.
+        discount_percentage (Decimal): The percentage of the discount.
+    """
+    lines: dict = field(default_factory=dict)
+    subtotal: Decimal = ZERO
+    discount: Decimal = ZERO
+    shipping: Decimal = ZERO
+    shipping_discount: Decimal = ZERO
+    tax: Decimal = ZERO
+    total: Decimal = ZERO
+    discount_percentage: Decimal = ZERO
+
+    AMOUNT_FIELDS: ClassVar[tuple] = ("subtotal", "discount", "shipping", "shipping_discount", "tax", "total", "discount_percentage")
+
+    def to_json(self) -> dict:
+        """Returns the pricing as a dictionary of strings, which keeps every amount exact in JSON."""
+        pricing          = {name: str(getattr(self, name)) for name in self.AMOUNT_FIELDS}
+        pricing["lines"] = {id: str(amount) for id, amount in self.lines.items()}
+        return pricing
+
+    @classmethod
+    def from_json(cls, pricing: dict) -> "CartPricing":
+        """Rebuilds a `CartPricing` from the output of `to_json`."""
+        amounts = {name: Decimal(pricing[name]) for name in cls.AMOUNT_FIELDS}
+        return cls(lines={id: Decimal(amount) for id, amount in pricing["lines"].items()}, **amounts)
+
+
+def price_cart(lines: dict, rules: dict = None) -> CartPricing:
+    """
+    Prices the given cart lines.
+
+    Args:
+        lines (dict): The cart lines, mapping the product id (str) to a `[qty, price]` list.
+        rules (dict, optional): The rules returned by `get_pricing_rules`, defaults to the rules
+                                of the settings without any discount.
+
+    Returns:
+        CartPricing: The line totals and the totals of the cart. An empty cart costs nothing,
+                     not even shipping.
+
+    Example Usage:
+
+        ```python
+        from product.cart_pricing import get_pricing_rules, price_cart
+
+        pricing = price_cart({"5": [2, "19.99"]}, get_pricing_rules(discount_percentage=10))
+        print(pricing.subtotal)  # Example: Decimal("39.98")
+        print(pricing.total)     # Example: Decimal("68.18")
+        ```
+    """
+    rules = rules or get_pricing_rules()
+
+    if not lines:
+        return CartPricing(discount_percentage=rules["discount_percentage"])
+
+    line_totals = {id: get_line_total(price, qty) for id, (qty, price) in lines.items()}
+    subtotal    = sum(line_totals.values(), ZERO)
+
+    discount          = to_money(subtotal * rules["discount_percentage"] / 100)
+    discounted        = subtotal - discount
+    shipping          = to_money(rules["shipping_cost"])
+    shipping_discount = shipping if discounted >= rules["free_shipping_threshold"] else ZERO
+    tax               = to_money(discounted * rules["tax_rate"])
+
+    return CartPricing(lines=line_totals,
+                       subtotal=subtotal,
+                       discount=discount,
+                       shipping=shipping,
+                       shipping_discount=shipping_discount,
+                       tax=tax,
+                       total=discounted + shipping - shipping_discount + tax,
+                       discount_percentage=rules["discount_percentage"],
+                       )
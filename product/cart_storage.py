@@ -0,0 +1,168 @@
+"""
+The storage backends that a `CartRequestSession` reads the cart from and writes it to.
+
+The backend is selected by the `CART_STORAGE_BACKEND` setting:
+
+    - "session"   : the cart is stored inside the django session (the default, database backed).
+    - "cached_db" : the cart is stored inside the django session, using the write-through
+                    `cached_db` session engine so that reads are served from the cache.
+    - "locmem"    : the cart is stored in the local-memory cache, keyed by the session key.
+    - "redis"     : the cart is stored in a Redis (or Redis protocol compatible) server, keyed
+                    by the session key.
+
+The cache backed storages keep cart writes out of the sessions table entirely, the session is
+only used to identify the visitor.
+
+Every backend also has async versions of its methods (`aload`, `asave`, `adelete`) used by the
+async views, a backend that doesn't provide them runs the sync method in a thread.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest
+
+
+logger = logging.getLogger(__name__)
+
+CART_CACHE_ALIAS = "carts"
+
+
+class BaseCartStorage:
+    """
+    The interface that every cart storage backend implements.
+
+    Args:
+        request (HttpRequest): The request whose cart is being read or written.
+    """
+    def __init__(self, request: HttpRequest):
+        self._request = request
+
+    def load(self, name: str):
+        """Returns the cart stored under the given name or None if there isn't one."""
+        raise NotImplementedError("Subclasses of BaseCartStorage must provide a load() method")
+
+    def save(self, name: str, cart: dict) -> None:
+        """Stores the cart under the given name."""
+        raise NotImplementedError("Subclasses of BaseCartStorage must provide a save() method")
+
+    def delete(self, name: str) -> None:
+        """Deletes the cart stored under the given name."""
+        raise NotImplementedError("Subclasses of BaseCartStorage must provide a delete() method")
+
+    async def aload(self, name: str):
+        return await sync_to_async(self.load)(name)
+
+    async def asave(self, name: str, cart: dict) -> None:
+        await sync_to_async(self.save)(name, cart)
+
+    async def adelete(self, name: str) -> None:
+        await sync_to_async(self.delete)(name)
+
+
+class SessionCartStorage(BaseCartStorage):
+    """Stores the cart inside the django session, using whichever `SESSION_ENGINE` is configured."""
+
+    def load(self, name: str):
+        return self._request.session.get(name)
+
+    def save(self, name: str, cart: dict) -> None:
+        self._request.session[name]    = cart
+        self._request.session.modified = True
+
+    def delete(self, name: str) -> None:
+        self._request.session.pop(name, None)
+
+    async def aload(self, name: str):
+        return await self._request.session.aget(name)
+
+    async def asave(self, name: str, cart: dict) -> None:
+        await self._request.session.aset(name, cart)
+        self._request.session.modified = True
+
+    async def adelete(self, name: str) -> None:
+        await self._request.session.apop(name, None)
+
+
+class CacheCartStorage(BaseCartStorage):
+    """
+    Stores the cart in a django cache (local-memory, Redis, ...) keyed by the session key.
+
+    The cart expires together with the session (`SESSION_COOKIE_AGE`). A session is only
+    created when a cart is saved, so loading the cart of a new visitor never writes a session.
+
+    Args:
+        request (HttpRequest): The request whose cart is being read or written.
+        alias (str): The cache alias the carts are stored in.
+    """
+    def __init__(self, request: HttpRequest, alias: str = CART_CACHE_ALIAS):
+        super().__init__(request)
+        self._cache = caches[alias]
+
+    def _get_key(self, name: str, create: bool = False):
+        """Returns the cache key of the cart, creating the session first if asked to."""
+        session_key = self._request.session.session_key
+
+        if session_key is None and create:
+            self._request.session.save()
+            session_key = self._request.session.session_key
+
+        return f"{name}:{session_key}" if session_key else None
+
+    async def _aget_key(self, name: str, create: bool = False):
+        """The async version of `_get_key`."""
+        session_key = self._request.session.session_key
+
+        if session_key is None and create:
+            await self._request.session.asave()
+            session_key = self._request.session.session_key
+
+        return f"{name}:{session_key}" if session_key else None
+
+    def load(self, name: str):
+        key = self._get_key(name)
+        return self._cache.get(key) if key else None
+
+    def save(self, name: str, cart: dict) -> None:
+        self._cache.set(self._get_key(name, create=True), cart, timeout=settings.SESSION_COOKIE_AGE)
+
+    def delete(self, name: str) -> None:
+        key = self._get_key(name)
+        if key:
+            self._cache.delete(key)
+
+    async def aload(self, name: str):
+        key = await self._aget_key(name)
+        return await self._cache.aget(key) if key else None
+
+    async def asave(self, name: str, cart: dict) -> None:
+        await self._cache.aset(await self._aget_key(name, create=True), cart, timeout=settings.SESSION_COOKIE_AGE)
+
+    async def adelete(self, name: str) -> None:
+        key = await self._aget_key(name)
+        if key:
+            await self._cache.adelete(key)
+
+
+CART_STORAGE_BACKENDS = {
+    "session": SessionCartStorage,
+    "cached_db": SessionCartStorage,
+    "locmem": CacheCartStorage,
+    "redis": CacheCartStorage,
+}
+
+
+def get_cart_storage(request: HttpRequest) -> BaseCartStorage:
+    """
+    Returns the cart storage selected by the `CART_STORAGE_BACKEND` setting for the given request.
+
+    Raises:
+        ValueError: If the setting names a backend that doesn't exist.
+    """
+    backend = getattr(settings, "CART_STORAGE_BACKEND", "session")
+
+    try:
+        return CART_STORAGE_BACKENDS[backend](request)
+    except KeyError:
+        raise ValueError(f"Unknown cart storage backend: {backend}. Expected one of {', '.join(CART_STORAGE_BACKENDS)}")
@@ -0,0 +1,370 @@
+"""
+Streams a catalog feed (CSV or JSON Lines) into the `Product` table.
+
+The import is a pipeline of generators, so only a single batch of rows is ever held in
+memory however large the feed is:
+
+    read_rows -> batched -> validate_row -> upsert_batch
+
+Each row is matched to a product by its `sku` and upserted with
+`bulk_create(update_conflicts=True)`, so a feed can be imported again to update the
+catalog without deleting it first. The quantity of a row is the number of units on hand,
+while `Product.quantity` is the number of units still available to reserve (see
+`product.stock`), so the units held by the visitors' reservations of a product are taken
+off the quantity of its row, rather than being given away again. The image of
+a row is given by its filename and is looked up in the images directory (the product media
+directory by default), rather than being paired with a product by the order the files
+happen to be listed in. It is copied into the product media directory, where the product's
+image path points, and is resized into its variants as the batch is imported.
+
+After every committed batch the number of rows processed is written to a checkpoint file,
+an interrupted import can then be resumed from the last committed batch.
+"""
+import csv
+import json
+import logging
+import os
+import shutil
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from os.path import abspath, basename, exists, getmtime, getsize, join, splitext
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Greatest
+
+from product.image_variants import refresh_image_variants
+from product.models import Product, StockReservation
+from product.pricing import refresh_effective_prices
+from product.signals import products_bulk_updated
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE  = 1000
+FORMATS             = ("csv", "jsonl")
+IMAGE_UPLOAD_TO     = "product"
+MAX_LOGGED_ERRORS   = 20
+
+# The columns updated when a row matches an existing product
+UPDATE_FIELDS = ["name", "description", "price", "effective_price", "quantity", "image", "modified_on"]
+
+
+class RowValidationError(ValueError):
+    """Raised when a row of the catalog feed is missing a field or has an invalid value."""
+    pass
+
+
+@dataclass
+class ImportReport:
+    """The progress of a catalog import, updated after every batch."""
+    num_of_rows: int     = 0
+    num_of_imported: int = 0
+    num_of_invalid: int  = 0
+    num_of_skipped: int  = 0
+    elapsed: float       = 0.0
+    errors: list         = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return (self.num_of_rows - self.num_of_skipped) / self.elapsed if self.elapsed else 0.0
+
+
+def get_format(path: str, format: str = None) -> str:
+    """
+    Returns the format of a catalog feed, taken from its extension if not given.
+
+    Raises:
+        ValueError: If the format is not one of the supported formats.
+    """
+    format = (format or splitext(path)[1].lstrip(".")).lower()
+    format = "jsonl" if format in ("json", "ndjson") else format
+
+    if format not in FORMATS:
+        raise ValueError(f"Unsupported catalog format: {format}. Expected one of {', '.join(FORMATS)}")
+    return format
+
+
+def read_rows(path: str, format: str = None) -> Iterator[dict]:
+    """
+    Yields each row of a catalog feed as a dictionary, one at a time.
+
+    Args:
+        path (str): The path to the CSV or JSON Lines file.
+        format (str, optional): Either "csv" or "jsonl", taken from the file extension if not given.
+    """
+    format = get_format(path, format)
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if format == "csv":
+            yield from csv.DictReader(file)
+            return
+
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # yielded as is so that the row is counted and reported as invalid by `validate_row`
+                yield {"_error": f"Invalid JSON on line {line_number}: {e}"}
+
+
+def validate_row(row: dict, images_dir: str = None) -> dict:
+    """
+    Validates a row of a catalog feed and returns the product fields it holds.
+
+    Args:
+        row (dict): The row read from the feed.
+        images_dir (str, optional): If given, the image of the row must exist in this directory.
+
+    Raises:
+        RowValidationError: If the row is missing a field or has an invalid value.
+
+    Returns:
+        dict: The fields to create or update the product with.
+    """
+    if not isinstance(row, dict):
+        raise RowValidationError("The row is not an object")
+
+    if "_error" in row:
+        raise RowValidationError(row["_error"])
+
+    sku  = str(row.get("sku") or "").strip()
+    name = str(row.get("name") or "").strip()
+
+    if not sku or len(sku) > Product._meta.get_field("sku").max_length:
+        raise RowValidationError(f"Invalid sku: {sku!r}")
+
+    if not name or len(name) > Product._meta.get_field("name").max_length:
+        raise RowValidationError(f"Invalid name for sku {sku}: {name!r}")
+
+    try:
+        price = Decimal(str(row.get("price"))).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        raise RowValidationError(f"Invalid price for sku {sku}: {row.get('price')!r}")
+
+    if not (0 <= price < Decimal("1000000")):
+        raise RowValidationError(f"The price for sku {sku} is out of range: {price}")
+
+    try:
+        quantity = int(row.get("quantity"))
+    except (TypeError, ValueError):
+        raise RowValidationError(f"Invalid quantity for sku {sku}: {row.get('quantity')!r}")
+
+    if not (0 <= quantity <= 32767):
+        raise RowValidationError(f"The quantity for sku {sku} is out of range: {quantity}")
+
+    image = basename(str(row.get("image") or "").strip())
+
+    if not image:
+        raise RowValidationError(f"Missing image filename for sku {sku}")
+
+    if images_dir and not exists(join(images_dir, image)):
+        raise RowValidationError(f"The image {image} for sku {sku} was not found in {images_dir}")
+
+    return {"sku": sku,
+            "name": name,
+            "description": str(row.get("description") or "").strip(),
+            "price": price,
+            "quantity": quantity,
+            "image": f"{IMAGE_UPLOAD_TO}/{image}",
+            }
+
+
+def copy_images(rows: list, images_dir: str) -> None:
+    """
+    Copies the images of a batch of validated rows from the images directory into the product
+    media directory, which is where the image paths stored with the products point.
+
+    Does nothing when the images directory is the product media directory. An image that is
+    already there with the same size and modification time is not copied again.
+    """
+    media_dir = join(settings.MEDIA_ROOT, IMAGE_UPLOAD_TO)
+
+    if abspath(images_dir) == abspath(media_dir):
+        return
+
+    os.makedirs(media_dir, exist_ok=True)
+
+    for image in {basename(row["image"]) for row in rows}:
+        source, target = join(images_dir, image), join(media_dir, image)
+
+        if exists(target) and getsize(target) == getsize(source) and getmtime(target) == getmtime(source):
+            continue
+        shutil.copy2(source, target)
+
+
+def batched(iterable: Iterable, batch_size: int) -> Iterator[list]:
+    """Yields lists of up to `batch_size` items taken from an iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def upsert_batch(fields: list) -> int:
+    """
+    Creates or updates the products of a batch of validated rows in one transaction.
+
+    Rows sharing a sku within the batch are collapsed, the last one wins. The units reserved
+    for the visitors' carts are taken off the quantity of the products that have any, floored
+    at 0. Once the batch is committed `products_bulk_updated` is sent with the ids of its products.
+
+    Returns:
+        int: The number of products created or updated.
+    """
+    products = {row["sku"]: Product(effective_price=row["price"], **row) for row in fields}
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products.values(),
+                                    update_conflicts=True,
+                                    unique_fields=["sku"],
+                                    update_fields=UPDATE_FIELDS,
+                                    )
+
+        # The upsert sets the effective price to the base price, which is only wrong for discounted products
+        refresh_effective_prices(Product.objects.filter(sku__in=list(products), discount__isnull=False))
+
+        # Every reservation not released yet, expired or not, as releasing it puts its units back
+        reserved = (StockReservation.objects.filter(product=OuterRef("pk"))
+                                            .values("product")
+                                            .annotate(total=Sum("quantity"))
+                                            .values("total"))
+
+        reserved_ids = StockReservation.objects.filter(product__sku__in=list(products)).values("product_id")
+        Product.objects.filter(pk__in=reserved_ids).update(quantity=Greatest(F("quantity") - Subquery(reserved), Value(0)))
+
+        product_ids = list(Product.objects.filter(sku__in=list(products)).values_list("id", flat=True))
+        transaction.on_commit(lambda: products_bulk_updated.send(sender=Product,
+                                                                 queryset=Product.objects.filter(pk__in=product_ids),
+                                                                 fields=UPDATE_FIELDS,
+                                                                 product_ids=product_ids,
+                                                                 ))
+
+    return len(products)
+
+
+def read_checkpoint(checkpoint_path: str, path: str) -> int:
+    """
+    Returns the number of rows of a feed that were committed by a previous import, or 0 if
+    there is no checkpoint for this feed. A checkpoint is ignored if the feed has changed since.
+    """
+    if not checkpoint_path or not exists(checkpoint_path):
+        return 0
+
+    with open(checkpoint_path) as file:
+        checkpoint = json.load(file)
+
+    if checkpoint.get("path") != os.path.abspath(path) or checkpoint.get("size") != getsize(path):
+        logger.warning(f"[*] Ignoring the checkpoint {checkpoint_path}, it belongs to another feed")
+        return 0
+
+    return checkpoint.get("num_of_rows", 0)
+
+
+def write_checkpoint(checkpoint_path: str, path: str, num_of_rows: int) -> None:
+    """Records the number of rows of a feed that have been committed, replacing the file atomically."""
+    temp_path = f"{checkpoint_path}.tmp"
+
+    with open(temp_path, "w") as file:
+        json.dump({"path": os.path.abspath(path), "size": getsize(path), "num_of_rows": num_of_rows}, file)
+
+    os.replace(temp_path, checkpoint_path)
+
+
+def import_catalog(path: str,
+                   format: str = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE,
+                   images_dir: str = None,
+                   checkpoint_path: str = None,
+                   resume: bool = False,
+                   on_progress: Callable[[ImportReport], None] = None,
+                   generate_images: bool = True,
+                   ) -> ImportReport:
+    """
+    Imports a catalog feed into the `Product` table in batches.
+
+    Invalid rows are counted and logged and don't stop the import.
+
+    Args:
+        path (str): The path to the CSV or JSON Lines feed.
+        format (str, optional): Either "csv" or "jsonl", taken from the file extension if not given.
+        batch_size (int): The number of rows upserted per transaction.
+        images_dir (str, optional): The directory the images must exist in, they are copied into
+                                    the product media directory. Defaults to the product media
+                                    directory.
+        checkpoint_path (str, optional): A file the progress is recorded to after every batch.
+        resume (bool): Skip the rows committed by a previous import of the same feed, as
+                       recorded in `checkpoint_path`.
+        on_progress (Callable, optional): Called with the report after every batch.
+        generate_images (bool): Generate the resized variants of the images of every batch in a
+                                process pool (see `product.image_variants`).
+
+    Raises:
+        ValueError: If the format is unsupported or the batch size isn't positive.
+
+    Returns:
+        ImportReport: The number of rows read, imported, invalid and skipped and the time taken.
+
+    Example Usage:
+
+        ```python
+        from product.catalog_import import import_catalog
+
+        report = import_catalog("catalog.csv", checkpoint_path="catalog.checkpoint", resume=True)
+        print(report.num_of_imported)  # Example: 1000000
+        ```
+    """
+    if batch_size <= 0:
+        raise ValueError("The batch size must be a positive integer.")
+
+    format     = get_format(path, format)
+    images_dir = images_dir or join(settings.MEDIA_ROOT, IMAGE_UPLOAD_TO)
+    report     = ImportReport()
+    start      = perf_counter()
+
+    if resume:
+        report.num_of_skipped = report.num_of_rows = read_checkpoint(checkpoint_path, path)
+
+    rows = islice(read_rows(path, format), report.num_of_skipped, None)
+
+    # A single pool of workers resizes the images of every batch
+    with ProcessPoolExecutor() if generate_images else nullcontext() as executor:
+        for batch in batched(rows, batch_size):
+            valid_rows = []
+
+            for row_number, row in enumerate(batch, start=report.num_of_rows + 1):
+                try:
+                    valid_rows.append(validate_row(row, images_dir))
+                except RowValidationError as e:
+                    report.num_of_invalid += 1
+                    if len(report.errors) < MAX_LOGGED_ERRORS:
+                        report.errors.append(f"Row {row_number}: {e}")
+                        logger.warning(f"[-] {report.errors[-1]}")
+
+            if valid_rows:
+                copy_images(valid_rows, images_dir)
+                report.num_of_imported += upsert_batch(valid_rows)
+
+                if generate_images:
+                    refresh_image_variants(Product.objects.filter(sku__in=[row["sku"] for row in valid_rows]), executor)
+
+            report.num_of_rows += len(batch)
+            report.elapsed      = perf_counter() - start
+
+            if checkpoint_path:
+                write_checkpoint(checkpoint_path, path, report.num_of_rows)
+
+            if on_progress:
+                on_progress(report)
+
+    logger.info(f"[+] Imported {report.num_of_imported} of {report.num_of_rows} rows from {path} "
+                f"({report.num_of_invalid} invalid, {report.rows_per_second:.0f} rows/sec)")
+    return report
@@ -0,0 +1,153 @@
+import heapq
+import logging
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from product.models import Discount
+
+
+logger = logging.getLogger(__name__)
+
+# How many stale items the expiry heap may hold on top of one per cached discount before it is rebuilt
+HEAP_COMPACTION_SLACK = 64
+
+
+class DiscountCodeCache:
+    """
+    An in-process cache mapping a discount code to its (unexpired) `Discount`.
+
+    Redeeming a discount code is a public, easily spammed lookup so the cache keeps the
+    database out of the way for both valid and invalid codes:
+
+        - A found discount is cached until its `end_date`. The cached discounts are kept in
+          a heap ordered by their `end_date`, which is checked before every lookup so that a
+          discount is evicted exactly when it expires without scanning the whole cache.
+          Every load of a code is given a new generation, a heap item only evicts the entry
+          of its own generation and stale items are dropped as they are popped. Once stale
+          items outnumber the cached discounts (by `HEAP_COMPACTION_SLACK`) the heap is
+          rebuilt from the entries, so reloading the same codes can't grow it without bound.
+        - A code that doesn't belong to any unexpired discount is cached as a miss for
+          `negative_ttl` seconds. At most `max_negative_entries` misses are held, the oldest
+          are dropped first, so spamming random codes can't grow the cache without bound.
+
+    Every entry also lives for at most `ttl` seconds, which bounds how stale the cache can be
+    in the other processes. Both the discounts and the misses are kept in the order they were
+    loaded, which is the order they expire in, so the expired ones are dropped from the front
+    before every lookup. The cache of the current process is cleared as soon as a discount is
+    saved or deleted (see `product.signals`).
+    """
+    def __init__(self, ttl: float = 60, negative_ttl: float = 30, max_negative_entries: int = 10000):
+        self._ttl                  = ttl
+        self._negative_ttl         = negative_ttl
+        self._max_negative_entries = max_negative_entries
+        self._entries              = OrderedDict()
+        self._negative_entries     = OrderedDict()
+        self._expiry_heap          = []
+        self._generation           = 0
+        self._lock                 = Lock()
+
+    @staticmethod
+    def normalise_code(code) -> str:
+        """
+        Strips the whitespace around a discount code received from the client.
+
+        Raises:
+            ValueError: If the code is not a non-empty string.
+        """
+        if not isinstance(code, str) or not code.strip():
+            raise ValueError("The discount code must be a non-empty string")
+        return code.strip()
+
+    def get(self, code: str):
+        """
+        Returns the unexpired discount for a given code or None if there isn't one.
+
+        The returned discount may not have started yet, use `Discount.is_active` to check
+        whether it can be redeemed now.
+
+        Args:
+            code (str): The discount code to look up.
+
+        Raises:
+            ValueError: If the code is not a non-empty string.
+        """
+        code         = self.normalise_code(code)
+        current_time = monotonic()
+
+        with self._lock:
+            self._evict_expired(current_time)
+
+            entry = self._entries.get(code)
+            if entry is not None and entry[0] > current_time:
+                return entry[1]
+
+            expires_at = self._negative_entries.get(code)
+            if expires_at is not None and expires_at > current_time:
+                return None
+
+        discount = Discount.get_unexpired_by_code(code)
+
+        with self._lock:
+            if discount is None:
+                self._negative_entries[code] = current_time + self._negative_ttl
+                self._negative_entries.move_to_end(code)
+
+                while len(self._negative_entries) > self._max_negative_entries:
+                    self._negative_entries.popitem(last=False)
+            else:
+                self._generation += 1
+                self._negative_entries.pop(code, None)
+                self._entries[code] = (current_time + self._ttl, discount, self._generation)
+                self._entries.move_to_end(code)
+                heapq.heappush(self._expiry_heap, (discount.end_date, self._generation, code))
+
+                if len(self._expiry_heap) > 2 * len(self._entries) + HEAP_COMPACTION_SLACK:
+                    self._compact_heap()
+
+        logger.debug(f"Discount cache loaded code {code}, found: {discount is not None}")
+        return discount
+
+    def _evict_expired(self, current_time: float) -> None:
+        """
+        Drops every cached discount and miss that outlived the ttl and every cached discount whose
+        `end_date` has passed. Must be called with the lock held.
+
+        Heap items whose entry has since been reloaded or dropped are discarded as they are popped.
+        """
+        while self._entries and next(iter(self._entries.values()))[0] <= current_time:
+            self._entries.popitem(last=False)
+
+        while self._negative_entries and next(iter(self._negative_entries.values())) <= current_time:
+            self._negative_entries.popitem(last=False)
+
+        current_date = now()
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= current_date:
+            _, generation, code = heapq.heappop(self._expiry_heap)
+            entry               = self._entries.get(code)
+
+            if entry is not None and entry[2] == generation:
+                del self._entries[code]
+
+    def _compact_heap(self) -> None:
+        """Rebuilds the expiry heap from the cached discounts, dropping the stale items. Must be called with the lock held."""
+        self._expiry_heap = [(discount.end_date, generation, code) for code, (_, discount, generation) in self._entries.items()]
+        heapq.heapify(self._expiry_heap)
+
+    def invalidate(self) -> None:
+        """Drops every cached discount and every cached miss."""
+        with self._lock:
+            self._entries.clear()
+            self._negative_entries.clear()
+            self._expiry_heap.clear()
+
+
+discount_cache = DiscountCodeCache(ttl=getattr(settings, "DISCOUNT_CACHE_TTL", 60),
+                                   negative_ttl=getattr(settings, "DISCOUNT_CACHE_NEGATIVE_TTL", 30),
+                                   max_negative_entries=getattr(settings, "DISCOUNT_CACHE_MAX_NEGATIVE_ENTRIES", 10000),
+                                   )
@@ -0,0 +1,159 @@
+"""
+Mints large numbers of single-use discount codes for a campaign.
+
+Every code becomes its own single-use `Discount` (see `Discount.is_single_use`), named after
+the campaign and the code. The codes are
+generated in batches, each batch is:
+
+    1. Generated with a CSPRNG and de-duplicated in memory, against itself and every code
+       already minted by this run.
+    2. Checked against the database with a single `code__in` query per chunk, any code that
+       is already taken is replaced.
+    3. Written with `bulk_create` in one transaction.
+
+`Discount.code` is unique, so a code minted by another process between the check and the
+write makes the batch fail as a whole, in which case it is regenerated.
+"""
+import logging
+
+from dataclasses import dataclass
+from datetime import datetime
+from time import perf_counter
+
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+
+from product.discount_cache import discount_cache
+from product.models import Discount
+from utils.discount import DEFAULT_ALPHABET, GROUP_SIZE, create_discount_codes
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+MAX_RETRIES        = 5
+
+# `code__in` lookups are split into chunks so they stay under the database's parameter limit
+LOOKUP_CHUNK_SIZE  = 900
+
+
+@dataclass
+class CodeGenerationReport:
+    """The outcome of a `generate_discount_codes` run."""
+    codes: list
+    num_of_collisions: int
+    elapsed: float
+
+    @property
+    def codes_per_second(self) -> float:
+        return len(self.codes) / self.elapsed if self.elapsed else 0.0
+
+
+def get_taken_codes(codes) -> set:
+    """Returns the codes out of the given codes that already belong to a discount."""
+    codes = list(codes)
+    taken = set()
+
+    for start in range(0, len(codes), LOOKUP_CHUNK_SIZE):
+        chunk = codes[start:start + LOOKUP_CHUNK_SIZE]
+        taken.update(Discount.objects.filter(code__in=chunk).values_list("code", flat=True))
+
+    return taken
+
+
+def generate_discount_codes(name: str,
+                            discount,
+                            end_date: datetime,
+                            num_of_codes: int,
+                            start_date: datetime = None,
+                            length: int = 20,
+                            alphabet: str = DEFAULT_ALPHABET,
+                            batch_size: int = DEFAULT_BATCH_SIZE,
+                            ) -> CodeGenerationReport:
+    """
+    Creates a given number of discounts, each with its own unique code.
+
+    Args:
+        name (str): The name of the campaign, each discount is named `<name>-<code>`.
+        discount (Decimal | int): The percentage taken off by each discount.
+        end_date (datetime): When the discounts expire.
+        num_of_codes (int): The number of discounts to create.
+        start_date (datetime, optional): When the discounts start, defaults to now.
+        length (int): The length of each code, excluding the dashes.
+        alphabet (str): The characters the codes are made of.
+        batch_size (int): The number of discounts created per transaction.
+
+    Raises:
+        ValueError: If the codes wouldn't fit in `Discount.code` or the arguments are invalid.
+        IntegrityError: If a batch still collides with codes minted elsewhere after `MAX_RETRIES` attempts.
+
+    Returns:
+        CodeGenerationReport: The created codes, the number of collisions and the time taken.
+
+    Example Usage:
+
+        ```python
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from product.discount_codes import generate_discount_codes
+
+        report = generate_discount_codes("black-friday", 20, now() + timedelta(days=3), 100000)
+        print(report.codes_per_second)  # Example: 25000.0
+        ```
+    """
+    max_length = Discount._meta.get_field("code").max_length
+    if length + (length - 1) // GROUP_SIZE > max_length:
+        raise ValueError(f"Codes of length {length} don't fit in a discount code of at most {max_length} characters.")
+
+    if batch_size <= 0:
+        raise ValueError("The batch size must be a positive integer.")
+
+    if not (0 <= discount <= 100):
+        raise ValueError("Discount must be between 0 and 100.")
+
+    if num_of_codes > len(set(alphabet)) ** length:
+        raise ValueError(f"Only {len(set(alphabet)) ** length} distinct codes of length {length} can be made from this alphabet.")
+
+    start_date        = start_date or now()
+    minted            = []
+    seen              = set()
+    num_of_collisions = 0
+    start             = perf_counter()
+
+    while len(minted) < num_of_codes:
+        num_in_batch = min(batch_size, num_of_codes - len(minted))
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            batch = set()
+
+            while len(batch) < num_in_batch:
+                candidates = create_discount_codes(num_in_batch - len(batch), length, alphabet) - seen
+                taken      = get_taken_codes(candidates)
+
+                num_of_collisions += (num_in_batch - len(batch)) - len(candidates) + len(taken)
+                seen.update(candidates)
+                batch.update(candidates - taken)
+
+            try:
+                with transaction.atomic():
+                    Discount.objects.bulk_create([Discount(name=f"{name}-{code}",
+                                                           discount=discount,
+                                                           code=code,
+                                                           start_date=start_date,
+                                                           end_date=end_date,
+                                                           is_single_use=True,
+                                                           ) for code in batch])
+                break
+            except IntegrityError:
+                logger.warning(f"[*] A batch of discount codes collided with codes minted elsewhere, attempt {attempt} of {MAX_RETRIES}")
+                if attempt == MAX_RETRIES:
+                    raise
+
+        minted.extend(batch)
+
+    # `bulk_create` doesn't send `post_save`, a new code may still be cached as a miss
+    discount_cache.invalidate()
+
+    report = CodeGenerationReport(codes=minted, num_of_collisions=num_of_collisions, elapsed=perf_counter() - start)
+    logger.info(f"[*] Minted {len(minted)} discount codes for {name} at {report.codes_per_second:.0f} codes/sec")
+    return report
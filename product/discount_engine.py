@@ -0,0 +1,120 @@
+"""
+Applies and reverts a `Discount` across many products at once.
+
+`Discount.apply_discount` works on a single product and saves it, which means one full-row
+UPDATE (and a run of `Product.save`) per product. The functions here instead issue a single,
+set-based UPDATE using `F()` expressions inside one transaction, so that applying a sitewide
+sale is one statement no matter how large the catalog is.
+
+Neither function touches the base `Product.price`, only the linked discount and the
+materialized `Product.effective_price` (see `product.pricing`).
+
+`Product.is_discount_applied` makes both operations idempotent: a discount is only applied to
+products that don't have a discount applied yet, and only reverted from products that do.
+"""
+import logging
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Round
+from django.utils.timezone import now
+
+from product.models import Discount, Product
+from product.signals import products_bulk_updated
+from utils.custom_errors import DiscountExpiredError
+
+
+logger = logging.getLogger(__name__)
+
+# The columns changed by applying or reverting a discount
+DISCOUNT_FIELDS = ["effective_price", "discount", "has_discount", "is_discount_applied", "modified_on"]
+
+
+def _get_price_multiplier(discount: Discount) -> Value:
+    """Returns the factor the price is multiplied by to apply the discount e.g 0.75 for a 25% discount."""
+    multiplier = (Decimal(100) - Decimal(discount.discount)) / Decimal(100)
+    return Value(multiplier, output_field=DecimalField(max_digits=10, decimal_places=4))
+
+
+def apply_discount_to_products(discount: Discount, queryset=None) -> int:
+    """
+    Applies a discount to every product in a queryset with a single UPDATE.
+
+    Products that already have a discount applied are left untouched, so calling the
+    function again with the same queryset doesn't compound the discount.
+
+    Args:
+        discount (Discount): The discount to apply.
+        queryset (QuerySet, optional): The products to apply the discount to. Defaults to the
+                                       products linked to the discount.
+
+    Raises:
+        DiscountExpiredError: If the discount has expired.
+
+    Returns:
+        int: The number of products the discount was applied to.
+
+    Example Usage:
+
+        ```python
+        from product.models import Discount, Product
+        from product.discount_engine import apply_discount_to_products
+
+        # Apply a sitewide sale
+        discount = Discount.objects.get(name="save25%")
+        apply_discount_to_products(discount, Product.objects.all())  # Example: 100000
+        ```
+    """
+    if discount.is_expired():
+        raise DiscountExpiredError("The discount has expired. Please try another code.")
+
+    queryset = discount.products.all() if queryset is None else queryset
+
+    # A discount that hasn't started yet is linked now and priced in by `refresh_effective_prices`
+    effective_price = Round(F("price") * _get_price_multiplier(discount), 2) if discount.is_active() else F("price")
+
+    with transaction.atomic():
+        num_of_changed_rows = queryset.filter(is_discount_applied=False).update(
+            effective_price=effective_price,
+            discount=discount,
+            has_discount=True,
+            is_discount_applied=True,
+            modified_on=now(),
+        )
+        transaction.on_commit(lambda: products_bulk_updated.send(sender=Product, queryset=queryset, fields=DISCOUNT_FIELDS))
+
+    logger.info(f"[*] Applied discount {discount.name} to {num_of_changed_rows} product(s)")
+    return num_of_changed_rows
+
+
+def revert_discount_from_products(discount: Discount, queryset=None) -> int:
+    """
+    Reverts a discount from every product in a queryset with a single UPDATE.
+
+    Only products that have this discount applied are changed, their effective price is
+    reset to their base price.
+
+    Args:
+        discount (Discount): The discount to revert.
+        queryset (QuerySet, optional): The products to revert the discount from. Defaults to the
+                                       products linked to the discount.
+
+    Returns:
+        int: The number of products the discount was reverted from.
+    """
+    queryset = discount.products.all() if queryset is None else queryset
+
+    with transaction.atomic():
+        num_of_changed_rows = queryset.filter(discount=discount, is_discount_applied=True).update(
+            effective_price=F("price"),
+            discount=None,
+            has_discount=False,
+            is_discount_applied=False,
+            modified_on=now(),
+        )
+        transaction.on_commit(lambda: products_bulk_updated.send(sender=Product, queryset=queryset, fields=DISCOUNT_FIELDS))
+
+    logger.info(f"[*] Reverted discount {discount.name} from {num_of_changed_rows} product(s)")
+    return num_of_changed_rows
@@ -0,0 +1,154 @@
+"""
+Redeems a discount code against a visitor's cart.
+
+Redeeming a code is a public endpoint that is easy to spam with guessed codes, so:
+
+    - the code is looked up through the in-process discount cache (see `product.discount_cache`),
+      which only queries the unique (indexed) `Discount.code` column on a miss and caches both
+      found codes and misses.
+    - every visitor (session) may only make `DISCOUNT_REDEMPTION_RATE_LIMIT` attempts per
+      `DISCOUNT_REDEMPTION_RATE_WINDOW` seconds, counted in the `DISCOUNT_REDEMPTION_CACHE_ALIAS`
+      cache, whether the attempts succeed or not. A client dropping its session cookie gets a
+      new session, so the attempts are also counted per client IP, up to
+      `DISCOUNT_REDEMPTION_IP_RATE_LIMIT` (higher, as many visitors can share an IP).
+
+A redeemed discount is only attached to the cart (see `CartRequestSession.set_discount`) and is
+taken off the cart's subtotal when the cart is priced (see `product.cart_pricing`). Neither
+`Product.price` nor `Product.effective_price` are ever changed. The code of a discount linked to
+products can't be redeemed against the cart, it is already taken off the effective price of
+those products and would be taken off twice.
+
+A single-use code (see `Discount.is_single_use`) is claimed by the first session that redeems it,
+with a conditional `UPDATE` so two sessions redeeming the same code at once can't both claim it.
+The session that claimed the code may redeem it again, e.g. after its cart was emptied.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.timezone import now
+
+from product.discount_cache import discount_cache
+from product.models import Discount
+from utils.custom_errors import InvalidDiscountCodeError, RateLimitExceededError
+
+
+logger = logging.getLogger(__name__)
+
+
+def _count_attempt(key: str) -> int:
+    """Counts an attempt under the given key within the current window and returns the attempts of the window."""
+    cache  = caches[getattr(settings, "DISCOUNT_REDEMPTION_CACHE_ALIAS", "default")]
+    window = getattr(settings, "DISCOUNT_REDEMPTION_RATE_WINDOW", 60)
+
+    # The window starts with the first attempt, `add` is a no-op if the counter already exists
+    cache.add(key, 0, timeout=window)
+
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter expired between `add` and `incr`, this attempt starts a new window
+        cache.add(key, 1, timeout=window)
+        return 1
+
+
+def check_rate_limit(session_key: str, client_ip: str = None) -> int:
+    """
+    Counts a redemption attempt of a visitor within the current window, per session and per client IP.
+
+    Args:
+        session_key (str): The session key of the visitor.
+        client_ip (str, optional): The IP address the request came from.
+
+    Raises:
+        RateLimitExceededError: If the visitor, or their IP, has already used up every attempt of the window.
+
+    Returns:
+        int: The number of attempts the visitor has made within the window, this one included.
+    """
+    limit           = getattr(settings, "DISCOUNT_REDEMPTION_RATE_LIMIT", 5)
+    num_of_attempts = _count_attempt(f"discount_redemption_attempts:{session_key}")
+
+    if num_of_attempts > limit:
+        logger.warning(f"[-] Session {session_key[:8]}.. exceeded {limit} discount code attempts")
+        raise RateLimitExceededError("Too many discount codes were tried, please wait a minute and try again")
+
+    if client_ip:
+        ip_limit = getattr(settings, "DISCOUNT_REDEMPTION_IP_RATE_LIMIT", 20)
+
+        if _count_attempt(f"discount_redemption_attempts:ip:{client_ip}") > ip_limit:
+            logger.warning(f"[-] IP {client_ip} exceeded {ip_limit} discount code attempts")
+            raise RateLimitExceededError("Too many discount codes were tried, please wait a minute and try again")
+
+    return num_of_attempts
+
+
+def claim_single_use_discount(discount, session_key: str) -> bool:
+    """
+    Claims a single-use discount for a visitor, unless another visitor has already claimed it.
+
+    Args:
+        discount (Discount): The single-use discount.
+        session_key (str): The session key of the visitor.
+
+    Returns:
+        bool: True if the visitor claimed the discount, now or before, False otherwise.
+    """
+    num_of_claimed = Discount.objects.filter(pk=discount.pk, redeemed_by="").update(redeemed_by=session_key, redeemed_on=now())
+
+    if num_of_claimed:
+        return True
+
+    return Discount.objects.filter(pk=discount.pk, redeemed_by=session_key).exists()
+
+
+def redeem_discount_code(cart, code: str, client_ip: str = None):
+    """
+    Validates a discount code against a cart and attaches its discount to the cart.
+
+    Args:
+        cart (CartRequestSession): The cart of the visitor, the visitor must have a session.
+        code (str): The discount code sent by the visitor.
+        client_ip (str, optional): The IP address the request came from, rate limited too.
+
+    Raises:
+        RateLimitExceededError: If the visitor, or their IP, has tried too many codes.
+        InvalidDiscountCodeError: If the cart is empty, the code doesn't belong to a discount
+                                  that is active now, the discount is linked to products or it is
+                                  a single-use discount already redeemed by another visitor.
+        ValueError: If the code is not a non-empty string.
+
+    Returns:
+        Discount: The redeemed discount.
+
+    Example Usage:
+
+        ```python
+        from product.discount_redemption import redeem_discount_code
+        from product.views_helper import CartRequestSession
+
+        cart     = CartRequestSession(request)
+        discount = redeem_discount_code(cart, "EGBIE-GET10-OFFFI-RSTIM", request.META.get("REMOTE_ADDR"))
+        print(cart.get_pricing().discount)  # Example: Decimal("4.00")
+        ```
+    """
+    check_rate_limit(cart.session_key, client_ip)
+
+    if not cart.number_of_items_in_cart_session:
+        raise InvalidDiscountCodeError("Add a product to your cart before applying a discount code")
+
+    discount = discount_cache.get(code)
+
+    if discount is None or not discount.is_active():
+        raise InvalidDiscountCodeError("The discount code is invalid or has expired")
+
+    if discount.is_product_scoped():
+        raise InvalidDiscountCodeError("The discount code only applies to its products, whose prices already include it")
+
+    if discount.is_single_use and not claim_single_use_discount(discount, cart.session_key):
+        raise InvalidDiscountCodeError("The discount code has already been used")
+
+    cart.set_discount(discount)
+
+    logger.info(f"[+] Redeemed the discount code {discount.code} ({discount.discount}%)")
+    return discount
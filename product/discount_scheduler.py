@@ -0,0 +1,182 @@
+"""
+Acts on discounts as they start and end.
+
+A discount only changes the price of its products while it is active, but nothing in a request
+notices when a discount starts or ends. The scheduler keeps the discount boundaries (every
+upcoming `start_date` and `end_date`) in a priority queue, sleeps until the earliest one and
+then processes every boundary that is due in one batch:
+
+    - The products of a discount that has started are flagged as discounted and priced in.
+    - The products of a discount that has ended are unlinked from it and priced back at
+      their base price.
+
+Each batch is a handful of set-based UPDATEs no matter how many discounts or products it
+covers. The scheduler is run by the `run_discount_scheduler` management command.
+"""
+import heapq
+import logging
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import sleep
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from product.discount_cache import discount_cache
+from product.models import Discount, Product
+from product.pricing import refresh_effective_prices
+from product.signals import products_bulk_updated
+
+
+logger = logging.getLogger(__name__)
+
+STARTS = "start"
+ENDS   = "end"
+
+
+@dataclass(order=True, frozen=True)
+class Transition:
+    """A discount starting or ending at a given time, ordered by that time."""
+    when: datetime
+    discount_id: int = field(compare=False)
+    kind: str        = field(compare=False)
+
+
+def get_upcoming_transitions(after: datetime) -> list:
+    """
+    Returns a heap of every discount start and end that happens after the given time.
+
+    Args:
+        after (datetime): Only boundaries later than this time are returned.
+    """
+    discounts   = Discount.objects.filter(Q(start_date__gt=after) | Q(end_date__gt=after)).values_list("id", "start_date", "end_date")
+    transitions = []
+
+    for discount_id, start_date, end_date in discounts:
+        if start_date > after:
+            transitions.append(Transition(start_date, discount_id, STARTS))
+        transitions.append(Transition(end_date, discount_id, ENDS))
+
+    heapq.heapify(transitions)
+    return transitions
+
+
+def apply_transitions(started_ids, ended_ids, at: datetime = None) -> dict:
+    """
+    Updates the products of the discounts that have started and ended in one transaction.
+
+    Args:
+        started_ids (iterable): The ids of the discounts that have started.
+        ended_ids (iterable): The ids of the discounts that have ended.
+        at (datetime, optional): The time of the transitions, defaults to now.
+
+    Returns:
+        dict: The number of products that were discounted ('started') and un-discounted ('ended').
+    """
+    at          = at or now()
+    started_ids = set(started_ids) - set(ended_ids)
+    ended_ids   = set(ended_ids)
+    counts      = {"started": 0, "ended": 0}
+
+    with transaction.atomic():
+        if ended_ids:
+            counts["ended"] = Product.objects.filter(discount_id__in=ended_ids).update(
+                discount=None,
+                has_discount=False,
+                is_discount_applied=False,
+                effective_price=F("price"),
+                modified_on=at,
+            )
+
+        if started_ids:
+            started_products  = Product.objects.filter(discount_id__in=started_ids)
+            counts["started"] = (started_products.filter(Q(has_discount=False) | Q(is_discount_applied=False))
+                                                 .update(has_discount=True, is_discount_applied=True, modified_on=at))
+            refresh_effective_prices(started_products, at=at)
+
+        if counts["started"] or counts["ended"]:
+            transaction.on_commit(_invalidate_caches)
+
+    return counts
+
+
+def reconcile(at: datetime = None) -> dict:
+    """
+    Brings every product up to date with the discounts active at the given time.
+
+    Used when the scheduler starts, so that boundaries passed while it wasn't running are
+    not missed.
+    """
+    at          = at or now()
+    ended_ids   = Discount.objects.filter(end_date__lte=at, products__isnull=False).values_list("id", flat=True).distinct()
+    started_ids = Discount.objects.filter(start_date__lte=at, end_date__gt=at, products__isnull=False).values_list("id", flat=True).distinct()
+    counts      = apply_transitions(list(started_ids), list(ended_ids), at=at)
+
+    refresh_effective_prices(at=at)
+    return counts
+
+
+def _invalidate_caches() -> None:
+    """
+    Clears the caches of this process that hold discounted prices.
+
+    The web processes don't see these invalidations unless they share the catalog cache, they
+    move on to a new catalog version by themselves once the boundary has passed (see
+    `store.catalog_cache.DiscountEpoch`).
+    """
+    discount_cache.invalidate()
+    products_bulk_updated.send(sender=Product, queryset=Product.objects.all(), fields=["effective_price"])
+
+
+class DiscountScheduler:
+    """
+    Sleeps until the next discount boundary and then processes every boundary that is due.
+
+    Discounts created or changed while the scheduler is asleep are picked up the next time it
+    wakes, so it never sleeps longer than `max_sleep` seconds.
+    """
+    def __init__(self, max_sleep: float = 300):
+        self._max_sleep = max_sleep
+
+    def run_due(self, transitions: list, at: datetime) -> dict:
+        """Pops and applies every transition in the heap that is due at the given time."""
+        started_ids, ended_ids = set(), set()
+
+        while transitions and transitions[0].when <= at:
+            transition = heapq.heappop(transitions)
+            (started_ids if transition.kind == STARTS else ended_ids).add(transition.discount_id)
+
+        if not (started_ids or ended_ids):
+            return {"started": 0, "ended": 0}
+
+        counts = apply_transitions(started_ids, ended_ids, at=at)
+        logger.info(f"[*] {len(started_ids)} discount(s) started and {len(ended_ids)} ended, "
+                    f"{counts['started']} product(s) discounted and {counts['ended']} un-discounted")
+        return counts
+
+    def run(self, once: bool = False) -> None:
+        """
+        Runs the scheduler until interrupted.
+
+        Args:
+            once (bool): Only bring the products up to date and exit, without waiting for the next boundary.
+        """
+        checked_until = now()
+        counts        = reconcile(checked_until)
+        logger.info(f"[*] Reconciled discounts, {counts['started']} product(s) discounted and {counts['ended']} un-discounted")
+
+        if once:
+            return
+
+        while True:
+            transitions = get_upcoming_transitions(after=checked_until)
+            wait        = (transitions[0].when - now()).total_seconds() if transitions else self._max_sleep
+
+            sleep(max(0, min(wait, self._max_sleep)))
+
+            # The boundaries are reloaded so that discounts created while asleep are not missed
+            at = now()
+            self.run_due(get_upcoming_transitions(after=checked_until), at=at)
+            checked_until = at
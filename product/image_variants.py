@@ -0,0 +1,225 @@
+"""
+Generates the resized variants of the product images.
+
+The storefront and the cart used to serve every product image at its original size. Each
+image is now resized into several widths (`PRODUCT_IMAGE_WIDTHS`) in each of the formats in
+`PRODUCT_IMAGE_FORMATS` (WebP, with JPEG for older browsers). The browser then picks the
+smallest one that fits through `srcset` (see `Product.product_image_srcset`).
+
+The variants of a product are recorded in `Product.image_variants` as:
+
+    {"source": "product/p1.jpg",
+     "webp": {"160": "product/variants/p1-3f9a2c1e-160w.webp", "263": "product/variants/p1-3f9a2c1e-263w.webp"},
+     "jpeg": {"160": "product/variants/p1-3f9a2c1e-160w.jpg", "263": "product/variants/p1-3f9a2c1e-263w.jpg"}}
+
+The variants of every image are written to the same directory, so their names include a hash
+of the original's path as well as its stem: "a/shoe.jpg" and "b/shoe.jpg" get variants of
+their own.
+
+Resizing is CPU bound, so many images are resized in parallel in a process pool
+(`generate_variants`). A variant that already exists and is newer than its original is not
+generated again, which makes re-importing a catalog cheap. The variants of a product saved
+through the ORM (e.g. in the admin) are generated in a background thread once the save is
+committed (`refresh_image_variants_later`), so that the save never waits for the resizing.
+"""
+import hashlib
+import logging
+import os
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from os.path import basename, exists, getmtime, join, splitext
+from threading import Lock
+
+from django.conf import settings
+from django.db import connections
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from product.models import Product
+from product.signals import products_bulk_updated
+
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "product/variants"
+
+# The file extension and the Pillow save options of each format
+FORMATS = {
+    "webp": ("webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": ("jpg",  {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def get_widths() -> tuple:
+    return tuple(sorted(getattr(settings, "PRODUCT_IMAGE_WIDTHS", (160, 320, 640))))
+
+
+def get_formats() -> tuple:
+    return tuple(getattr(settings, "PRODUCT_IMAGE_FORMATS", ("webp", "jpeg")))
+
+
+def get_variant_name(image_name: str, width: int, extension: str) -> str:
+    """Returns the name of a variant of an image e.g. `"product/variants/p1-3f9a2c1e-160w.webp"`."""
+    stem   = splitext(basename(image_name))[0]
+    digest = hashlib.blake2b(image_name.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{VARIANTS_DIR}/{stem}-{digest}-{width}w.{extension}"
+
+
+def build_variants(image_name: str, media_root: str, widths: tuple, formats: tuple, force: bool = False) -> dict:
+    """
+    Resizes a single image into every width and format and returns the variants.
+
+    Widths larger than the original are skipped, the original width is used instead so that
+    the largest variant is never upscaled. Runs in the worker processes, so it only touches
+    the file system and never the database.
+
+    Args:
+        image_name (str): The name of the image relative to the media root e.g "product/p1.jpg".
+        media_root (str): The media root directory.
+        widths (tuple): The widths (in pixels) to resize the image to.
+        formats (tuple): The formats to save each width in, any of "webp" and "jpeg".
+        force (bool): Generate the variants again even if they are newer than the original.
+
+    Raises:
+        OSError: If the image can't be read or a variant can't be written.
+
+    Returns:
+        dict: The variants, see the module docstring.
+    """
+    source_path = join(media_root, image_name)
+    variants    = {"source": image_name}
+
+    os.makedirs(join(media_root, VARIANTS_DIR), exist_ok=True)
+
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original).convert("RGB")
+        targets  = sorted({min(width, original.width) for width in widths})
+
+        for format in formats:
+            extension, save_options = FORMATS[format]
+            variants[format]        = {}
+
+            for width in targets:
+                variant_name = get_variant_name(image_name, width, extension)
+                variant_path = join(media_root, variant_name)
+
+                if force or not (exists(variant_path) and getmtime(variant_path) >= getmtime(source_path)):
+                    height = round(original.height * width / original.width)
+                    original.resize((width, height), Image.Resampling.LANCZOS).save(variant_path, **save_options)
+
+                variants[format][str(width)] = variant_name
+
+    return variants
+
+
+def _build_variants_or_none(image_name: str, media_root: str, widths: tuple, formats: tuple, force: bool = False):
+    """Calls `build_variants`, returning None (rather than raising in the pool) for a missing or broken image."""
+    try:
+        return build_variants(image_name, media_root, widths, formats, force)
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning(f"[-] Couldn't generate the variants of {image_name}: {e}")
+        return None
+
+
+def generate_variants(image_names, executor: ProcessPoolExecutor = None, force: bool = False) -> dict:
+    """
+    Generates the variants of many images in parallel in a process pool.
+
+    Args:
+        image_names (iterable): The names of the images relative to the media root.
+        executor (ProcessPoolExecutor, optional): The pool to run in. A pool is created (and shut
+                                                  down) for this call only if not given, pass one
+                                                  to reuse the same workers across many calls.
+        force (bool): Generate the variants again even if they are newer than their original.
+
+    Returns:
+        dict: The variants of each image, images that couldn't be read are left out.
+    """
+    image_names = sorted(set(filter(None, image_names)))
+    options     = (settings.MEDIA_ROOT, get_widths(), get_formats(), force)
+
+    if executor is None and len(image_names) <= 1:
+        results = [_build_variants_or_none(image_name, *options) for image_name in image_names]
+
+    elif executor is None:
+        with ProcessPoolExecutor() as executor:
+            return generate_variants(image_names, executor, force)
+
+    else:
+        results = list(executor.map(_build_variants_or_none,
+                                    image_names,
+                                    *[[option] * len(image_names) for option in options],
+                                    chunksize=max(1, len(image_names) // ((os.cpu_count() or 1) * 4)),
+                                    ))
+
+    return {image_name: variants for image_name, variants in zip(image_names, results) if variants is not None}
+
+
+def refresh_image_variants(queryset=None, executor: ProcessPoolExecutor = None, force: bool = False) -> int:
+    """
+    Generates the missing variants of the given products and records them on each product.
+
+    Only products whose recorded variants don't belong to their current image are processed,
+    unless `force` is given, and products sharing an image share the same variants (one UPDATE
+    per distinct image). `products_bulk_updated` is sent with the ids of the updated products.
+
+    Args:
+        queryset (QuerySet, optional): The products to process, defaults to every product.
+        executor (ProcessPoolExecutor, optional): The pool to generate the variants in, see `generate_variants`.
+        force (bool): Generate the variants of every product again, even the ones that are up to date.
+
+    Returns:
+        int: The number of products whose variants were updated.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    stale    = {image for image, variants in queryset.values_list("image", "image_variants")
+                if image and (force or (variants or {}).get("source") != image)}
+
+    generated      = generate_variants(stale, executor, force)
+    num_of_updated = 0
+
+    for image_name, variants in generated.items():
+        num_of_updated += queryset.filter(image=image_name).update(image_variants=variants)
+
+    if num_of_updated:
+        product_ids = list(queryset.filter(image__in=list(generated)).values_list("id", flat=True))
+        products_bulk_updated.send(sender=Product,
+                                   queryset=Product.objects.filter(pk__in=product_ids),
+                                   fields=["image_variants"],
+                                   product_ids=product_ids,
+                                   )
+    return num_of_updated
+
+
+_background_executor      = None
+_background_executor_lock = Lock()
+
+
+def _get_background_executor() -> ThreadPoolExecutor:
+    """Returns the single thread the variants of saved products are generated in, starting it on first use."""
+    global _background_executor
+
+    with _background_executor_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-variants")
+        return _background_executor
+
+
+def _refresh_in_background(product_ids: list) -> int:
+    try:
+        return refresh_image_variants(Product.objects.filter(pk__in=product_ids))
+    finally:
+        # The thread's database connections are not closed by the request cycle
+        connections.close_all()
+
+
+def refresh_image_variants_later(product_ids) -> Future:
+    """
+    Generates the missing variants of the given products in a background thread, off the request path.
+
+    Args:
+        product_ids (iterable): The ids of the products.
+
+    Returns:
+        Future: Resolves to the number of products whose variants were updated.
+    """
+    return _get_background_executor().submit(_refresh_in_background, list(product_ids))
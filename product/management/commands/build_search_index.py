@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from product.search import product_search
+
+
+class Command(BaseCommand):
+    help = ("Builds the product search index of the configured backend (see PRODUCT_SEARCH_BACKEND). "
+            "The memory backend is also built on the first search, the fts5 backend creates its table and triggers.")
+
+    def handle(self, *args, **options):
+        num_of_products = product_search.build()
+        self.stdout.write(f"[+] Indexed {num_of_products} product(s) with the {type(product_search).__name__}")
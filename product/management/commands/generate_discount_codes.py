@@ -0,0 +1,42 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from product.discount_codes import DEFAULT_BATCH_SIZE, generate_discount_codes
+from utils.discount import DEFAULT_ALPHABET
+
+
+class Command(BaseCommand):
+    help = "Mints single-use discount codes for a campaign, each code is created as its own discount."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="The name of the campaign, each discount is named <name>-<code>.")
+        parser.add_argument("num_of_codes", type=int, help="The number of codes to mint.")
+        parser.add_argument("--discount", type=Decimal, required=True, help="The percentage taken off by each code.")
+        parser.add_argument("--days", type=float, default=7, help="The number of days until the codes expire. Defaults to 7.")
+        parser.add_argument("--length", type=int, default=20, help="The length of each code, excluding the dashes. Defaults to 20.")
+        parser.add_argument("--alphabet", default=DEFAULT_ALPHABET, help="The characters the codes are made of. Defaults to A-Z and 0-9.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"The number of codes written per transaction. Defaults to {DEFAULT_BATCH_SIZE}.")
+        parser.add_argument("--output", help="A file to write the minted codes to, one per line.")
+
+    def handle(self, *args, **options):
+        try:
+            report = generate_discount_codes(name=options["name"],
+                                             discount=options["discount"],
+                                             end_date=now() + timedelta(days=options["days"]),
+                                             num_of_codes=options["num_of_codes"],
+                                             length=options["length"],
+                                             alphabet=options["alphabet"],
+                                             batch_size=options["batch_size"],
+                                             )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.writelines(f"{code}\n" for code in report.codes)
+
+        self.stdout.write(f"[+] Minted {len(report.codes)} codes in {report.elapsed:.2f}s "
+                          f"({report.codes_per_second:.0f} codes/sec, {report.num_of_collisions} collisions replaced)")
@@ -0,0 +1,19 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from product.image_variants import refresh_image_variants
+
+
+class Command(BaseCommand):
+    help = "Generates the resized variants of every product image that doesn't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate the variants of every product, not only the missing ones.")
+        parser.add_argument("--workers", type=int, help="The number of worker processes. Defaults to the number of CPUs.")
+
+    def handle(self, *args, **options):
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            num_of_updated = refresh_image_variants(executor=executor, force=options["all"])
+
+        self.stdout.write(f"[+] Generated the image variants of {num_of_updated} product(s)")
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.catalog_import import DEFAULT_BATCH_SIZE, FORMATS, import_catalog
+
+
+class Command(BaseCommand):
+    help = ("Imports a CSV or JSON Lines catalog feed, creating or updating each product by its sku. "
+            "Each row needs a sku, name, description, price, quantity and image (the filename of an image in the images directory). "
+            "The quantity is the stock on hand, the units held in the visitors' carts are taken off it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The path to the catalog feed.")
+        parser.add_argument("--format", choices=FORMATS, help="The format of the feed, taken from the file extension if not given.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"The number of rows written per transaction. Defaults to {DEFAULT_BATCH_SIZE}.")
+        parser.add_argument("--images-dir", help="The directory the images are looked up in, they are copied into the product media directory. Defaults to the product media directory.")
+        parser.add_argument("--checkpoint", help="A file the progress is recorded to after every batch, defaults to <path>.checkpoint.")
+        parser.add_argument("--resume", action="store_true", help="Skip the rows committed by a previous import of the same feed.")
+        parser.add_argument("--skip-image-variants", action="store_true", help="Don't generate the resized variants of the images.")
+
+    def handle(self, *args, **options):
+        checkpoint_path = options["checkpoint"] or f"{options['path']}.checkpoint"
+
+        def report_progress(report):
+            self.stdout.write(f"[*] {report.num_of_rows} rows processed, {report.num_of_imported} imported, "
+                              f"{report.num_of_invalid} invalid ({report.rows_per_second:.0f} rows/sec)")
+
+        try:
+            report = import_catalog(options["path"],
+                                    format=options["format"],
+                                    batch_size=options["batch_size"],
+                                    images_dir=options["images_dir"],
+                                    checkpoint_path=checkpoint_path,
+                                    resume=options["resume"],
+                                    on_progress=report_progress,
+                                    generate_images=not options["skip_image_variants"],
+                                    )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"[+] Imported {report.num_of_imported} products from {report.num_of_rows} rows in {report.elapsed:.2f}s "
+                          f"({report.rows_per_second:.0f} rows/sec, {report.num_of_invalid} invalid, {report.num_of_skipped} resumed past)")
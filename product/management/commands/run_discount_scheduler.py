@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from product.discount_scheduler import DiscountScheduler
+
+
+class Command(BaseCommand):
+    help = ("Updates the products of every discount as it starts and ends. Runs until interrupted, "
+            "waking at the next discount start or end, or use --once to update the products and exit (e.g. from cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Bring the products up to date with the active discounts and exit.")
+        parser.add_argument("--max-sleep", type=float, default=300,
+                            help="The longest time (in seconds) to sleep before checking for new discounts. Defaults to 300.")
+
+    def handle(self, *args, **options):
+        scheduler = DiscountScheduler(max_sleep=options["max_sleep"])
+
+        try:
+            scheduler.run(once=options["once"])
+        except KeyboardInterrupt:
+            self.stdout.write("[*] Discount scheduler stopped")
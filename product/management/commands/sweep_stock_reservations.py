@@ -0,0 +1,27 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from product.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = ("Puts the units of every expired stock reservation back in stock. Runs once (e.g. from cron), "
+            "or use --every to keep sweeping until interrupted.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, default=None,
+                            help="Sweep every this many seconds until interrupted, rather than once.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                num_of_released = release_expired_reservations()
+                self.stdout.write(f"[+] Released {num_of_released} expired stock reservation(s)")
+
+                if not options["every"]:
+                    return
+                sleep(options["every"])
+
+        except KeyboardInterrupt:
+            self.stdout.write("[*] Stock reservation sweeper stopped")
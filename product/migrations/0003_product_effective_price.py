@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:36
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Round
+
+
+def populate_effective_price(apps, schema_editor):
+    """Prices in the currently active discount of every existing product."""
+    Discount = apps.get_model('product', 'Discount')
+    Product  = apps.get_model('product', 'Product')
+
+    now              = django.utils.timezone.now()
+    active_discounts = Discount.objects.filter(pk=OuterRef('discount_id'), start_date__lte=now, end_date__gt=now)
+    percentage       = Coalesce(Subquery(active_discounts.values('discount')[:1]), Value(0),
+                                output_field=DecimalField(max_digits=10, decimal_places=2))
+
+    Product.objects.update(effective_price=Round(F('price') * (Value(100) - percentage) / Value(100), 2))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_product_listing_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_pro_price_c9fae7_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='The price after any active discount, kept up to date by `product.pricing`', max_digits=8),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='discount',
+            name='start_date',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['effective_price', 'id'], name='product_pro_effecti_1141c1_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_codes(apps, schema_editor):
+    """
+    Gives every discount sharing its code with an older discount a code of its own, so that the
+    unique constraint can be added. The oldest discount keeps the code, the others get it with a
+    `-<n>` suffix (shortened to fit the column) that no other discount has.
+    """
+    Discount   = apps.get_model("product", "Discount")
+    max_length = Discount._meta.get_field("code").max_length
+    duplicates = Discount.objects.values("code").annotate(num_of_discounts=Count("id")).filter(num_of_discounts__gt=1)
+
+    for code in duplicates.values_list("code", flat=True):
+        for discount in Discount.objects.filter(code=code).order_by("id")[1:]:
+            suffix = 1
+
+            while True:
+                new_code = f"{code[:max_length - len(str(suffix)) - 1]}-{suffix}"
+                if not Discount.objects.filter(code=new_code).exists():
+                    break
+                suffix += 1
+
+            Discount.objects.filter(pk=discount.pk).update(code=new_code)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_product_effective_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='discount',
+            name='code',
+            field=models.CharField(max_length=23, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_discount_unique_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='The stock keeping unit, used to match rows of an imported catalog to products', max_length=64, null=True, unique=True),
+        ),
+    ]
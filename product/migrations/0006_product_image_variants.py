@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='The resized versions of the image, kept up to date by `product.image_variants`'),
+        ),
+    ]
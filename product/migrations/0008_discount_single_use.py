@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discount',
+            name='is_single_use',
+            field=models.BooleanField(default=False, help_text='A single-use code can only be redeemed by the first visitor to redeem it, see `product.discount_redemption`'),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='redeemed_by',
+            field=models.CharField(blank=True, default='', editable=False, help_text='The session key of the visitor who redeemed a single-use code', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='discount',
+            name='redeemed_on',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
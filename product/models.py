@@ -1,7 +1,14 @@
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from operator import attrgetter
+from typing import ClassVar
+
+from django.conf import settings
 from django.db import models
 from django.forms import ValidationError
 from django.utils.timezone import is_aware, make_aware, now
 
+from product.cart_pricing import get_line_total
 from utils.custom_errors import DiscountExpiredError
 
 # Create your models here.
@@ -9,10 +16,16 @@ from utils.custom_errors import DiscountExpiredError
 
 class Product(models.Model):
     name                = models.CharField(max_length=100, db_index=True)
+    sku                 = models.CharField(max_length=64, unique=True, blank=True, null=True,
+                                           help_text="The stock keeping unit, used to match rows of an imported catalog to products")
     discount            = models.ForeignKey("Discount", on_delete=models.CASCADE, related_name="products", blank=True, null=True)
     price               = models.DecimalField(max_digits=8, decimal_places=2, db_index=True)
+    effective_price     = models.DecimalField(max_digits=8, decimal_places=2, editable=False,
+                                              help_text="The price after any active discount, kept up to date by `product.pricing`")
     description         = models.TextField()
     image               = models.ImageField(upload_to="product/")
+    image_variants      = models.JSONField(default=dict, blank=True, editable=False,
+                                           help_text="The resized versions of the image, kept up to date by `product.image_variants`")
     quantity            = models.PositiveSmallIntegerField()
     has_discount        = models.BooleanField(default=False)
     is_discount_applied = models.BooleanField(default=False)
@@ -22,12 +35,44 @@ class Product(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['name', 'price']),  # Composite index on name and price for faster lookup when combined look up
+            models.Index(fields=['name', 'id']),     # Keyset pagination of the product listing ordered by name
+            models.Index(fields=['effective_price', 'id']),  # Keyset pagination of the product listing ordered by price
         ]
     
     @property
     def product_image(self):
-        """Returns the direct url path to the image."""
-        return self.image.url
+        """
+        Returns the url of the image to use as the `src` of an `<img>`. This is the JPEG variant
+        closest to `PRODUCT_IMAGE_DEFAULT_WIDTH` or the original image if it has no variants yet.
+        """
+        return self.get_image_url(self.image.name, self.image_variants)
+
+    @property
+    def product_image_srcset(self):
+        """
+        Returns the `srcset` of each format the image has variants in e.g.
+        `{"webp": "/media/product/variants/p1-160w.webp 160w, ...", "jpeg": "..."}`.
+        """
+        return self.get_image_srcset(self.image_variants)
+
+    @staticmethod
+    def get_image_url(image_name: str, variants: dict) -> str:
+        """Returns the url used by `product_image` from an image name and its variants."""
+        storage = Product._meta.get_field("image").storage
+        jpegs   = {int(width): name for width, name in ((variants or {}).get("jpeg") or {}).items()}
+
+        if not jpegs:
+            return storage.url(image_name)
+
+        default_width = getattr(settings, "PRODUCT_IMAGE_DEFAULT_WIDTH", 320)
+        return storage.url(jpegs[min(jpegs, key=lambda width: abs(width - default_width))])
+
+    @staticmethod
+    def get_image_srcset(variants: dict) -> dict:
+        """Returns the srcsets used by `product_image_srcset` from the variants of an image."""
+        storage = Product._meta.get_field("image").storage
+        return {format: ", ".join(f"{storage.url(name)} {width}w" for width, name in sorted(widths.items(), key=lambda item: int(item[0])))
+                for format, widths in (variants or {}).items() if format != "source"}
     
     @property
     def short_description(self):
@@ -39,6 +84,11 @@ class Product(models.Model):
             self.price = round(abs(self.price), 2)  
       
        self.has_discount = True if self.discount is not None else False
+
+       if self.discount is not None and self.discount.is_active():
+           self.effective_price = self.discount.get_discounted_price(self.price)
+       else:
+           self.effective_price = self.price
        
        return super().save(*args, **kwargs)
    
@@ -48,11 +98,16 @@ class Product(models.Model):
 
 class Discount(models.Model):
     
-    discount   = models.DecimalField(decimal_places=2, verbose_name="Discount in percentages", max_digits=10)
-    name       = models.CharField(max_length=100, unique=True)
-    code       = models.CharField(max_length=23, db_index=True)
-    start_date = models.DateTimeField(auto_now_add=True)
-    end_date   = models.DateTimeField()
+    discount      = models.DecimalField(decimal_places=2, verbose_name="Discount in percentages", max_digits=10)
+    name          = models.CharField(max_length=100, unique=True)
+    code          = models.CharField(max_length=23, unique=True)
+    start_date    = models.DateTimeField(default=now)
+    end_date      = models.DateTimeField()
+    is_single_use = models.BooleanField(default=False,
+                                        help_text="A single-use code can only be redeemed by the first visitor to redeem it, see `product.discount_redemption`")
+    redeemed_by   = models.CharField(max_length=40, blank=True, default="", editable=False,
+                                     help_text="The session key of the visitor who redeemed a single-use code")
+    redeemed_on   = models.DateTimeField(blank=True, null=True, editable=False)
 
     def __str__(self):
         return f"Code: {self.code}, Discount: {self.discount}%"
@@ -61,13 +116,24 @@ class Discount(models.Model):
         """Checks if a given discount has expired. Returns True for expired or False otherwise."""
         return now() > self.end_date
 
+    def is_active(self, at=None):
+        """Returns True if the discount has started and not yet expired at the given time (defaults to now)."""
+        at = at or now()
+        return self.start_date <= at < self.end_date
+
+    def get_discounted_price(self, price: Decimal) -> Decimal:
+        """Returns the given price with the discount taken off, rounded to 2 decimal places."""
+        discounted_price = Decimal(price) * (Decimal(100) - Decimal(self.discount)) / Decimal(100)
+        return discounted_price.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
     def apply_discount(self, product: Product):
         """
         
         Applies a discount to a given product instance.
 
-        This method calculates the discounted price of a product based on the 
-        percentage discount of discount model and updates the product's price instance. 
+        This method links the discount to the product, the product's base `price` is left
+        untouched and its `effective_price` is recalculated when the product is saved, so
+        applying the same discount twice doesn't compound it.
 
         Args:
             product (Product): The product instance that the discount will be applied to.
@@ -105,11 +171,12 @@ class Discount(models.Model):
 
             # Retrieve a product instance
             product_instance = Product.objects.first()
-            print(product_instance.price)  # Example: 100
+            print(product_instance.effective_price)  # Example: 100
 
             # Apply the discount
             discount.apply_discount(product_instance)
-            print(product_instance.price)  # Example: 75
+            print(product_instance.price)            # Example: 100
+            print(product_instance.effective_price)  # Example: 75
             ```
         """
         
@@ -119,11 +186,10 @@ class Discount(models.Model):
         if self.is_expired():
             raise DiscountExpiredError("The discount has expired. Please try another code.")
         
-        discount_amount = (self.discount / 100) * product.price
-        
         try:
             
-            product.price = product.price - discount_amount
+            product.discount            = self
+            product.is_discount_applied = True
             product.save()
             return True
         
@@ -145,6 +211,31 @@ class Discount(models.Model):
             return cls.objects.get(code=code)
         except cls.DoesNotExist:
             return None
+
+    @classmethod
+    def get_unexpired_by_code(cls, code):
+        """
+        Takes a given code and returns the discount with that code if it hasn't expired yet or
+        None otherwise.
+
+        Use `product.discount_cache.discount_cache.get` to look a code up without querying the database.
+
+        Args:
+            code (str): The code that will be queried against the database.
+        """
+        return (cls.objects.filter(code=code, end_date__gt=now())
+                           .annotate(has_products=models.Exists(Product.objects.filter(discount=models.OuterRef("pk"))))
+                           .first())
+
+    def is_product_scoped(self) -> bool:
+        """
+        Returns True if the discount is linked to products, it is then taken off their effective price
+        and must not be taken off a cart's total as well. Answered without a query for a discount
+        loaded by `get_unexpired_by_code`.
+        """
+        if hasattr(self, "has_products"):
+            return self.has_products
+        return self.products.exists()
     
     def clean(self):
         if not (0 <= self.discount <= 100):
@@ -158,36 +249,111 @@ class Discount(models.Model):
         super().save(*args, **kwargs)
 
 
+class StockReservation(models.Model):
+    """
+    Units of a product held for a visitor's cart until `expires_at`.
+
+    The units are taken out of `Product.quantity` when they are reserved and put back when the
+    reservation is released or expires, so `Product.quantity` is the number of units still
+    available to reserve. See `product.stock`.
+    """
+    product     = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    session_key = models.CharField(max_length=40)
+    quantity    = models.PositiveSmallIntegerField()
+    expires_at  = models.DateTimeField(db_index=True)
+    created_on  = models.DateTimeField(auto_now_add=True)
+    modified_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session_key", "product"], name="unique_stock_reservation_per_session"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for {self.session_key}"
+
+
+@dataclass(frozen=True, slots=True)
 class ProductDTO:
     """
     A Data Transfer Object (DTO) for representing product information.
 
+    The DTO is a frozen record backed by `__slots__` rather than a per-instance `__dict__`,
+    which keeps it small and cheap to build for carts with hundreds of lines. Use
+    `from_cart_lines` to hydrate an entire cart in one pass and `bulk_to_json` to
+    transform many DTOs at once for an API response.
+
     Attributes:
         id (int): The unique identifier for the product.
         name (str): The name of the product.
         description (str): A brief description of the product.
-        price (float): The price of the product.
+        price (Decimal): The price of the product.
         current_stock (int): The number of units available in stock.
         image (str): The URL or path to the product image.
         qty (int): The quantity of the product selected or added to the cart.
+        image_srcset (dict): The `srcset` of each format of the product image (see `Product.product_image_srcset`).
 
     Properties:
         is_in_stock (bool): Returns True if the product is in stock, otherwise False.
+        line_total (Decimal): The price times the quantity.
     """
-    def __init__(self, id, name, description, price, current_stock, image, qty):
-        self.id                = id
-        self.name              = name
-        self.description       = description
-        self.price             = price
-        self.current_stock     = current_stock
-        self.image             = image
-        self.qty               = qty
+    id: int
+    name: str
+    description: str
+    price: Decimal
+    current_stock: int
+    image: str
+    qty: int
+    image_srcset: dict = field(default_factory=dict)
+    
+    JSON_FIELDS: ClassVar[tuple] = ("id", "name", "description", "price", "current_stock", "qty")
     
     @property
     def is_in_stock(self):
         """Returns True if the item is in stock or false otherwise"""
         return self.current_stock > 0
     
+    @property
+    def line_total(self):
+        """Returns the total of the cart line, rounded the same way as `product.cart_pricing`"""
+        return get_line_total(self.price, self.qty)
+    
+    @classmethod
+    def from_cart_lines(cls, lines: dict, products: dict, stock: dict = None) -> list:
+        """
+        Hydrates an entire cart into a list of `ProductDTO` in a single pass.
+
+        Args:
+            lines (dict): The cart lines, mapping the product id (str) to a `[qty, price]` list.
+            products (dict): The product data for the lines, mapping the product id (int) to a
+                             dictionary with the `id`, `name`, `description`, `current_stock`
+                             and `img` keys (see `product.product_index`).
+            stock (dict, optional): The live stock level of the products, mapping the product id (int)
+                                    to the number of units, used instead of the `current_stock` of
+                                    `products` (see `product.stock_snapshot`).
+
+        Returns:
+            list: A list of `ProductDTO`, in the same order as the cart lines. Lines whose
+                  product is missing from `products` are skipped.
+        """
+        dtos  = []
+        stock = stock or {}
+        
+        for id, (qty, price) in lines.items():
+            product = products.get(int(id))
+            
+            if product is not None:
+                dtos.append(cls(product["id"], 
+                                product["name"], 
+                                product["description"], 
+                                Decimal(price), 
+                                stock.get(product["id"], product["current_stock"]), 
+                                product["img"], 
+                                qty,
+                                product.get("srcset", {}),
+                                ))
+        return dtos
+    
     def to_json(self):
         """
         Transforms a  the productDTO to a dictionary (or JSON) .
@@ -199,4 +365,23 @@ class ProductDTO:
             "price": self.price,
             "current_stock" : self.current_stock,
             "qty": self.qty,
-        }
\ No newline at end of file
+        }
+    
+    @classmethod
+    def bulk_to_json(cls, dtos: list) -> list:
+        """
+        Transforms a list of `ProductDTO` into a list of dictionaries in one go, e.g. for the
+        cart lines of an API response (see `store.views.update_basket`).
+
+        The fields of each DTO are read with a single `attrgetter` rather than a call to
+        `to_json` per DTO, and the list is left to the response to encode once.
+
+        Args:
+            dtos (list): The DTOs to transform.
+
+        Returns:
+            list: A list of dictionaries, the same as calling `to_json` on each DTO.
+        """
+        get_fields = attrgetter(*cls.JSON_FIELDS)
+        keys       = cls.JSON_FIELDS
+        return [dict(zip(keys, get_fields(dto))) for dto in dtos]
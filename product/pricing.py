@@ -0,0 +1,99 @@
+"""
+Computes the price a product is sold at from its base price and its active discount.
+
+`Product.price` is the base price and is never changed by a discount. The price a product is
+actually sold at is derived from the base price and the product's `Discount` if that discount
+is active (it has started and not yet expired). Computing it on every read would make it
+impossible to sort or filter the catalog by price with an index, so it is materialized in
+`Product.effective_price`:
+
+    - `Product.save` recalculates it for a single product.
+    - `refresh_effective_prices` recalculates it for any number of products with a single
+      set-based UPDATE, and must be run when a discount starts or expires.
+
+Both use the same rounding (half up to 2 decimal places) so they always agree.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils.timezone import now
+
+from product.models import Discount, Product
+from product.signals import products_bulk_updated
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_active_discount_percentage(at=None) -> Coalesce:
+    """
+    Returns an expression that evaluates to the percentage of a product's discount if the
+    discount is active at the given time (defaults to now), otherwise 0.
+
+    A subquery is used rather than a join through `discount__` because `QuerySet.update`
+    doesn't allow joined field references.
+    """
+    at = at or now()
+
+    active_discounts = Discount.objects.filter(pk=OuterRef("discount_id"), start_date__lte=at, end_date__gt=at)
+    return Coalesce(Subquery(active_discounts.values("discount")[:1]),
+                    Value(0),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                    )
+
+
+def get_effective_price_expression(at=None) -> Round:
+    """
+    Returns an expression that evaluates to the effective price of a product at the given time.
+
+    The price is worked out in whole cents and the percentage in hundredths of a percent, which
+    keeps the arithmetic exact on every database (SQLite truncates a division of two integers
+    and computes anything else in floating point), the cents are then rounded half up like
+    `Discount.get_discounted_price` does.
+    """
+    cents        = Cast(Round(F("price") * 100), IntegerField())
+    basis_points = Cast(Round(get_active_discount_percentage(at) * 100), IntegerField())
+    rounded      = (cents * (Value(10000) - basis_points) + Value(5000)) / Value(10000)
+
+    return Round(rounded / Value(100.0), 2, output_field=DecimalField(max_digits=8, decimal_places=2))
+
+
+def refresh_effective_prices(queryset=None, at=None) -> int:
+    """
+    Recalculates the effective price of the given products with a single UPDATE.
+
+    Only the products whose effective price has changed are written to.
+
+    Args:
+        queryset (QuerySet, optional): The products to refresh. Defaults to every product.
+        at (datetime, optional): The time used to decide which discounts are active. Defaults to now.
+
+    Returns:
+        int: The number of products whose effective price changed.
+
+    Example Usage:
+
+        ```python
+        from product.models import Discount
+        from product.pricing import refresh_effective_prices
+
+        # A discount has just expired
+        discount = Discount.objects.get(name="save25%")
+        refresh_effective_prices(discount.products.all())  # Example: 1500
+        ```
+    """
+    queryset   = Product.objects.all() if queryset is None else queryset
+    expression = get_effective_price_expression(at)
+
+    with transaction.atomic():
+        num_of_changed_rows = (queryset.alias(new_effective_price=expression)
+                                       .filter(~Q(effective_price=F("new_effective_price")))
+                                       .update(effective_price=expression))
+
+        if num_of_changed_rows:
+            transaction.on_commit(lambda: products_bulk_updated.send(sender=Product, queryset=queryset, fields=["effective_price"]))
+
+    logger.info(f"[*] Refreshed the effective price of {num_of_changed_rows} product(s)")
+    return num_of_changed_rows
@@ -0,0 +1,145 @@
+import logging
+
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+from product.models import Product
+
+
+logger = logging.getLogger(__name__)
+
+# Only the columns needed to display a cart line are loaded into the index
+INDEXED_FIELDS = ("id", "name", "description", "effective_price", "quantity", "image", "image_variants")
+
+
+class ProductIndex:
+    """
+    An in-process, TTL-bounded index of products keyed by their id.
+
+    The index allows the server to resolve a product from nothing more than its id
+    (which is all the client needs to send) instead of trusting the product data
+    posted by the browser. Each entry lives for `ttl` seconds after which the next
+    lookup reloads it from the `Product` table. Entries are also dropped as soon as the
+    product is saved or deleted (see `product.signals`) so that the index never serves
+    data older than the ttl.
+
+    Lookups for several ids are resolved with a single query for all of the ids that
+    are missing or stale.
+    """
+    def __init__(self, ttl: float = 60):
+        self._ttl     = ttl
+        self._entries = {}
+        self._lock    = Lock()
+
+    @staticmethod
+    def _to_entry(product: Product) -> dict:
+        """Converts a product instance into the dictionary that is held by the index."""
+        return {"id": product.id,
+                "name": product.name,
+                "description": product.description,
+                "price": product.effective_price,
+                "current_stock": product.quantity,
+                "img": product.product_image,
+                "srcset": product.product_image_srcset,
+                }
+
+    @staticmethod
+    def normalise_id(product_id) -> int:
+        """
+        Converts a product id received from the client into an int.
+
+        Raises:
+            ValueError: If the product id is not a valid integer.
+        """
+        try:
+            return int(product_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid product id: {product_id}")
+
+    def get(self, product_id):
+        """
+        Returns the indexed product data for a given product id or None if the product doesn't exist.
+
+        Args:
+            product_id (int | str): The id of the product to look up.
+        """
+        return self.get_many([product_id]).get(self.normalise_id(product_id))
+
+    def get_many(self, product_ids) -> dict:
+        """
+        Returns the indexed product data for each of the given ids.
+
+        Ids that are missing or whose entry has expired are loaded from the database
+        in a single query. Ids that don't belong to any product are left out of the
+        returned dictionary.
+
+        Args:
+            product_ids (iterable): The ids of the products to look up.
+
+        Returns:
+            dict: A dictionary mapping each found product id (int) to its product data.
+        """
+        found, missing, now = self._get_cached(product_ids)
+
+        if missing:
+            self._add_entries(found, Product.objects.only(*INDEXED_FIELDS).in_bulk(missing), missing, now)
+        return found
+
+    async def aget(self, product_id):
+        """The async version of `get`, used by the async views."""
+        return (await self.aget_many([product_id])).get(self.normalise_id(product_id))
+
+    async def aget_many(self, product_ids) -> dict:
+        """The async version of `get_many`, the missing products are loaded with the async ORM."""
+        found, missing, now = self._get_cached(product_ids)
+
+        if missing:
+            self._add_entries(found, await Product.objects.only(*INDEXED_FIELDS).ain_bulk(missing), missing, now)
+        return found
+
+    def _get_cached(self, product_ids) -> tuple:
+        """Returns the fresh entries of the given ids, the ids that must be loaded and the current time."""
+        ids     = {self.normalise_id(product_id) for product_id in product_ids}
+        now     = monotonic()
+        found   = {}
+        missing = []
+
+        with self._lock:
+            for product_id in ids:
+                entry = self._entries.get(product_id)
+                if entry is not None and entry[0] > now:
+                    found[product_id] = entry[1]
+                else:
+                    missing.append(product_id)
+
+        return found, missing, now
+
+    def _add_entries(self, found: dict, products: dict, missing: list, now: float) -> None:
+        """Indexes the products loaded for the missing ids and adds them to `found`."""
+        expires_at = now + self._ttl
+
+        with self._lock:
+            for product_id, product in products.items():
+                entry                     = self._to_entry(product)
+                self._entries[product_id] = (expires_at, entry)
+                found[product_id]         = entry
+
+        logger.debug(f"Product index loaded {len(products)} of {len(missing)} missing products")
+
+    def invalidate(self, product_id=None) -> None:
+        """
+        Drops a single product from the index or the entire index if no product id is given.
+
+        Args:
+            product_id (int, optional): The id of the product to drop.
+        """
+        with self._lock:
+            if product_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(product_id, None)
+
+
+product_index = ProductIndex(ttl=getattr(settings, "PRODUCT_INDEX_TTL", 60))
@@ -0,0 +1,449 @@
+"""
+Full-text search over the names and descriptions of the products.
+
+The backend is selected by the `PRODUCT_SEARCH_BACKEND` setting:
+
+    - "memory" : an in-process inverted index (the default). Every token of a product's name and
+                 description is mapped to the products it appears in, together with a weight
+                 (a token in the name counts `NAME_WEIGHT` times as much as one in the
+                 description). The tokens are also kept sorted, so the products matching a
+                 prefix are found with a binary search rather than a scan. The index is built
+                 from a single query on the first search and is then kept up to date one product
+                 at a time as products are saved or deleted (see `product.signals`). Products
+                 updated in bulk are indexed again from a single query, unless neither their
+                 name nor their description changed e.g. a price or stock update.
+    - "fts5"   : an SQLite FTS5 table indexing `product_product`, kept in sync by triggers and
+                 ranked with `bm25`. Only available on SQLite, see `SQLiteFTS5SearchBackend`.
+
+Both backends match every word of the query as a prefix of a word in the product (so results are
+found as the visitor types) and only return the products matching all of the words, best first.
+
+Without an index, searching means a `LIKE '%word%'` over both columns of every row, which no
+index can serve. See `benchmarks/bench_product_search.py`.
+"""
+import logging
+import re
+
+from bisect import bisect_left
+from heapq import nlargest
+from itertools import repeat
+from math import log
+from operator import add
+from threading import RLock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from product.models import Product
+from product.product_index import product_index
+
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN         = re.compile(r"\w+")
+NAME_WEIGHT           = 3
+DESCRIPTION_WEIGHT    = 1
+PREFIX_MATCH_FACTOR   = 0.5  # how much a prefix match counts compared to a whole word match
+MIN_PREFIX_LENGTH     = 2    # a shorter word only matches whole words
+MAX_PREFIX_EXPANSIONS = 64   # the most words a prefix is expanded to
+MAX_QUERY_TOKENS      = 8
+MAX_SEARCH_LIMIT      = 50
+BUILD_BATCH_SIZE      = 2000
+SEARCHED_FIELDS       = ("name", "description")
+
+
+def tokenize(text: str) -> list:
+    """Splits a text into its lower case words e.g. `"Red running-shoes"` -> `["red", "running", "shoes"]`."""
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+
+class InvertedIndexSearchBackend:
+    """
+    An in-process inverted index of the products' names and descriptions.
+
+    Attributes:
+        _postings (dict): Maps every token to a dictionary of the product ids it appears in and their weight.
+        _documents (dict): Maps every product id to the tokens it was indexed under, used to unindex it.
+        _tokens (list): Every token, sorted, used to find the tokens starting with a prefix.
+    """
+    def __init__(self):
+        self._postings  = {}
+        self._documents = {}
+        self._tokens    = []
+        self._is_built  = False
+        self._lock      = RLock()
+
+    @staticmethod
+    def _weigh(name: str, description: str) -> dict:
+        """Returns the weight of every token of a product."""
+        weights = {}
+
+        for token in tokenize(name):
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        return weights
+
+    def build(self) -> int:
+        """
+        (Re)builds the whole index from the `Product` table.
+
+        Returns:
+            int: The number of products indexed.
+        """
+        postings  = {}
+        documents = {}
+        rows      = Product.objects.order_by("id").values_list("id", *SEARCHED_FIELDS).iterator(chunk_size=BUILD_BATCH_SIZE)
+
+        for product_id, name, description in rows:
+            weights               = self._weigh(name, description)
+            documents[product_id] = tuple(weights)
+
+            for token, weight in weights.items():
+                postings.setdefault(token, {})[product_id] = weight
+
+        with self._lock:
+            self._postings  = postings
+            self._documents = documents
+            self._tokens    = sorted(postings)
+            self._is_built  = True
+
+        logger.info(f"[+] Built the product search index: {len(documents)} product(s), {len(postings)} token(s)")
+        return len(documents)
+
+    def _ensure_built(self) -> None:
+        if not self._is_built:
+            with self._lock:
+                if not self._is_built:
+                    self.build()
+
+    def update(self, product_id: int, name: str, description: str) -> None:
+        """Indexes a product again after it has been created or changed, a no-op until the index is built."""
+        with self._lock:
+            if not self._is_built:
+                return
+
+            self._unindex(product_id)
+
+            weights                     = self._weigh(name, description)
+            self._documents[product_id] = tuple(weights)
+
+            for token, weight in weights.items():
+                if token not in self._postings:
+                    self._postings[token] = {}
+                    self._tokens.insert(bisect_left(self._tokens, token), token)
+                self._postings[token][product_id] = weight
+
+    def reindex(self, product_ids) -> None:
+        """
+        Indexes the given products again from the `Product` table e.g. after they were updated in
+        bulk, one query per `BUILD_BATCH_SIZE` products. Products that no longer exist are unindexed.
+        A no-op until the index is built.
+        """
+        if not self._is_built:
+            return
+
+        product_ids = list(product_ids)
+
+        for start in range(0, len(product_ids), BUILD_BATCH_SIZE):
+            batch = set(product_ids[start:start + BUILD_BATCH_SIZE])
+            rows  = Product.objects.filter(pk__in=batch).values_list("id", *SEARCHED_FIELDS)
+
+            for product_id, name, description in rows:
+                self.update(product_id, name, description)
+                batch.discard(product_id)
+
+            for product_id in batch:
+                self.remove(product_id)
+
+    def remove(self, product_id: int) -> None:
+        """Unindexes a deleted product."""
+        with self._lock:
+            self._unindex(product_id)
+
+    def _unindex(self, product_id: int) -> None:
+        """Drops a product from the postings of its tokens. Must be called with the lock held."""
+        for token in self._documents.pop(product_id, ()):
+            products = self._postings.get(token)
+
+            if products is None:
+                continue
+
+            products.pop(product_id, None)
+
+            if not products:
+                del self._postings[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def invalidate(self) -> None:
+        """Drops the whole index, it is built again on the next search."""
+        with self._lock:
+            self._postings  = {}
+            self._documents = {}
+            self._tokens    = []
+            self._is_built  = False
+
+    def _expand(self, term: str) -> list:
+        """Returns the indexed tokens a query term matches: itself and, unless it is too short, the tokens it prefixes."""
+        if len(term) < MIN_PREFIX_LENGTH:
+            return [term] if term in self._postings else []
+
+        start = bisect_left(self._tokens, term)
+        end   = min(start + MAX_PREFIX_EXPANSIONS, len(self._tokens))
+
+        return [token for token in self._tokens[start:end] if token.startswith(term)]
+
+    def _get_matches(self, tokens: list):
+        """Returns the ids of the products containing any of the given tokens."""
+        if len(tokens) == 1:
+            return self._postings[tokens[0]].keys()
+        return set().union(*(self._postings[token].keys() for token in tokens))
+
+    def _get_factor(self, term: str, token: str, num_of_documents: int) -> float:
+        """
+        Returns what a token's weights are multiplied by for a query term: a token is worth more the
+        fewer products it is in, and a prefix match is worth less than a whole word.
+        """
+        factor = log(1 + num_of_documents / len(self._postings[token]))
+        return factor if token == term else factor * PREFIX_MATCH_FACTOR
+
+    def _score_term(self, term: str, tokens: list, candidates: list, num_of_documents: int):
+        """
+        Returns the score of each candidate product for a query term, in the order of the candidates.
+
+        A candidate matching several of the tokens a prefix expands to keeps its best score.
+        """
+        scores = None
+
+        for token in tokens:
+            products     = self._postings[token]
+            factor       = self._get_factor(term, token, num_of_documents)
+            token_scores = map(factor.__mul__, map(products.get, candidates, repeat(0)))
+            scores       = token_scores if scores is None else map(max, scores, token_scores)
+        return scores
+
+    def search(self, terms: list, limit: int) -> list:
+        """
+        Returns the `(product id, score)` of the best products matching every term, best first.
+
+        The products matching every term are found first with set intersections, only those are
+        scored. A common word is in tens of thousands of products, so the intersections, the
+        scoring and the ranking are all done with set operations and `map` rather than python
+        loops over the products. Products with the same score are ranked by their id.
+        """
+        self._ensure_built()
+
+        with self._lock:
+            num_of_documents = len(self._documents)
+            terms            = list(dict.fromkeys(terms))
+            expansions       = [self._expand(term) for term in terms]
+
+            if not all(expansions):
+                return []
+
+            if len(expansions) == 1 and len(expansions[0]) == 1:
+                # A single token scores every product with the same factor, the products are ranked
+                # by their weight alone and only the best are scored
+                token      = expansions[0][0]
+                products   = self._postings[token]
+                factor     = self._get_factor(terms[0], token, num_of_documents)
+                candidates = sorted(products)
+                weights    = list(map(products.__getitem__, candidates))
+                best       = nlargest(limit, range(len(candidates)), key=weights.__getitem__)
+
+                return [(candidates[index], weights[index] * factor) for index in best]
+
+            matches    = sorted((self._get_matches(tokens) for tokens in expansions), key=len)
+            candidates = matches[0]
+
+            for other_matches in matches[1:]:
+                candidates = candidates & other_matches
+
+            candidates = sorted(candidates)
+            totals     = None
+
+            for term, tokens in zip(terms, expansions):
+                scores = self._score_term(term, tokens, candidates, num_of_documents)
+                totals = list(scores) if totals is None else list(map(add, totals, scores))
+
+        best = nlargest(limit, range(len(candidates)), key=totals.__getitem__)
+        return [(candidates[index], totals[index]) for index in best]
+
+
+class SQLiteFTS5SearchBackend:
+    """
+    Searches the products through an SQLite FTS5 table.
+
+    The table is an external content table over `product_product`, so it doesn't store a copy
+    of the names and descriptions, and is kept in sync by triggers on `product_product`. It is
+    created (and filled) the first time it is needed or by the `build_search_index` command.
+    Creating a virtual table must not happen inside a transaction that may be rolled back, which
+    leaves the SQLite connection unusable.
+
+    Raises:
+        ImproperlyConfigured: If the database is not SQLite.
+    """
+    TABLE = "product_search_fts"
+
+    def __init__(self):
+        if connection.vendor != "sqlite":
+            raise ImproperlyConfigured("The fts5 product search backend requires SQLite, use the memory backend instead")
+
+        self._is_ready = False
+        self._lock     = RLock()
+
+    def _create_table(self) -> bool:
+        """Creates the FTS5 table and its triggers unless they exist. Returns True if the table was created."""
+        table = self.TABLE
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+
+            if cursor.fetchone():
+                return False
+
+            cursor.execute(f"CREATE VIRTUAL TABLE {table} USING fts5(name, description, content='product_product', content_rowid='id')")
+            cursor.execute(f"""CREATE TRIGGER {table}_insert AFTER INSERT ON product_product BEGIN
+                                   INSERT INTO {table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+                               END""")
+            cursor.execute(f"""CREATE TRIGGER {table}_delete AFTER DELETE ON product_product BEGIN
+                                   INSERT INTO {table}({table}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                               END""")
+            cursor.execute(f"""CREATE TRIGGER {table}_update AFTER UPDATE OF name, description ON product_product BEGIN
+                                   INSERT INTO {table}({table}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+                                   INSERT INTO {table}(rowid, name, description) VALUES (new.id, new.name, new.description);
+                               END""")
+        return True
+
+    def build(self) -> int:
+        """
+        Creates the FTS5 table if needed and rebuilds it from `product_product`.
+
+        Returns:
+            int: The number of products indexed.
+        """
+        with self._lock:
+            self._create_table()
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {self.TABLE}({self.TABLE}) VALUES ('rebuild')")
+
+            self._is_ready = True
+
+        num_of_products = Product.objects.count()
+        logger.info(f"[+] Built the product search FTS5 table: {num_of_products} product(s)")
+        return num_of_products
+
+    def _ensure_built(self) -> None:
+        if not self._is_ready:
+            with self._lock:
+                if not self._is_ready:
+                    if self._create_table():
+                        self.build()
+                    self._is_ready = True
+
+    def drop(self) -> None:
+        """Drops the FTS5 table and its triggers e.g. when going back to the memory backend."""
+        with self._lock, connection.cursor() as cursor:
+            for trigger in ("insert", "delete", "update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {self.TABLE}_{trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+
+            self._is_ready = False
+
+    def update(self, product_id: int, name: str, description: str) -> None:
+        """A no-op, the triggers keep the table in sync."""
+
+    def reindex(self, product_ids) -> None:
+        """A no-op, the triggers keep the table in sync."""
+
+    def remove(self, product_id: int) -> None:
+        """A no-op, the triggers keep the table in sync."""
+
+    def invalidate(self) -> None:
+        """A no-op, the triggers keep the table in sync."""
+
+    def search(self, terms: list, limit: int) -> list:
+        """Returns the `(product id, score)` of the best products matching every term, best first."""
+        self._ensure_built()
+
+        # Every term is a run of word characters, quoting it keeps it from being read as FTS5 syntax
+        query = " ".join(f'"{term}"*' for term in dict.fromkeys(terms))
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"""SELECT rowid, -bm25({self.TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) AS score
+                                 FROM {self.TABLE}
+                                WHERE {self.TABLE} MATCH %s
+                             ORDER BY score DESC, rowid
+                                LIMIT %s""", [query, limit])
+            return cursor.fetchall()
+
+
+SEARCH_BACKENDS = {
+    "memory": InvertedIndexSearchBackend,
+    "fts5": SQLiteFTS5SearchBackend,
+}
+
+
+def get_search_backend():
+    """
+    Returns a new instance of the backend selected by the `PRODUCT_SEARCH_BACKEND` setting.
+
+    Raises:
+        ValueError: If the setting names a backend that doesn't exist.
+    """
+    backend = getattr(settings, "PRODUCT_SEARCH_BACKEND", "memory")
+
+    try:
+        return SEARCH_BACKENDS[backend]()
+    except KeyError:
+        raise ValueError(f"Unknown product search backend: {backend}. Expected one of {', '.join(SEARCH_BACKENDS)}")
+
+
+def search_products(query: str, limit: int = 20, backend=None) -> list:
+    """
+    Returns the products matching a search query, best first.
+
+    Args:
+        query (str): The words to search for, each matched as a prefix e.g. "red run".
+        limit (int, optional): The most products to return, at most `MAX_SEARCH_LIMIT`.
+        backend (optional): The backend to search, defaults to `product_search`.
+
+    Raises:
+        ValueError: If the query is not a string or the limit is out of range.
+
+    Returns:
+        list: A dictionary for every product with its `id`, `name`, `price`, `img` and `score`.
+
+    Example Usage:
+
+        ```python
+        from product.search import search_products
+
+        search_products("red run", limit=5)  # Example: [{"id": 12, "name": "Red running shoes", ...}]
+        ```
+    """
+    if not isinstance(query, str):
+        raise ValueError(f"The search query must be a string but got {type(query).__name__}")
+
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f"The limit must be between 1 and {MAX_SEARCH_LIMIT}")
+
+    terms = tokenize(query)[:MAX_QUERY_TOKENS]
+
+    if not terms:
+        return []
+
+    results  = (backend or product_search).search(terms, limit)
+    products = product_index.get_many([product_id for product_id, _ in results])
+
+    return [{"id": product_id,
+             "name": products[product_id]["name"],
+             "price": products[product_id]["price"],
+             "img": products[product_id]["img"],
+             "score": round(score, 4),
+             } for product_id, score in results if product_id in products]
+
+
+product_search = get_search_backend()
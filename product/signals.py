@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from product.discount_cache import discount_cache
+from product.models import Discount, Product
+from product.product_index import product_index
+from product.search import SEARCHED_FIELDS, product_search
+from product.stock_snapshot import stock_snapshot
+
+
+# Sent after products are changed in bulk (e.g. `QuerySet.update`), which doesn't send `post_save`.
+# Receivers are passed the `queryset` of products that was updated, the `fields` that were
+# updated and the `product_ids` of the updated products, or None when the sender doesn't know them.
+products_bulk_updated = Signal()
+
+# Sent after the stock of products changes without them being saved (see `product.stock`).
+# Receivers are passed the `product_ids` whose stock changed. Nothing but the stock levels
+# changed, so unlike `products_bulk_updated` the search index is left alone.
+product_stock_changed = Signal()
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    """
+    Generates the resized variants of a product's image when the image is new or has changed,
+    in a background thread once the save is committed so that the save never waits for them.
+    """
+    if raw or not instance.image or instance.image_variants.get("source") == instance.image.name:
+        return
+
+    from product.image_variants import refresh_image_variants_later  # imported here to keep Pillow out of the app loading
+
+    product_id = instance.pk
+    transaction.on_commit(lambda: refresh_image_variants_later([product_id]))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_index(sender, instance, **kwargs):
+    """Drops a product from the in-process product index and stock snapshot whenever it is saved or deleted."""
+    product_index.invalidate(instance.pk)
+    stock_snapshot.invalidate(instance.pk)
+
+
+@receiver(product_stock_changed)
+def invalidate_stock_levels(sender, product_ids, **kwargs):
+    """Drops the stock level of the given products from the stock snapshot and the product index."""
+    for product_id in product_ids:
+        product_index.invalidate(product_id)
+        stock_snapshot.invalidate(product_id)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    """Indexes a product again in the product search index once it is saved."""
+    product_id, name, description = instance.pk, instance.name, instance.description
+    transaction.on_commit(lambda: product_search.update(product_id, name, description))
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drops a deleted product from the product search index."""
+    product_id = instance.pk
+    transaction.on_commit(lambda: product_search.remove(product_id))
+
+
+@receiver(products_bulk_updated)
+def update_search_index_on_bulk_update(sender, fields=None, product_ids=None, **kwargs):
+    """
+    Indexes the products updated in bulk again, unless neither their name nor their description
+    changed. The whole index is dropped when the updated products aren't known.
+    """
+    if fields is not None and not set(fields) & set(SEARCHED_FIELDS):
+        return
+
+    if product_ids is None:
+        product_search.invalidate()
+    else:
+        product_search.reindex(product_ids)
+
+
+@receiver(products_bulk_updated)
+def invalidate_product_index_on_bulk_update(sender, product_ids=None, **kwargs):
+    """Drops the updated products (every product if they aren't known) from the in-process product index and stock snapshot."""
+    if product_ids is None:
+        product_index.invalidate()
+        stock_snapshot.invalidate()
+        return
+
+    for product_id in product_ids:
+        product_index.invalidate(product_id)
+        stock_snapshot.invalidate(product_id)
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def invalidate_discount_cache(sender, instance, **kwargs):
+    """Clears the in-process discount code cache whenever a discount is saved or deleted."""
+    discount_cache.invalidate()
+
+
+@receiver(post_save, sender=Discount)
+def refresh_discounted_prices(sender, instance, created, **kwargs):
+    """Re-prices the products linked to a discount whenever the discount's percentage or dates change."""
+    if created:
+        return
+
+    from product.pricing import refresh_effective_prices  # imported here as `product.pricing` imports this module
+
+    refresh_effective_prices(instance.products.all())
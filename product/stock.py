@@ -0,0 +1,211 @@
+"""
+Reserves the stock of the products in the visitors' carts.
+
+When a product enters a cart its units are reserved for the visitor (their session) for
+`STOCK_RESERVATION_TTL` seconds, every change to the cart line renews the reservation. The
+reserved units are taken out of `Product.quantity`, which is therefore the number of units
+still available, and put back when the line is removed or the reservation expires.
+
+`Product.quantity` is only ever changed by a single conditional UPDATE:
+
+    UPDATE product_product SET quantity = quantity - n WHERE id = ? AND quantity >= n
+
+rather than by reading the quantity and saving it back, so when many visitors race for the
+last units the database lets exactly as many of them through as there are units left and
+the stock can never be oversold.
+
+Expired reservations are put back in stock in bulk by `release_expired_reservations`, run by
+the `sweep_stock_reservations` management command.
+"""
+import logging
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils.timezone import now
+
+from product.models import Product, StockReservation
+from product.signals import product_stock_changed
+from utils.custom_errors import InsufficientStockError
+
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = 500
+
+
+def get_reservation_ttl() -> int:
+    return getattr(settings, "STOCK_RESERVATION_TTL", 15 * 60)
+
+
+def take_stock(product_id: int, qty: int) -> bool:
+    """
+    Takes units out of a product's stock if, and only if, there are enough of them left.
+
+    Returns:
+        bool: True if the units were taken, False if the product has fewer than `qty` units left
+              (or doesn't exist).
+    """
+    return Product.objects.filter(pk=product_id, quantity__gte=qty).update(quantity=F("quantity") - qty) == 1
+
+
+def return_stock(product_id: int, qty: int) -> None:
+    """Puts units back into a product's stock."""
+    Product.objects.filter(pk=product_id).update(quantity=F("quantity") + qty)
+
+
+def set_reserved_quantity(session_key: str, product_id: int, qty: int, at: datetime = None) -> int:
+    """
+    Makes a visitor's reservation of a product hold exactly `qty` units and renews it.
+
+    Only the difference with what is already reserved is taken out of (or put back into) the
+    product's stock, a quantity of 0 releases the reservation.
+
+    Args:
+        session_key (str): The session key of the visitor.
+        product_id (int): The id of the product.
+        qty (int): The number of units the visitor should hold, e.g. the quantity of their cart line.
+        at (datetime, optional): The time the reservation is renewed at, defaults to now.
+
+    Raises:
+        InsufficientStockError: If there aren't enough units left, nothing is reserved then.
+
+    Returns:
+        int: The number of units reserved.
+
+    Example Usage:
+
+        ```python
+        from product.stock import set_reserved_quantity
+
+        set_reserved_quantity(request.session.session_key, product.id, 2)
+        ```
+    """
+    # Two requests of the same visitor can both create the reservation, the one that loses the
+    # race on the unique constraint is rolled back and run again against the winner's reservation
+    for attempt in range(2):
+        try:
+            return _set_reserved_quantity(session_key, product_id, qty, at or now())
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def _set_reserved_quantity(session_key: str, product_id: int, qty: int, at: datetime) -> int:
+    with transaction.atomic():
+        reservation = StockReservation.objects.select_for_update().filter(session_key=session_key, product_id=product_id).first()
+        held        = reservation.quantity if reservation else 0
+        expires_at  = at + timedelta(seconds=get_reservation_ttl())
+
+        if qty > held and not take_stock(product_id, qty - held):
+            raise InsufficientStockError(f"There isn't enough stock left of product {product_id} to reserve {qty - held} more unit(s)")
+
+        if qty < held:
+            return_stock(product_id, held - qty)
+
+        if qty == 0:
+            if reservation:
+                reservation.delete()
+
+        elif reservation:
+            StockReservation.objects.filter(pk=reservation.pk).update(quantity=qty, expires_at=expires_at, modified_on=at)
+
+        else:
+            StockReservation.objects.create(session_key=session_key, product_id=product_id, quantity=qty, expires_at=expires_at)
+
+        if qty != held:
+            transaction.on_commit(lambda: product_stock_changed.send(sender=Product, product_ids=[product_id]))
+
+    return qty
+
+
+def get_held_quantities(session_key: str, product_ids, at: datetime = None) -> dict:
+    """
+    Returns the number of units of each of the given products held for a visitor.
+
+    Only reservations that haven't expired are counted: the units of an expired reservation are
+    no longer the visitor's, whether or not they have been put back in stock yet.
+
+    Args:
+        session_key (str): The session key of the visitor.
+        product_ids (iterable): The ids of the products.
+        at (datetime, optional): The time the reservations must still be live at, defaults to now.
+
+    Returns:
+        dict: A dictionary mapping the product id (int) to the units held, products the visitor
+              holds nothing of are left out.
+    """
+    return dict(_get_held_queryset(session_key, product_ids, at))
+
+
+async def aget_held_quantities(session_key: str, product_ids, at: datetime = None) -> dict:
+    """The async version of `get_held_quantities`."""
+    return {product_id: qty async for product_id, qty in _get_held_queryset(session_key, product_ids, at)}
+
+
+def _get_held_queryset(session_key: str, product_ids, at: datetime = None):
+    return (StockReservation.objects.filter(session_key=session_key, product_id__in=list(product_ids), expires_at__gt=at or now())
+                                    .values_list("product_id", "quantity"))
+
+
+def release_reservations(reservations) -> int:
+    """
+    Puts the units of the given reservations back in stock and deletes the reservations, in bulk.
+
+    The reservations are processed in batches of `SWEEP_BATCH_SIZE`, each batch takes one
+    UPDATE for all of its products and one DELETE, whatever the number of reservations.
+
+    Args:
+        reservations (QuerySet): The `StockReservation`s to release.
+
+    Returns:
+        int: The number of reservations released.
+    """
+    num_of_released = 0
+
+    while True:
+        with transaction.atomic():
+            rows = list(reservations.select_for_update(skip_locked=True).values_list("id", "product_id")[:SWEEP_BATCH_SIZE])
+
+            if not rows:
+                break
+
+            ids         = [id for id, _ in rows]
+            product_ids = {product_id for _, product_id in rows}
+            reserved    = (StockReservation.objects.filter(id__in=ids, product=OuterRef("pk"))
+                                                   .values("product")
+                                                   .annotate(total=Sum("quantity"))
+                                                   .values("total"))
+
+            Product.objects.filter(pk__in=product_ids).update(quantity=F("quantity") + Subquery(reserved))
+            StockReservation.objects.filter(id__in=ids).delete()
+
+            transaction.on_commit(lambda product_ids=product_ids: product_stock_changed.send(sender=Product, product_ids=product_ids))
+
+        num_of_released += len(ids)
+
+    return num_of_released
+
+
+def release_session_reservations(session_key: str) -> int:
+    """Releases every reservation of a visitor, e.g. when their cart is emptied."""
+    return release_reservations(StockReservation.objects.filter(session_key=session_key))
+
+
+def release_expired_reservations(at: datetime = None) -> int:
+    """
+    Puts the units of every reservation that has expired back in stock.
+
+    Args:
+        at (datetime, optional): Reservations that expire at or before this time are released, defaults to now.
+
+    Returns:
+        int: The number of reservations released.
+    """
+    num_of_released = release_reservations(StockReservation.objects.filter(expires_at__lte=at or now()))
+
+    if num_of_released:
+        logger.info(f"[*] Released {num_of_released} expired stock reservation(s)")
+    return num_of_released
@@ -0,0 +1,106 @@
+"""
+A short-lived, in-process snapshot of the stock level of each product.
+
+The product index (see `product.product_index`) holds the details needed to display a cart
+line for up to a minute, which is far too long for the stock level: units are reserved and
+released by every cart change (see `product.stock`). The snapshot holds nothing but the
+stock level of each product, for `STOCK_SNAPSHOT_TTL` seconds, so that the cart page shows
+live stock while costing at most one query, however many lines the cart has:
+
+    SELECT id, quantity FROM product_product WHERE id IN (...)
+
+A product's level is also dropped as soon as the product is saved or its stock is reserved
+or released in this process.
+"""
+import logging
+
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+
+from product.models import Product
+
+
+logger = logging.getLogger(__name__)
+
+
+class StockSnapshot:
+    """
+    An in-process, TTL-bounded map of product ids to their stock level (`Product.quantity`).
+
+    Args:
+        ttl (float): How long (in seconds) a stock level is served before it is reloaded.
+    """
+    def __init__(self, ttl: float = 2):
+        self._ttl    = ttl
+        self._levels = {}
+        self._lock   = Lock()
+
+    def get_many(self, product_ids) -> dict:
+        """
+        Returns the stock level of each of the given products.
+
+        Levels that are missing or have expired are loaded with a single query. Ids that don't
+        belong to any product are left out of the returned dictionary.
+
+        Args:
+            product_ids (iterable): The ids of the products.
+
+        Returns:
+            dict: A dictionary mapping each found product id (int) to its stock level.
+        """
+        found, missing, now = self._get_fresh(product_ids)
+
+        if missing:
+            self._add_levels(found, Product.objects.filter(pk__in=missing).values_list("id", "quantity"), now)
+        return found
+
+    async def aget_many(self, product_ids) -> dict:
+        """The async version of `get_many`."""
+        found, missing, now = self._get_fresh(product_ids)
+
+        if missing:
+            self._add_levels(found, [row async for row in Product.objects.filter(pk__in=missing).values_list("id", "quantity")], now)
+        return found
+
+    def _get_fresh(self, product_ids) -> tuple:
+        """Returns the fresh levels of the given ids, the ids that must be loaded and the current time."""
+        ids     = {int(product_id) for product_id in product_ids}
+        now     = monotonic()
+        found   = {}
+        missing = []
+
+        with self._lock:
+            for product_id in ids:
+                level = self._levels.get(product_id)
+                if level is not None and level[0] > now:
+                    found[product_id] = level[1]
+                else:
+                    missing.append(product_id)
+
+        return found, missing, now
+
+    def _add_levels(self, found: dict, rows, now: float) -> None:
+        expires_at = now + self._ttl
+
+        with self._lock:
+            for product_id, quantity in rows:
+                self._levels[product_id] = (expires_at, quantity)
+                found[product_id]        = quantity
+
+    def invalidate(self, product_id=None) -> None:
+        """
+        Drops the stock level of a single product, or of every product if no product id is given.
+
+        Args:
+            product_id (int, optional): The id of the product to drop.
+        """
+        with self._lock:
+            if product_id is None:
+                self._levels.clear()
+            else:
+                self._levels.pop(product_id, None)
+
+
+stock_snapshot = StockSnapshot(ttl=getattr(settings, "STOCK_SNAPSHOT_TTL", 2))
@@ -1,3 +1,585 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from os import makedirs, utime
+from os.path import exists, getmtime, join
+from tempfile import TemporaryDirectory
+from threading import Barrier, Thread
+from time import monotonic, time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils.timezone import now
+from PIL import Image
+
+from benchmarks.fake_redis import FakeRedisServer
+from product.cart_encoding import decode_cart, encode_cart, get_cart_hash
+from product.cart_pricing import get_pricing_rules, price_cart
+from product.cart_storage import CacheCartStorage, SessionCartStorage, get_cart_storage
+from product.catalog_import import import_catalog, upsert_batch
+from product.discount_cache import HEAP_COMPACTION_SLACK, DiscountCodeCache
+from product.discount_engine import apply_discount_to_products, revert_discount_from_products
+from product.discount_scheduler import DiscountScheduler, get_upcoming_transitions
+from product.image_variants import build_variants, refresh_image_variants
+from product.models import Discount, Product, ProductDTO, StockReservation
+from product.pricing import refresh_effective_prices
+from product.search import InvertedIndexSearchBackend, SQLiteFTS5SearchBackend, product_search, search_products
+from product.signals import products_bulk_updated
+from product.stock import release_expired_reservations, release_session_reservations, set_reserved_quantity
+from product.stock_snapshot import stock_snapshot
+from store.catalog_cache import get_catalog_version
+from utils.custom_errors import InsufficientStockError
+from utils.sessions.db import SessionStore
+
+
+def create_product(quantity: int) -> Product:
+    return Product.objects.create(name="Flash sale trainers",
+                                  description="The last pairs",
+                                  price=50,
+                                  quantity=quantity,
+                                  image="product/p1.jpg",
+                                  )
+
+
+class StockReservationTest(TestCase):
+
+    def setUp(self):
+        self.product = create_product(quantity=5)
+
+    def test_reserving_takes_the_units_out_of_stock(self):
+        set_reserved_quantity("visitor", self.product.id, 2)
+        set_reserved_quantity("visitor", self.product.id, 3)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 2)
+        self.assertEqual(StockReservation.objects.get(session_key="visitor").quantity, 3)
+
+    def test_reserving_more_than_is_left_reserves_nothing(self):
+        set_reserved_quantity("visitor", self.product.id, 4)
+
+        with self.assertRaises(InsufficientStockError):
+            set_reserved_quantity("other visitor", self.product.id, 2)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+        self.assertFalse(StockReservation.objects.filter(session_key="other visitor").exists())
+
+    def test_releasing_puts_the_units_back(self):
+        set_reserved_quantity("visitor", self.product.id, 4)
+        set_reserved_quantity("visitor", self.product.id, 0)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservations_are_put_back_in_stock(self):
+        other = create_product(quantity=10)
+
+        set_reserved_quantity("first visitor", self.product.id, 2, at=now() - timedelta(days=1))
+        set_reserved_quantity("second visitor", self.product.id, 1, at=now() - timedelta(days=1))
+        set_reserved_quantity("second visitor", other.id, 4, at=now() - timedelta(days=1))
+        set_reserved_quantity("third visitor", self.product.id, 1)
+
+        self.assertEqual(release_expired_reservations(), 3)
+
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.product.quantity, 4)
+        self.assertEqual(other.quantity, 10)
+        self.assertEqual(list(StockReservation.objects.values_list("session_key", flat=True)), ["third visitor"])
+
+    def test_releasing_refreshes_the_stock_levels_and_the_catalog_only(self):
+        set_reserved_quantity("visitor", self.product.id, 2)
+        version = get_catalog_version()
+
+        self.assertEqual(stock_snapshot.get_many([self.product.id]), {self.product.id: 3})
+
+        with self.captureOnCommitCallbacks(execute=True), mock.patch("product.signals.product_search") as search:
+            release_session_reservations("visitor")
+
+        self.assertEqual(stock_snapshot.get_many([self.product.id]), {self.product.id: 5})
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(search.mock_calls, [])
+
+
+class StockReservationRaceTest(TransactionTestCase):
+
+    NUM_OF_VISITORS = 20
+    NUM_OF_UNITS    = 5
+
+    def test_visitors_racing_for_the_last_units_never_oversell(self):
+        product  = create_product(quantity=self.NUM_OF_UNITS)
+        barrier  = Barrier(self.NUM_OF_VISITORS)
+        results  = []
+
+        def reserve(index):
+            try:
+                barrier.wait()
+                set_reserved_quantity(f"visitor {index}", product.id, 1)
+                results.append(True)
+            except InsufficientStockError:
+                results.append(False)
+            finally:
+                connections.close_all()
+
+        threads = [Thread(target=reserve, args=(index,)) for index in range(self.NUM_OF_VISITORS)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(len(results), self.NUM_OF_VISITORS)
+        self.assertEqual(results.count(True), self.NUM_OF_UNITS)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(StockReservation.objects.count(), self.NUM_OF_UNITS)
+
+
+class CatalogImportTest(TestCase):
+
+    def setUp(self):
+        self.media_dir  = self.enterContext(TemporaryDirectory())
+        self.images_dir = self.enterContext(TemporaryDirectory())
+        self.feed       = join(self.images_dir, "catalog.csv")
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_dir))
+
+        with open(join(self.images_dir, "shoe.jpg"), "wb") as file:
+            file.write(b"not really a jpeg")
+
+    def _import(self, quantity):
+        with open(self.feed, "w") as file:
+            file.write(f"sku,name,description,price,quantity,image\nSHOE-1,Trainers,Running trainers,40.00,{quantity},shoe.jpg\n")
+
+        return import_catalog(self.feed, images_dir=self.images_dir, generate_images=False)
+
+    def test_images_are_copied_to_where_the_product_points(self):
+        self.assertEqual(self._import(quantity=10).num_of_imported, 1)
+
+        product = Product.objects.get(sku="SHOE-1")
+        self.assertEqual(product.image.name, "product/shoe.jpg")
+        self.assertTrue(exists(join(self.media_dir, product.image.name)))
+
+    def test_importing_again_keeps_the_stock_of_existing_products(self):
+        self._import(quantity=10)
+        set_reserved_quantity("visitor", Product.objects.get(sku="SHOE-1").id, 2)
+
+        self._import(quantity=10)
+
+        self.assertEqual(Product.objects.get(sku="SHOE-1").quantity, 8)
+
+    def test_importing_again_restocks_existing_products_around_their_reservations(self):
+        self._import(quantity=10)
+        product = Product.objects.get(sku="SHOE-1")
+        set_reserved_quantity("visitor", product.id, 2)
+        set_reserved_quantity("other visitor", product.id, 3)
+
+        self._import(quantity=25)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 20)
+
+        self._import(quantity=4)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 0)
+
+        release_session_reservations("visitor")
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 2)
+
+
+@override_settings(PRODUCT_IMAGE_WIDTHS=(16,), PRODUCT_IMAGE_FORMATS=("jpeg",))
+class ImageVariantsTest(TestCase):
+
+    def setUp(self):
+        self.media_dir = self.enterContext(TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_dir))
+
+        for folder, colour in (("a", "red"), ("b", "blue")):
+            makedirs(join(self.media_dir, "product", folder))
+            Image.new("RGB", (32, 32), colour).save(join(self.media_dir, "product", folder, "shoe.jpg"))
+
+    def test_images_sharing_a_name_get_variants_of_their_own(self):
+        red  = build_variants("product/a/shoe.jpg", self.media_dir, (16,), ("jpeg",))["jpeg"]["16"]
+        blue = build_variants("product/b/shoe.jpg", self.media_dir, (16,), ("jpeg",))["jpeg"]["16"]
+
+        self.assertNotEqual(red, blue)
+
+        with Image.open(join(self.media_dir, red)) as image:
+            self.assertGreater(image.getpixel((8, 8))[0], 200)
+
+    def test_forcing_regenerates_up_to_date_variants(self):
+        Product.objects.create(name="Trainers", description="", price=40, quantity=1, image="product/a/shoe.jpg")
+
+        self.assertEqual(refresh_image_variants(), 1)
+
+        variant = join(self.media_dir, Product.objects.get().image_variants["jpeg"]["16"])
+        utime(variant, (getmtime(variant) + 60, getmtime(variant) + 60))
+        modified_on = getmtime(variant)
+
+        self.assertEqual(refresh_image_variants(), 0)
+        self.assertEqual(refresh_image_variants(force=True), 1)
+        self.assertNotEqual(getmtime(variant), modified_on)
+
+
+class ProductDTOTest(TestCase):
+
+    def test_bulk_to_json_matches_to_json(self):
+        lines    = {"1": [2, "40.00"], "2": [1, "5.50"]}
+        products = {id: {"id": id, "name": f"Product {id}", "description": "", "current_stock": 3, "img": "product/p1.jpg"}
+                    for id in (1, 2)}
+        dtos     = ProductDTO.from_cart_lines(lines, products, {2: 0})
+
+        self.assertEqual(ProductDTO.bulk_to_json(dtos), [dto.to_json() for dto in dtos])
+        self.assertEqual(ProductDTO.bulk_to_json([]), [])
+
+
+class CartEncodingTest(TestCase):
+
+    def test_round_trip(self):
+        lines   = {"3": [2, "40.00"], "1": [1, "5.50"]}
+        encoded = encode_cart(lines)
+
+        self.assertEqual(encoded["v"], 2)
+        self.assertEqual(encoded["l"], [[3, 2, "40.00"], [1, 1, "5.50"]])
+        self.assertEqual(decode_cart(encoded), lines)
+        self.assertEqual(list(decode_cart(encoded)), ["3", "1"])
+
+    def test_legacy_carts_are_migrated(self):
+        product = create_product(quantity=5)
+        legacy  = {str(product.id): {"id": product.id, "product_name": product.name, "price": "45.00", "qty": 2, "current_stock": 5}}
+
+        self.assertEqual(decode_cart(legacy), {str(product.id): [2, "45.00"]})
+        self.assertEqual(decode_cart({str(product.id): 3}), {str(product.id): [3, "50.00"]})
+        self.assertEqual(decode_cart({str(product.id): 3, "999999": 1}), {str(product.id): [3, "50.00"]})
+
+    def test_content_hash_only_changes_with_the_content(self):
+        lines = {"1": [1, "5.50"]}
+        hash  = encode_cart(lines)["h"]
+
+        self.assertEqual(encode_cart({"1": [1, "5.50"]})["h"], hash)
+        self.assertEqual(get_cart_hash(encode_cart(lines), lines), hash)
+        self.assertEqual(get_cart_hash(None, lines), hash)
+        self.assertNotEqual(encode_cart({"1": [2, "5.50"]})["h"], hash)
+
+    def test_corrupt_carts_are_decoded_as_empty_carts(self):
+        for raw in ({"v": 2}, {"v": 2, "l": "garbage"}, {"v": 2, "l": [[1]]}, {"v": 2, "l": [["x", 1, "5.50"]]},
+                    ["not", "a", "cart"], "garbage", {"1": "garbage"}):
+            with self.subTest(raw=raw):
+                lines = decode_cart(raw)
+
+                self.assertEqual(lines, {})
+                self.assertEqual(get_cart_hash(raw, lines), encode_cart({})["h"])
+
+
+class CartStorageTest(TestCase):
+
+    CART = {"v": 2, "l": [[1, 2, "40.00"]], "h": "3f2a9c1d5e7b8a90"}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis_server = FakeRedisServer.start()
+        cls.addClassCleanup(cls.redis_server.stop)
+
+    @staticmethod
+    def _move_locmem_clock(seconds):
+        return mock.patch("django.core.cache.backends.locmem.time", **{"time.return_value": time() + seconds})
+
+    @staticmethod
+    def _move_redis_clock(seconds):
+        return mock.patch("benchmarks.fake_redis.monotonic", return_value=monotonic() + seconds)
+
+    def _get_backends(self):
+        """Returns the cache settings of each cache backed storage, and how to move its clock forward."""
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "cart-storage-test"}
+        redis  = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": self.redis_server.url}
+
+        return {"locmem": (locmem, self._move_locmem_clock), "redis": (redis, self._move_redis_clock)}
+
+    def _create_request(self, session_key=None):
+        request         = RequestFactory().get("/")
+        request.session = SessionStore(session_key)
+        return request
+
+    def test_backend_is_selected_from_the_settings(self):
+        for backend, storage_class in (("session", SessionCartStorage), ("cached_db", SessionCartStorage),
+                                       ("locmem", CacheCartStorage), ("redis", CacheCartStorage)):
+            with self.subTest(backend=backend), override_settings(CART_STORAGE_BACKEND=backend):
+                self.assertIs(type(get_cart_storage(self._create_request())), storage_class)
+
+        with override_settings(CART_STORAGE_BACKEND="memcached"), self.assertRaises(ValueError):
+            get_cart_storage(self._create_request())
+
+    def test_save_load_delete_and_ttl(self):
+        for backend, (cache, move_clock) in self._get_backends().items():
+            with self.subTest(backend=backend), override_settings(CACHES={**settings.CACHES, "carts": cache}, SESSION_COOKIE_AGE=60):
+                request = self._create_request()
+                storage = CacheCartStorage(request)
+
+                self.assertIsNone(storage.load("cart"))
+                self.assertIsNone(request.session.session_key)
+
+                storage.save("cart", self.CART)
+
+                # Another request of the same visitor
+                storage = CacheCartStorage(self._create_request(request.session.session_key))
+                self.assertEqual(storage.load("cart"), self.CART)
+                self.assertEqual(async_to_sync(storage.aload)("cart"), self.CART)
+
+                with move_clock(30):
+                    self.assertEqual(storage.load("cart"), self.CART)
+
+                with move_clock(61):
+                    self.assertIsNone(storage.load("cart"))
+
+                async_to_sync(storage.asave)("cart", self.CART)
+                storage.delete("cart")
+                self.assertIsNone(storage.load("cart"))
+
+
+class DiscountEngineTest(TestCase):
+
+    PRICES = ("50.00", "10.10", "19.99", "0.05", "999.95")
+
+    def setUp(self):
+        self.discount = Discount.objects.create(name="save12.5%", discount=Decimal("12.50"), code="SAVE12",
+                                                end_date=now() + timedelta(days=1))
+        for price in self.PRICES:
+            Product.objects.create(name="Trainers", description="", price=Decimal(price), quantity=1, image="product/p1.jpg")
+
+        self.receiver = mock.Mock()
+        products_bulk_updated.connect(self.receiver, weak=False)
+        self.addCleanup(products_bulk_updated.disconnect, self.receiver)
+
+    def _run(self, operation):
+        """Runs a discount operation, returns its row count and the number of `products_bulk_updated` sent."""
+        self.receiver.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            num_of_rows = operation(self.discount, Product.objects.all())
+        return num_of_rows, self.receiver.call_count
+
+    def _get_prices(self):
+        return {product.price: product.effective_price for product in Product.objects.all()}
+
+    def test_applying_twice_does_not_compound_the_discount(self):
+        self.assertEqual(self._run(apply_discount_to_products), (len(self.PRICES), 1))
+        discounted = self._get_prices()
+
+        self.assertEqual(discounted, {price: self.discount.get_discounted_price(price) for price in discounted})
+        self.assertEqual(self._run(apply_discount_to_products), (0, 1))
+        self.assertEqual(self._get_prices(), discounted)
+        self.assertEqual(Product.objects.filter(discount=self.discount, is_discount_applied=True).count(), len(self.PRICES))
+
+    def test_reverting_restores_the_prices_exactly(self):
+        self._run(apply_discount_to_products)
+
+        self.assertEqual(self._run(revert_discount_from_products), (len(self.PRICES), 1))
+        self.assertEqual(self._get_prices(), {Decimal(price): Decimal(price) for price in self.PRICES})
+        self.assertFalse(Product.objects.filter(discount__isnull=False).exists())
+        self.assertFalse(Product.objects.filter(is_discount_applied=True).exists())
+
+        self.assertEqual(self._run(revert_discount_from_products), (0, 1))
+
+
+class EffectivePriceTest(TestCase):
+
+    def test_bulk_refresh_rounds_like_the_discount(self):
+        prices = [Decimal(price) for price in ("50.00", "10.10", "19.99", "0.05", "999.95", "33.33")]
+
+        for percentage in (Decimal("15"), Decimal("12.50"), Decimal("100")):
+            discount = Discount.objects.create(name=f"save{percentage}%", discount=percentage, code=f"SAVE{percentage}",
+                                               end_date=now() + timedelta(days=1))
+            products = [Product.objects.create(name="Trainers", description="", price=price, quantity=1,
+                                               image="product/p1.jpg", discount=discount) for price in prices]
+
+            Product.objects.update(effective_price=0)
+            refresh_effective_prices()
+
+            for product in products:
+                product.refresh_from_db()
+                self.assertEqual(product.effective_price, discount.get_discounted_price(product.price))
+
+
+class DiscountCodeMigrationTest(TransactionTestCase):
+
+    BEFORE_UNIQUE_CODE = [("product", "0003_product_effective_price")]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_duplicate_codes_are_renamed_before_the_unique_constraint(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes("product")
+        apps   = self._migrate(self.BEFORE_UNIQUE_CODE)
+
+        try:
+            OldDiscount = apps.get_model("product", "Discount")
+            for name in ("first", "second", "third"):
+                OldDiscount.objects.create(name=name, discount=10, code="EGBIE-GET10-OFFFI-RSTIM", end_date=now())
+        finally:
+            self._migrate(latest)
+
+        codes = list(Discount.objects.order_by("id").values_list("code", flat=True))
+        self.assertEqual(codes, ["EGBIE-GET10-OFFFI-RSTIM", "EGBIE-GET10-OFFFI-RST-1", "EGBIE-GET10-OFFFI-RST-2"])
+
+
+class DiscountCodeCacheTest(TestCase):
+
+    def setUp(self):
+        self.discount = Discount.objects.create(name="save10%", discount=10, code="SAVE10", end_date=now() + timedelta(days=30))
+        self.clock    = [0.0]
+        self.cache    = DiscountCodeCache(ttl=60, negative_ttl=30, max_negative_entries=10)
+        self.enterContext(mock.patch("product.discount_cache.monotonic", lambda: self.clock[0]))
+
+    def test_reloading_a_code_does_not_grow_the_expiry_heap(self):
+        for _ in range(500):
+            self.clock[0] += 61
+            self.assertEqual(self.cache.get("SAVE10"), self.discount)
+
+        self.assertLessEqual(len(self.cache._expiry_heap), 2 + HEAP_COMPACTION_SLACK)
+
+    def test_misses_are_capped_and_evicted_with_the_ttl(self):
+        self.cache.get("SAVE10")
+
+        for index in range(100):
+            self.assertIsNone(self.cache.get(f"NOT-A-CODE-{index}"))
+
+        self.assertEqual(len(self.cache._negative_entries), 10)
+
+        self.clock[0] += 61
+        self.cache.get("NOT-A-CODE-0")
+
+        self.assertEqual(list(self.cache._negative_entries), ["NOT-A-CODE-0"])
+        self.assertEqual(list(self.cache._entries), [])
+
+
+class DiscountSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.start    = now() + timedelta(hours=1)
+        self.end      = self.start + timedelta(hours=1)
+        self.discount = Discount.objects.create(name="save25%", discount=25, code="SAVE25", start_date=self.start, end_date=self.end)
+        self.product  = create_product(quantity=5)
+
+        Product.objects.filter(pk=self.product.pk).update(discount=self.discount)
+
+    def test_products_are_priced_in_when_the_discount_starts_and_out_when_it_ends(self):
+        scheduler   = DiscountScheduler()
+        transitions = get_upcoming_transitions(after=now())
+
+        self.assertEqual(scheduler.run_due(transitions, at=self.start - timedelta(seconds=1)), {"started": 0, "ended": 0})
+        self.assertEqual(Product.objects.get(pk=self.product.pk).effective_price, 50)
+
+        self.assertEqual(scheduler.run_due(transitions, at=self.start), {"started": 1, "ended": 0})
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.effective_price, Decimal("37.50"))
+        self.assertTrue(product.is_discount_applied)
+
+        self.assertEqual(scheduler.run_due(transitions, at=self.end), {"started": 0, "ended": 1})
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.effective_price, 50)
+        self.assertIsNone(product.discount_id)
+        self.assertEqual(transitions, [])
+
+
+class CartPricingTest(TestCase):
+
+    def test_cart_is_priced_with_exact_decimals(self):
+        pricing = price_cart({"1": [3, "0.10"], "2": [1, "19.99"]}, get_pricing_rules(discount_percentage=10))
+
+        self.assertEqual(pricing.lines, {"1": Decimal("0.30"), "2": Decimal("19.99")})
+        self.assertEqual(pricing.subtotal, Decimal("20.29"))
+        self.assertEqual(pricing.discount, Decimal("2.03"))
+        self.assertEqual(pricing.tax, Decimal("3.65"))
+        self.assertEqual(pricing.total, Decimal("20.29") - Decimal("2.03") + Decimal("25.00") + Decimal("3.65"))
+
+    def test_shipping_is_free_from_the_threshold(self):
+        with self.settings(CART_FREE_SHIPPING_THRESHOLD="50.00"):
+            pricing = price_cart({"1": [2, "25.00"]})
+
+        self.assertEqual(pricing.shipping_discount, pricing.shipping)
+
+    def test_empty_cart_costs_nothing(self):
+        self.assertEqual(price_cart({}).total, Decimal("0.00"))
+
+
+class ProductSearchTest(TestCase):
+
+    def setUp(self):
+        # The shared index may hold products of other tests, it is built again from this test's products
+        product_search.invalidate()
+        self.addCleanup(product_search.invalidate)
+
+        self.trainers = Product.objects.create(name="Red running trainers", description="Light shoes for the road",
+                                               price=50, quantity=5, image="product/p1.jpg")
+        self.socks    = Product.objects.create(name="Running socks", description="Made for red clay courts",
+                                               price=5, quantity=5, image="product/p1.jpg")
+        self.backend  = InvertedIndexSearchBackend()
+
+    def _search(self, query, backend=None):
+        return [product["id"] for product in search_products(query, backend=backend or self.backend)]
+
+    def test_names_rank_above_descriptions(self):
+        self.assertEqual(self._search("red"), [self.trainers.id, self.socks.id])
+
+    def test_every_word_is_matched_as_a_prefix(self):
+        self.assertEqual(self._search("run sock"), [self.socks.id])
+        self.assertEqual(self._search("hat"), [])
+
+    def test_saved_and_deleted_products_are_reindexed(self):
+        self.assertEqual(self._search("red", product_search), [self.trainers.id, self.socks.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.socks.name = "Running hat"
+            self.socks.save()
+            self.trainers.delete()
+
+        self.assertEqual(self._search("hat", product_search), [self.socks.id])
+        self.assertEqual(self._search("trainers", product_search), [])
+
+    def test_bulk_updates_only_reindex_the_updated_products(self):
+        self.assertEqual(self._search("red", product_search), [self.trainers.id, self.socks.id])
+
+        Product.objects.filter(pk=self.socks.pk).update(sku="SOCKS-1")
+        Product.objects.filter(pk=self.trainers.pk).update(effective_price=1)
+
+        with mock.patch.object(product_search, "invalidate") as invalidate, self.captureOnCommitCallbacks(execute=True):
+            upsert_batch([{"sku": "SOCKS-1", "name": "Running hat", "description": "", "price": Decimal("5.00"),
+                           "quantity": 5, "image": "product/p1.jpg"}])
+            refresh_effective_prices()
+
+        invalidate.assert_not_called()
+        self.assertEqual(self._search("hat", product_search), [self.socks.id])
+        self.assertEqual(self._search("red", product_search), [self.trainers.id])
+
+
+# The FTS5 table is created outside of a transaction, as SQLite can't roll its creation back cleanly
+class SQLiteFTS5SearchTest(TransactionTestCase):
+
+    def setUp(self):
+        self.backend = SQLiteFTS5SearchBackend()
+
+    def tearDown(self):
+        self.backend.drop()
+
+    def _search(self, query):
+        return [product["id"] for product in search_products(query, backend=self.backend)]
+
+    def test_ranking_and_triggers(self):
+        trainers = create_product(quantity=5)
+        socks    = Product.objects.create(name="Running socks", description="Made for the flash sale",
+                                          price=5, quantity=5, image="product/p1.jpg")
+
+        self.assertEqual(self._search("flash"), [trainers.id, socks.id])
+
+        socks.name = "Running hat"
+        socks.save()
+        trainers.delete()
+
+        self.assertEqual(self._search("hat"), [socks.id])
+        self.assertEqual(self._search("trainers"), [])
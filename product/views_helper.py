@@ -1,13 +1,25 @@
 import logging
 from typing import List
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from django.http import HttpRequest
 
-from product.models import ProductDTO
+from product.cart_encoding import HASH_KEY, decode_cart, encode_cart, get_cart_hash, is_legacy_format
+from product.cart_pricing import CartPricing, get_pricing_key, get_pricing_rules, price_cart
+from product.cart_storage import get_cart_storage
+from product.discount_cache import discount_cache
+from product.models import Discount, ProductDTO
+from product.product_index import product_index
+from product.stock import aget_held_quantities, get_held_quantities, release_session_reservations, set_reserved_quantity
+from product.stock_snapshot import stock_snapshot
 
 
 logger = logging.getLogger(__name__)
 
+CART_OPERATIONS = ("add", "set_qty", "remove")
+
 
 class CartRequestSession:
     """
@@ -18,16 +30,51 @@ class CartRequestSession:
     It uses Django's session framework to store and persist cart data throughout the 
     user's browsing session which avoids storing in the database thus preventing the hitting 
     of the database each time the user makes an update to their cart
+
+    The async views create the cart with `await CartRequestSession.acreate(request)` and use
+    the async methods (`aadd_to_session`, `aadd_product_by_id`, `aget_products_from_request`,
+    `aget_pricing`, `aget_discount_percentage`),
+    which never block the event loop on the session, the cart storage or the database.
     
     """
-    def __init__(self, request, session_name="cart"):
+    def __init__(self, request, session_name="cart", load=True):
         self._request      = request 
         self._session_name = session_name
         
         if not isinstance(self._request, HttpRequest):
             raise ValueError(f"The request is not an instance of request module. Got {type(self._request).__name__}")
         
-        self._cart = self._request.session.get(session_name, {})
+        # The cart is held in memory as `{id: [qty, price]}` and only encoded into the compact session 
+        # format when it is written back (see `product.cart_encoding`) to the configured storage 
+        # backend (see `product.cart_storage`). 
+        self._storage = get_cart_storage(self._request)
+        
+        if load:
+            raw_cart = self._storage.load(session_name)
+            self._set_cart(raw_cart, decode_cart(raw_cart))
+    
+    def _set_cart(self, raw_cart, lines: dict) -> None:
+        self._cart         = lines
+        self._content_hash = get_cart_hash(raw_cart, lines)
+    
+    @classmethod
+    async def acreate(cls, request, session_name="cart") -> "CartRequestSession":
+        """
+        Creates the cart of a request from an async view, loading it without blocking.
+
+        Raises:
+            ValueError: If the request is not an `HttpRequest`.
+        """
+        cart     = cls(request, session_name, load=False)
+        raw_cart = await cart._storage.aload(session_name)
+        
+        # Only a cart stored in a legacy layout needs the product index (and the database) to be decoded
+        if is_legacy_format(raw_cart):
+            cart._set_cart(raw_cart, await sync_to_async(decode_cart)(raw_cart))
+        else:
+            cart._set_cart(raw_cart, decode_cart(raw_cart))
+        
+        return cart
     
     def add_to_session(self, product_data: dict) -> bool:
         """
@@ -60,10 +107,99 @@ class CartRequestSession:
            return True
         
         product = self._parse_product_data(product_data)
-       
-        self._cart[product_data["productID"]] = product
+        
+        self._reserve(product["id"], product["qty"])
+        self._cart[str(product["id"])] = [product["qty"], str(product["price"])]
+        self._update_session()
+
+        return True
+    
+    def add_product_by_id(self, product_id) -> bool:
+        """
+        Adds a product to the cart using nothing but its id.
+
+        Unlike `add_to_session`, the client data is never trusted or copied into the session.
+        The product is resolved on the server through the product index and only its
+        quantity and a snapshot of its price are stored in the session. The product details
+        are looked up again from the index when the cart is displayed.
+
+        Args:
+            product_id (int | str): The id of the product to add.
+
+        Raises:
+            ValueError: If the product id is not a valid id.
+            KeyError: If no product with that id exists.
+
+        Returns:
+            bool: Returns True if the product was successfully added to or updated in the session.
+        """
+        product = product_index.get(product_id)
+        
+        if product is None:
+            raise KeyError(f"No product found with id {product_id}")
+        
+        product_id = str(product["id"])
+        
+        if self._if_found_update({"productID": product_id}):
+            return True
+        
+        self._reserve(product_id, 1)
+        self._cart[product_id] = [1, str(product["price"])]
         self._update_session()
+        
+        return True
+    
+    async def aadd_to_session(self, product_data: dict) -> bool:
+        """
+        The async version of `add_to_session`.
+
+        Raises:
+            ValueError: If `product_data` is not a dictionary.
+            KeyError: If required keys (e.g., "productID") are missing.
+        """
+        if not isinstance(product_data, dict):
+            raise ValueError(f"Expected the product_data to be a dictionary but got {type(product_data).__name__}")
+        
+        if not product_data.get("productID"):
+            raise KeyError(f"Missing key product key id")
+        
+        product_id = str(product_data["productID"])
+        
+        if product_id in self._cart:
+            await sync_to_async(self._reserve)(product_id, self._cart[product_id][0] + 1)
+            self._cart[product_id][0] += 1
+        else:
+            product = self._parse_product_data(product_data)
+            await sync_to_async(self._reserve)(product["id"], product["qty"])
+            self._cart[str(product["id"])] = [product["qty"], str(product["price"])]
+        
+        await self._aupdate_session()
+        return True
+    
+    async def aadd_product_by_id(self, product_id) -> bool:
+        """
+        The async version of `add_product_by_id`, the product is resolved with `product_index.aget`.
 
+        Raises:
+            ValueError: If the product id is not a valid id.
+            KeyError: If no product with that id exists.
+        """
+        product = await product_index.aget(product_id)
+        
+        if product is None:
+            raise KeyError(f"No product found with id {product_id}")
+        
+        product_id = str(product["id"])
+        qty        = self._cart[product_id][0] + 1 if product_id in self._cart else 1
+        
+        await sync_to_async(self._reserve)(product_id, qty)
+        
+        if product_id in self._cart:
+            self._cart[product_id][0] = qty
+        else:
+            self._cart[product_id] = [qty, str(product["price"])]
+        
+        await self._aupdate_session()
         return True
     
     def _if_found_update(self, product_data: dict) -> bool:
@@ -79,11 +215,12 @@ class CartRequestSession:
             or False if the product was not found in the cart.
         """
         
-        product_id = product_data["productID"]
+        product_id = str(product_data["productID"])
 
         if product_id in self._cart:
-            self._cart[product_id]["qty"] += 1
-            self._request.session.modified = True
+            self._reserve(product_id, self._cart[product_id][0] + 1)
+            self._cart[product_id][0] += 1
+            self._update_session()
             return True
         return False
     
@@ -148,17 +285,134 @@ class CartRequestSession:
             bool: Returns True to signalify that the product has been removed from the session.
         
         """
+        product_id = str(product_id)
+        
         if product_id in self._cart:
+            self._reserve(product_id, 0)
             del self._cart[product_id]
-            self._request.session.modified = True
         
         self._update_session()
         return True
     
+    def apply_operations(self, operations: list) -> bool:
+        """
+        Applies a batch of cart operations atomically, with a single write to the cart storage.
+
+        Every operation is validated (and every product resolved through the product index in a
+        single lookup) before anything is applied, so either all of the operations are applied
+        or, if any of them is invalid, none of them are.
+
+        Args:
+            operations (list): A list of operations, each a dictionary containing:
+                - 'op' (str): One of "add", "set_qty" or "remove".
+                - 'productID' (int | str): The id of the product.
+                - 'qty' (int): The quantity to add (defaults to 1) or to set. Not used by "remove".
+                               Setting a quantity of 0 removes the product.
+
+        Raises:
+            ValueError: If `operations` is not a list, an operation is unknown or a quantity is invalid.
+            KeyError: If a product that is being added or updated doesn't exist.
+
+        Returns:
+            bool: Returns True once every operation has been applied.
+        """
+        if not isinstance(operations, list):
+            raise ValueError(f"Expected the operations to be a list but got {type(operations).__name__}")
+        
+        parsed   = [self._parse_operation(operation) for operation in operations]
+        products = product_index.get_many([id for op, id, _ in parsed if op != "remove"])
+        cart     = {id: list(line) for id, line in self._cart.items()}
+        
+        for op, id, qty in parsed:
+            
+            if op == "remove" or (op == "set_qty" and qty == 0):
+                cart.pop(str(id), None)
+                continue
+            
+            product = products.get(id)
+            
+            if product is None:
+                raise KeyError(f"No product found with id {id}")
+            
+            line = cart.setdefault(str(id), [0, str(product["price"])])
+            line[0] = line[0] + qty if op == "add" else qty
+        
+        self._reserve_changes(cart)
+        self._cart = cart
+        self._update_session()
+        
+        return True
+    
+    def _reserve(self, product_id, qty: int) -> None:
+        """
+        Makes the visitor's stock reservation of a product match its new cart quantity (see `product.stock`).
+
+        Called before the cart line is changed, so that the cart is left as it was if the
+        units can't be reserved. Does nothing unless `STOCK_RESERVATIONS` is on.
+
+        Raises:
+            InsufficientStockError: If there aren't enough units of the product left.
+        """
+        if not getattr(settings, "STOCK_RESERVATIONS", False):
+            return
+        
+        session = self._request.session
+        
+        # The reservations are held against the session, which may not have been created yet
+        if session.session_key is None:
+            session.save()
+        
+        set_reserved_quantity(session.session_key, int(product_id), qty)
+    
+    def _reserve_changes(self, cart: dict) -> None:
+        """Reserves the quantity of every line that differs between the cart and the new cart, all or nothing."""
+        changes = {id: line[0] for id, line in cart.items() if id not in self._cart or self._cart[id][0] != line[0]}
+        changes.update({id: 0 for id in self._cart if id not in cart})
+        
+        with transaction.atomic():
+            for id, qty in changes.items():
+                self._reserve(id, qty)
+    
+    @staticmethod
+    def _parse_operation(operation: dict) -> tuple:
+        """
+        Validates a single cart operation and returns it as an `(op, product_id, qty)` tuple.
+
+        Raises:
+            ValueError: If the operation is unknown, the product id is invalid or the quantity is invalid.
+        """
+        if not isinstance(operation, dict):
+            raise ValueError(f"Expected the operation to be a dictionary but got {type(operation).__name__}")
+        
+        op = operation.get("op")
+        
+        if op not in CART_OPERATIONS:
+            raise ValueError(f"Invalid operation: {op}. Expected one of {', '.join(CART_OPERATIONS)}")
+        
+        product_id = product_index.normalise_id(operation.get("productID"))
+        qty        = operation.get("qty", 1 if op == "add" else 0)
+        
+        if op != "remove" and (not isinstance(qty, int) or isinstance(qty, bool) or qty < 0 or (op == "add" and qty == 0)):
+            raise ValueError(f"Invalid quantity for product {product_id}: {qty}")
+        
+        return op, product_id, qty
+    
     def _update_session(self):
-        """Updates the cart session with the cart data"""
-        self._request.session[self._session_name] = self._cart
-        self._request.session.modified            = True
+        """Writes the compact encoding of the cart data to the cart storage backend"""
+        encoded_cart       = encode_cart(self._cart)
+        self._content_hash = encoded_cart[HASH_KEY]
+        self._storage.save(self._session_name, encoded_cart)
+        
+        # Picked up by `CartCountCookieMiddleware` to refresh the cached cart count
+        self._request.cart_total = self.number_of_items_in_cart_session
+    
+    async def _aupdate_session(self):
+        """The async version of `_update_session`."""
+        encoded_cart       = encode_cart(self._cart)
+        self._content_hash = encoded_cart[HASH_KEY]
+        await self._storage.asave(self._session_name, encoded_cart)
+        
+        self._request.cart_total = self.number_of_items_in_cart_session
         
     @property
     def number_of_items_in_cart_session(self):
@@ -173,6 +427,16 @@ class CartRequestSession:
         """
         return len(self._cart)
     
+    @property
+    def content_hash(self) -> str:
+        """
+        Returns a hash of the content of the cart, stored with the cart whenever it is written.
+
+        It changes whenever a line is added, removed or has its quantity or price changed, which
+        makes it usable as a validator (see `store.etags.get_cart_etag`).
+        """
+        return self._content_hash
+    
     def get_products_from_request(self, to_class_object: bool = False) -> List[dict] | List[ProductDTO]:
         """
         Returns a JSON list containing cart items if found or returns an empty list. 
@@ -180,8 +444,10 @@ class CartRequestSession:
         The method returns the entire cart items in the form of a JSON list or an empty
         list if it is not found. By default it returns the data as a dictionary (JSON), however: 
         
-        If `to_class_object` is False (default), the method returns a list of cart items as dictionaries. 
-        If `to_class_object` is True, it returns a list of `ProductDTO` objects. 
+        If `to_class_object` is False (default), the method returns a list of cart items as dictionaries
+        containing the `id`, `qty` and `price` of each line, which doesn't require any product lookup. 
+        If `to_class_object` is True, it returns a list of `ProductDTO` objects hydrated with the full
+        product details. 
         If no cart items are found, an empty list is returned.
                 
         Args:
@@ -196,21 +462,193 @@ class CartRequestSession:
                Returns an empty list if no cart items are found.
         """
         if to_class_object:
-            try:
-                return [ProductDTO(id=self._cart[id]["id"], 
-                                name=self._cart[id]["product_name"],
-                                price=self._cart[id]["price"],
-                                description=self._cart[id]["description"],
-                                current_stock=self._cart[id]["current_stock"],
-                                image=self._cart[id]["img"],
-                                qty=self._cart[id]["qty"],
-                                ) for id in self._cart]
-            except KeyError as e:
-                logger.warning(f"[*] Missing key: {str(e)}")
-                
+            return self._hydrate_products()
+
+        return [{"id": int(id), "qty": qty, "price": price} for id, (qty, price) in self._cart.items()]
+    
+    async def aget_products_from_request(self, to_class_object: bool = False) -> List[dict] | List[ProductDTO]:
+        """The async version of `get_products_from_request`, the products are hydrated with `product_index.aget_many`."""
+        if not to_class_object:
+            return self.get_products_from_request()
+        
+        if not self._cart:
+            return []
+        
+        products = await product_index.aget_many(self._cart)
+        
+        if len(products) != len(self._cart):
+            logger.warning(f"[*] {len(self._cart) - len(products)} product(s) in the cart no longer exist")
+        
+        return ProductDTO.from_cart_lines(self._cart, products, await self.aget_stock_levels())
+    
+    def _hydrate_products(self) -> List[ProductDTO]:
+        """
+        Lazily builds a `ProductDTO` for every line in the cart.
+
+        The session only holds the id, quantity and price snapshot of each line, so the rest of
+        the product details are resolved through the product index using a single lookup for the
+        whole cart. This only happens when the cart is actually displayed. Lines whose product no
+        longer exists are skipped. The stock of every line is live, see `get_stock_levels`.
+        """
+        if not self._cart:
+            return []
+        
+        products = product_index.get_many(self._cart)
+        
+        if len(products) != len(self._cart):
+            logger.warning(f"[*] {len(self._cart) - len(products)} product(s) in the cart no longer exist")
+        
+        return ProductDTO.from_cart_lines(self._cart, products, self.get_stock_levels())
+    
+    @property
+    def _pricing_name(self) -> str:
+        return f"{self._session_name}_pricing"
+    
+    @property
+    def session_key(self) -> str:
+        """Returns the session key of the visitor, creating their session first if they don't have one yet."""
+        if self._request.session.session_key is None:
+            self._request.session.save()
+        return self._request.session.session_key
+    
+    @property
+    def _discount_name(self) -> str:
+        return f"{self._session_name}_discount"
+    
+    @property
+    def discount_code(self):
+        """Returns the discount code attached to the cart (see `set_discount`) or None if there isn't one."""
+        attached = self._storage.load(self._discount_name)
+        return attached["code"] if attached else None
+    
+    async def adiscount_code(self):
+        """The async version of `discount_code`."""
+        attached = await self._storage.aload(self._discount_name)
+        return attached["code"] if attached else None
+    
+    def set_discount(self, discount: Discount) -> None:
+        """
+        Attaches a discount to the cart, see `product.discount_redemption.redeem_discount_code`.
+
+        Only the code is stored with the cart, the discount is looked up through the discount cache
+        whenever the cart is priced, so a discount that expires or is deleted stops applying.
+        """
+        self._storage.save(self._discount_name, {"code": discount.code})
+    
+    def get_discount_percentage(self):
+        """Returns the percentage of the discount attached to the cart if it is active now (and not linked to products), otherwise 0."""
+        code     = self.discount_code
+        discount = discount_cache.get(code) if code else None
+        return self._get_cart_wide_percentage(discount)
+    
+    async def aget_discount_percentage(self):
+        """The async version of `get_discount_percentage`."""
+        code     = await self.adiscount_code()
+        discount = await sync_to_async(discount_cache.get)(code) if code else None
+        return self._get_cart_wide_percentage(discount)
+    
+    @staticmethod
+    def _get_cart_wide_percentage(discount) -> int:
+        """Returns the percentage of a discount attached to the cart if it is active now and not linked to products, otherwise 0."""
+        if discount is None or not discount.is_active() or discount.is_product_scoped():
+            return 0
+        return discount.discount
+    
+    def get_pricing(self, discount_percentage=None) -> CartPricing:
+        """
+        Returns the price of the cart: its line totals, subtotal, discount, shipping, tax and total.
+
+        The cart is priced by `product.cart_pricing.price_cart` and the result is stored in the
+        cart storage next to the cart, keyed by the cart's content hash and the pricing rules.
+        As long as neither changes the stored pricing is returned as it is, so the cart is only
+        priced again (and the storage only written to) after the cart has changed. The price of
+        an empty cart isn't stored, so that it never creates a session.
+
+        Args:
+            discount_percentage (Decimal | int, optional): The percentage taken off the subtotal,
+                                                           defaults to the percentage of the active
+                                                           discount attached to the cart, if any.
+
+        Returns:
+            CartPricing: The price of the cart.
+        """
+        if discount_percentage is None:
+            discount_percentage = self.get_discount_percentage()
+        
+        rules  = get_pricing_rules(discount_percentage)
+        key    = get_pricing_key(self._content_hash, rules)
+        cached = self._storage.load(self._pricing_name)
+        
+        if cached and cached.get("k") == key:
+            return CartPricing.from_json(cached["p"])
+        
+        pricing = price_cart(self._cart, rules)
+        
+        if self._cart:
+            self._storage.save(self._pricing_name, {"k": key, "p": pricing.to_json()})
+        return pricing
+    
+    async def aget_pricing(self, discount_percentage=None) -> CartPricing:
+        """The async version of `get_pricing`."""
+        if discount_percentage is None:
+            discount_percentage = await self.aget_discount_percentage()
+        
+        rules  = get_pricing_rules(discount_percentage)
+        key    = get_pricing_key(self._content_hash, rules)
+        cached = await self._storage.aload(self._pricing_name)
+        
+        if cached and cached.get("k") == key:
+            return CartPricing.from_json(cached["p"])
+        
+        pricing = price_cart(self._cart, rules)
+        
+        if self._cart:
+            await self._storage.asave(self._pricing_name, {"k": key, "p": pricing.to_json()})
+        return pricing
+    
+    def get_stock_levels(self) -> dict:
+        """
+        Returns the live number of units of each product in the cart available to the visitor.
+
+        The levels are read from the stock snapshot (see `product.stock_snapshot`), at a cost of
+        at most one query for the whole cart. When stock is reserved, the units held for the
+        visitor are no longer part of `Product.quantity` and the units of their live reservations
+        are added back (one more query), so that a visitor holding the last unit still sees it
+        as in stock. The units of a cart line whose reservation expired are not, as they are no
+        longer held for the visitor.
 
-        return self._cart or []
+        Returns:
+            dict: A dictionary mapping the product id (int) to the number of units.
+        """
+        levels = stock_snapshot.get_many(self._cart)
+        
+        if not self._holds_stock(levels):
+            return levels
+        return self._add_held_units(levels, get_held_quantities(self._request.session.session_key, levels))
+    
+    async def aget_stock_levels(self) -> dict:
+        """The async version of `get_stock_levels`."""
+        levels = await stock_snapshot.aget_many(self._cart)
+        
+        if not self._holds_stock(levels):
+            return levels
+        return self._add_held_units(levels, await aget_held_quantities(self._request.session.session_key, levels))
+    
+    def _holds_stock(self, levels: dict) -> bool:
+        """Returns True if the visitor may hold units of the products, i.e. reservations are on and they have a session."""
+        return bool(levels) and getattr(settings, "STOCK_RESERVATIONS", False) and self._request.session.session_key is not None
+    
+    @staticmethod
+    def _add_held_units(levels: dict, held: dict) -> dict:
+        return {id: level + held.get(id, 0) for id, level in levels.items()}
     
     def flush_session(self):
-        """Clears the entire session"""
-        self._request.session.flush()
\ No newline at end of file
+        """Clears the cart and the entire session"""
+        if getattr(settings, "STOCK_RESERVATIONS", False) and self._request.session.session_key:
+            release_session_reservations(self._request.session.session_key)
+        
+        self._storage.delete(self._session_name)
+        self._storage.delete(self._pricing_name)
+        self._storage.delete(self._discount_name)
+        self._request.session.flush()
+        self._request.cart_total = 0
\ No newline at end of file
@@ -5,42 +5,56 @@ products = [
         "description": "Step out in style with these classic white trainers, designed for both comfort and versatility. Featuring a sleek, minimalist design, they pair effortlessly with any outfit, whether you're dressing up or keeping it casual. Made from durable materials with a cushioned sole for all-day support, these trainers are perfect for everyday wear.",
         "price": 100,
         "quantity": 50,
+        "sku": "SHOE-0001",
+        "image": "p1.jpg",
     },
     {
         "name": "UrbanFlex Classic Sneakers",
         "description": "These crisp white trainers are the perfect blend of style and comfort. With a lightweight design, breathable material, and a cushioned sole, they offer all-day support whether you're on the move or keeping it casual. A timeless essential for any wardrobe.",
         "price": 120,
         "quantity": 150,
+        "sku": "SHOE-0002",
+        "image": "p2.jpg",
     },
     {
         "name": "TrailBlazer Hiking Boots",
         "description": "Conquer the great outdoors with these rugged hiking boots. Designed with a waterproof exterior, reinforced soles, and ankle support, they provide maximum protection and comfort on any terrain.",
         "price": 180,
         "quantity": 70,
+        "sku": "SHOE-0003",
+        "image": "p3.jpg",
     },
     {
         "name": "SoleMate Running Shoes",
         "description": "Take your workout to the next level with these ultra-lightweight running shoes. Featuring advanced shock absorption, breathable mesh, and a snug fit, they ensure comfort and performance during every run.",
         "price": 95,
         "quantity": 100,
+        "sku": "SHOE-0004",
+        "image": "p4.jpg",
     },
     {
         "name": "ComfyStride Everyday Loafers",
         "description": "Slip into effortless comfort with these versatile loafers. Perfect for work or casual outings, they feature a soft leather upper, cushioned insoles, and a durable sole for long-lasting wear.",
         "price": 80,
         "quantity": 120,
+        "sku": "SHOE-0005",
+        "image": "p5.jpg",
     },
     {
         "name": "Elegance Heeled Sandals",
         "description": "Step up your style game with these chic heeled sandals. Featuring a sleek design, adjustable straps, and a padded footbed, they're perfect for weddings, parties, or a night out.",
         "price": 130,
         "quantity": 60,
+        "sku": "SHOE-0006",
+        "image": "p6.jpg",
     },
     {
         "name": "Explorer Trek Sandals",
         "description": "Perfect for warm-weather adventures, these trek sandals feature a durable grip sole, adjustable straps, and a cushioned insole for maximum comfort and support during outdoor activities.",
         "price": 70,
         "quantity": 90,
+        "sku": "SHOE-0007",
+        "image": "p7.jpg",
     },
     
      {
@@ -48,6 +62,8 @@ products = [
         "description": "Keep your feet warm and stylish with these insulated winter boots. Featuring a faux fur lining, waterproof exterior, and sturdy sole, they're a must-have for cold-weather fashion and functionality.",
         "price": 150,
         "quantity": 40,
+        "sku": "SHOE-0008",
+        "image": "p8.jpg",
     }
   
 ]
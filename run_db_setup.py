@@ -10,9 +10,7 @@ from datetime import datetime
 
 from django.forms import ValidationError
 
-from products import get_products
-
-from typing import List
+from product_list import products
 
 log_dir = join(dirname(abspath(__file__)), 'logs')
 
@@ -31,6 +29,10 @@ django.setup()
 
 from django.conf import settings
 from django.contrib.sessions.models import Session
+from django.db.models import F
+from product.catalog_import import upsert_batch, validate_row
+from product.discount_engine import apply_discount_to_products
+from product.image_variants import refresh_image_variants
 from product.models import Product, Discount
 from utils.discount import create_discount_code
 
@@ -78,79 +80,72 @@ def create_discount_instance(name:str="save25%", discount:float=25, num_of_days_
         raise ValueError(f"Failed to create discount instance: {e.messages}")
     
 
-def prepare_bulk_products(products: list) -> List[Product]:
+def prepare_products(products: list) -> list:
     """
-    Prepares a list of Product instances for bulk creation in the database.
+    Validates the product data and prepares it to be upserted into the database.
+
+    Each product names its own image file, which must exist in the product media directory.
 
     Args:
         products (list): A list of dictionaries, where each dictionary contains product data.
 
     Returns:
-        list: A list of Product instances ready for bulk creation.
+        list: The validated product fields, see `product.catalog_import.validate_row`.
 
     Raises:
-        ValueError: If the provided 'products' argument is None or not a list.
+        ValueError: If the provided 'products' argument is None or not a list, or a product is invalid.
     """
     if not products:
         raise ValueError("Expected a list of product objects but got None or empty list.")
-    
-    
 
-    products_list = []
-    discount_25   = create_discount_instance()
-    discount_50   = create_discount_instance(name="save50%", discount=50)
-    
-    for index, product_obj in enumerate(products):
-        
-        try:
-            products_list.append(
-                Product(
-                    name=product_obj["name"],
-                    description=product_obj["description"],
-                    price=product_obj["price"],
-                    quantity=product_obj["quantity"],
-                    image=product_obj.get("image", ""),
-                    discount=discount_25 if (index % 2 == 0) else discount_50,
-                    has_discount=True if (discount_25 or discount_50) else False,
-                )
-            )
-        except KeyError as e:
-            raise ValueError(f"Missing required field in product object: {e}")
-    
-    return products_list
+    return [validate_row(product_obj, MEDIA_PATH) for product_obj in products]
+
+
+def apply_demo_discounts(skus: list) -> None:
+    """
+    Replaces the demo discounts and applies them to every other product, 25% off to the
+    first product, 50% off to the second and so on.
+    """
+    demo_discounts = Discount.objects.filter(name__in=["save25%", "save50%"])
+
+    # Products are unlinked first since deleting a discount would delete its products too
+    Product.objects.filter(discount__in=demo_discounts).update(discount=None,
+                                                               has_discount=False,
+                                                               is_discount_applied=False,
+                                                               effective_price=F("price"),
+                                                               )
+    demo_discounts.delete()
+
+    discount_25 = create_discount_instance()
+    discount_50 = create_discount_instance(name="save50%", discount=50)
+
+    apply_discount_to_products(discount_25, Product.objects.filter(sku__in=skus[0::2]))
+    apply_discount_to_products(discount_50, Product.objects.filter(sku__in=skus[1::2]))
 
 
 def main():
     """Runs the script and ensures that the products are uploaded to the database"""
     
-    logger.info("[*] Please wait, checking if there is a discount applied to the products")
-    
-    products = Product.objects.all()
-    
-    if len(products) > 0:
-        products.delete()
-        Discount.objects.all().delete()
-        
     logger.info("[*] Please wait, attempting to populate the database...")
     
     try:
-        products = get_products(MEDIA_PATH)
+        rows = prepare_products(products)
     except ValueError as e:
         logger.error(f"[-] There was an error preparing the products: {e}")
         return
     
-    logger.info("[+] Successfully prepared the product data.")
-    
-    if not products:
-        logger.error("[-] No products to upload. Exiting.")
-        return
+    logger.info("[+] Successfully prepared the product data. Uploading to database...")
 
     try:
-        products_list = prepare_bulk_products(products)
-        logger.info("[+] Bulk preparation successful. Uploading to database...")
-        
-        Product.objects.bulk_create(products_list)
+        # Products are matched by their sku, so running the script again updates them rather than duplicating them
+        upsert_batch(rows)
         logger.info("[+] Successfully created products in the database.")
+
+        refresh_image_variants(Product.objects.filter(sku__in=[row["sku"] for row in rows]))
+        logger.info("[+] Successfully generated the resized product images.")
+        
+        apply_demo_discounts([row["sku"] for row in rows])
+        logger.info("[+] Successfully applied the discounts to the products.")
     except Exception as e:
         logger.error(f"[-] Failed to create products in the database: {e}")
 
@@ -0,0 +1,72 @@
+import fetchData from "./fetch.js";
+
+
+const cartSection = document.getElementById("cart");
+const csrfInput   = document.querySelector("#cart input[name='csrfmiddlewaretoken']");
+
+
+/**
+ * Collects the cart changes made on the cart page (quantity clicks, removals) and sends them
+ * to the backend as a single batch, rather than one request per click.
+ *
+ * Only the final state of each product matters, so a later operation on a product replaces any
+ * earlier one that hasn't been sent yet e.g. five clicks on the plus icon become a single `set_qty`.
+ * The batch is sent once the user has stopped clicking for `FLUSH_DELAY_IN_MS`.
+ */
+export const cartBatch = {
+    FLUSH_DELAY_IN_MS: 400,
+    _operations: new Map(),
+    _timer: null,
+
+    /**
+     * Called with the resulting cart returned by the backend after every batch, e.g. to render its pricing.
+     * @type {function(object):void|null}
+     */
+    onFlushed: null,
+
+    /**
+     * Queues an operation to be sent with the next batch.
+     *
+     * @param {object} operation - The operation e.g { op: "set_qty", productID: "5", qty: 2 }
+     */
+    queue: (operation) => {
+        cartBatch._operations.set(operation.productID, operation);
+
+        clearTimeout(cartBatch._timer);
+        cartBatch._timer = setTimeout(cartBatch.flush, cartBatch.FLUSH_DELAY_IN_MS);
+    },
+
+    /**
+     * Sends every queued operation to the backend in a single request.
+     *
+     * @returns {Promise<object|null>} - The resulting cart returned by the backend or null if nothing was sent.
+     */
+    flush: async () => {
+        if (cartBatch._operations.size === 0 || !cartSection || !csrfInput) return null;
+
+        const operations = Array.from(cartBatch._operations.values());
+        cartBatch._operations.clear();
+
+        const cart = await fetchData({ url: cartSection.dataset.batchUrl,
+                                       csrfToken: csrfInput.value,
+                                       body: { operations: operations },
+                                       method: "POST",
+                                      });
+
+        if (cart && cartBatch.onFlushed) {
+            cartBatch.onFlushed(cart);
+        }
+        return cart;
+    },
+};
+
+
+/**
+ * Extracts the product id from an element id such as `product5`, `product5-qty` or `product5-div`.
+ *
+ * @param {string} elementID - The id of the element.
+ * @returns {string} - The product id e.g "5".
+ */
+export function extractProductID(elementID) {
+    return elementID.replace("product", "").split("-")[0];
+}
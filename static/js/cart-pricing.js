@@ -0,0 +1,54 @@
+import { concatenateWithDelimiter, showPopup } from "./utils.js";
+
+
+const CURRENCY = "£";
+
+const summaryElements = {
+    subtotal: document.getElementById("price-total"),
+    discount: document.getElementById("price-discount"),
+    shipping: document.getElementById("shipping-and-handling"),
+    shipping_discount: document.getElementById("shipping-discount"),
+    tax: document.getElementById("price-tax"),
+    total: document.getElementById("order-total"),
+};
+
+const discountRow = document.getElementById("discount-row");
+
+
+/**
+ * Renders the cart pricing computed by the backend (see `product.cart_pricing`) into the cart summary
+ * and the price of each cart line.
+ *
+ * The amounts are strings that are displayed as they are, nothing is recomputed in the browser.
+ *
+ * @param {object} pricing - The `PRICING` returned by the backend e.g
+ *                           { subtotal: "39.98", discount: "0.00", ..., total: "72.98", lines: { "5": "39.98" } }
+ */
+export function renderCartPricing(pricing) {
+    if (!pricing) return;
+
+    for (const [name, element] of Object.entries(summaryElements)) {
+        if (!element || pricing[name] === undefined) continue;
+
+        const isDeducted    = name === "discount" || name === "shipping_discount";
+        element.textContent = concatenateWithDelimiter(isDeducted ? `-${CURRENCY}` : CURRENCY, pricing[name]);
+    }
+
+    if (discountRow) {
+        discountRow.hidden = parseFloat(pricing.discount) === 0;
+    }
+
+    for (const [productID, lineTotal] of Object.entries(pricing.lines || {})) {
+        const priceElements = [document.getElementById(`product${productID}-price`),
+                               document.getElementById(`product${productID}-price-span`),
+                              ];
+
+        priceElements.forEach((element) => {
+            if (element) element.textContent = concatenateWithDelimiter(CURRENCY, lineTotal);
+        });
+    }
+
+    [summaryElements.subtotal, summaryElements.total].forEach((element) => {
+        if (element) showPopup(element);
+    });
+}
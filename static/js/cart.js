@@ -8,10 +8,11 @@ import { handleSaveSidebar } from "./sidebar.js";
 import   getCartProductInfo from "./product.js";
 import { cardsContainer, createProductCard } from "./components.js";
 import { applyDashToInput, discountManager, extractDiscountCodeFromForm } from "./handle-discount-form.js";
+import { cartBatch, extractProductID } from "./cart-batch.js";
+import { renderCartPricing } from "./cart-pricing.js";
 
 import { checkIfHTMLElement,
         concatenateWithDelimiter,
-        showPopup, 
         toggleSpinner,
         extractCurrencyAndValue,
         } from "./utils.js";
@@ -35,14 +36,15 @@ validatePageElements();
 
 
 /**
- * Initializes the cart page by updating the product array
- * and displaying the cart summary when the user navigates to the page.
+ * Initializes the cart page by updating the product array when the user navigates to the page.
+ * The cart summary is rendered by the backend and updated with the pricing returned after every
+ * batch of cart changes.
  */
 const cartPageLoader = {
     init: () => {
         updateProductArray();
-        updateCartSummary();
         updateCartQuantityTag(priceElementsArray);
+        cartBatch.onFlushed = (cart) => updateCartSummary(cart.PRICING);
     }
 };
 
@@ -70,7 +72,6 @@ function handleEventDelegeation(e) {
     // Ensures that `showPopup` is only triggered when the `plus` or `minus` button
     //  is clicked, not when other elements (e.g., a link) are clicked.
     if (actionType) {
-        updateCartSummary();
         updateCartQuantity(e, actionType);  
     }
 
@@ -81,12 +82,13 @@ function handleEventDelegeation(e) {
 
     if (e.target.id === discountInputIDBtn) {
        
-        const code      = extractDiscountCodeFromForm(discountForm);
-        const isSuccess = discountManager.applyDiscount(code);
- 
-        if (isSuccess) {
-             discountInputField.value = "";
-        }
+        const code = extractDiscountCodeFromForm(discountForm);
+
+        discountManager.applyDiscount(code).then((isSuccess) => {
+            if (isSuccess) {
+                discountInputField.value = "";
+            }
+        });
      }
     removeFromCart(e);
     handleSave(e);
@@ -138,6 +140,7 @@ function updateCartQuantity(e, actionType) {
          
             currentProductQtyElement.textContent = newQuantity;
             
+            cartBatch.queue({ op: "set_qty", productID: extractProductID(productIDName), qty: newQuantity });
             updateCartPrice(productIDName, newQuantity, currentPrice); 
         }; 
     } catch (error) {
@@ -147,49 +150,13 @@ function updateCartQuantity(e, actionType) {
 
 
 /**
- * Updates the cart summary card by updating the total price after the user hits plus or minus icons for each product.
- * The update includes adding the tax and the shipping cost to the overall product total.
- * @param {Event} e - The event object triggered by clicking the button.
- * @param {string} actionType - The type of action to perform e.g increase or decrease.
+ * Updates the cart summary card with the pricing computed by the backend (the line totals, subtotal,
+ * discount, shipping, tax and order total), which is returned after every batch of cart changes is applied.
+ * Nothing is recomputed in the browser.
+ * @param {object} pricing - The `PRICING` of the cart returned by the backend.
  */
-function updateCartSummary() {
-   
-    if (!Array.isArray(priceElementsArray)) {
-        console.error(`Expect an array list but got: ${typeof priceElementsArray}`);
-        return;
-    };
-
-    let total = 0;
-    let sign  = "£";  // default
-
-    priceElementsArray.forEach((priceElement) => {
-
-        const priceData = extractCurrencyAndValue(priceElement.textContent);
-        if (!sign) {
-            sign = priceData.currency;
-        }
-       
-        total += priceData.amount;
-    })
-
-    const tax              = extractCurrencyAndValue(priceTax.textContent).amount;
-    const shippingCost     = extractCurrencyAndValue(shippingAndHandling.textContent).amount; 
-
-    priceTotal.textContent = concatenateWithDelimiter(sign, total);
-
-    const totalOrderCost   = (total + tax + shippingCost);
-    orderTotal.textContent = concatenateWithDelimiter(sign, totalOrderCost);
-
-    if (discountManager.isDiscountApplied()) {
-        const discountCode = discountManager.getCurrentAppliedDiscountCode();
-        discountManager.applyDiscount(discountCode, true);
-    };
-
-    const elements = [priceTotal, orderTotal];
-
-    elements.forEach((element) => {
-        showPopup(element)
-    })  
+function updateCartSummary(pricing) {
+    renderCartPricing(pricing);
 }
 
 
@@ -221,9 +188,8 @@ function updateCartPrice(productName, quantity, currentPriceStr) {
     const priceData = extractCurrencyAndValue(currentPriceStr);
     const newPrice  = priceData.amount * quantity
     
-    currentPriceElement.textContent = concatenateWithDelimiter(priceData.currency, newPrice.toString());
+    currentPriceElement.textContent = concatenateWithDelimiter(priceData.currency, newPrice.toFixed(2));
     updateCartQuantityTag(priceElementsArray);
-    updateCartSummary();
 }
 
 
@@ -259,6 +225,8 @@ function removeFromCart(e, silent=false) {
 
         // make the item unclickable to prevent the user from clicking multiple times while it is spinner is spinning
         productDiv.style.pointerEvents = "none";
+
+        cartBatch.queue({ op: "remove", productID: extractProductID(divID) });
     
         toggleSpinner(spinner);
 
@@ -266,7 +234,6 @@ function removeFromCart(e, silent=false) {
             productDiv.remove();
 
             updateProductArray(priceElementsArray);
-            updateCartSummary();
             updateCartQuantityTag(priceElementsArray);
             toggleSpinner(spinner, false);
             removeCardSummary();
@@ -1,11 +1,12 @@
-import { extractCurrencyAndValue, 
-    concatenateWithDelimiter,
+import { concatenateWithDelimiter,
      showSpinnerFor, 
      checkIfHTMLElement } from "./utils.js";
 import { showPopupMessage } from "./messages.js";
+import { renderCartPricing } from "./cart-pricing.js";
 
-const spinner    = document.getElementById("spinner");
-const orderTotal = document.getElementById("order-total");
+const spinner      = document.getElementById("spinner");
+const discountForm = document.getElementById("apply-form");
+const csrfInput    = document.querySelector("#cart input[name='csrfmiddlewaretoken']");
 
 
 validatePageElements();
@@ -44,115 +45,89 @@ e.target.value = text;
 };
 
 /**
-* Manages the application of discount codes and their corresponding percentages.
+* Redeems discount codes against the cart on the backend (see `cart.views.redeem_discount`).
+*
+* The backend validates the code, attaches its discount to the cart and returns the repriced
+* cart, which is rendered as it is. No discount is ever worked out in the browser.
 */
 export const discountManager = {
-    _discounts: {
-        "EGBIE-GET50-PERCE-NTOFF": 50, //  50% discount
-        "EGBIE-SUMME-RSALE-20OFF": 20,  //   20% discount
-        "EGBIE-GET10-OFFFI-RSTIM": 10  //   10% discount
-    },
     _discountApplied: false,
-    _currency: null,
     _currentDiscountCode: null,
 
     /**
-     * Applies a discount to the cart total if the provided code is valid and has not already been applied.
+     * Sends a discount code to the backend and renders the new cart totals if it was redeemed.
      * 
      * @param {string} code - The discount code entered by the user.
-     * @param {boolean} allowReapply - If true, allows reapplying the discount even if it's already applied.
-     * @returns {boolean} - Returns `true` if the discount is successfully applied, otherwise `false`.
+     * @returns {Promise<boolean>} - Resolves to `true` if the discount was applied, otherwise `false`.
      */
-    applyDiscount: (code, allowReapply = false) => {
+    applyDiscount: async (code) => {
+
+        if (!code || !discountForm) return false;
 
-        if (!code) return;
+        const normalisedCode = code.toUpperCase();
 
-        const discountPercentage = discountManager._getDiscountPercentage(code);
+        if (discountManager.isDiscountApplied() && discountManager.getCurrentAppliedDiscountCode() === normalisedCode) {
+            showPopupMessage("This discount has already been applied.");
+            return false;
+        }
 
-        if (discountPercentage !== undefined) {
-            showSpinnerFor(spinner);
+        showSpinnerFor(spinner);
 
-            if (discountManager.isDiscountApplied() && !allowReapply) {
-                const msg = "This discount has already been applied.";
-                showPopupMessage(msg);
-                return false;
-            }
+        const result = await discountManager._redeem(normalisedCode);
 
-            discountManager._discountApplied = true;
+        if (!result) {
+            showPopupMessage("The discount code couldn't be applied, please try again.");
+            return false;
+        }
 
-            const cartTotal      = discountManager._getCartTotal();
-            const discountAmount = (discountPercentage / 100) * cartTotal;
-            const newTotal       = cartTotal - discountAmount;
+        renderCartPricing(result.PRICING);
+        showPopupMessage(result.isSuccess ? result.MESSAGE : result.ERROR);
 
-            discountManager._renderNewTotal(newTotal, discountPercentage);
-            return true;
+        if (result.isSuccess) {
+            discountManager._discountApplied     = true;
+            discountManager._currentDiscountCode = normalisedCode;
         }
+        return result.isSuccess;
     },
 
     /**
-     * Gets the discount percentage associated with a given discount code (case-insensitive).
+     * Posts the code to the redemption endpoint. The JSON body is returned for error responses too,
+     * since it holds the reason the code was refused.
      * 
-     * @param {string} code - The discount code entered by the user.
-     * @returns {number|undefined} - Returns the discount percentage if valid, otherwise `undefined`.
+     * @param {string} code - The normalised discount code.
+     * @returns {Promise<object|null>} - The JSON returned by the backend or null if the request failed.
      */
-    _getDiscountPercentage: (code) => {
-        if (!code) return undefined;
-
-        // Normalise the code to uppercase to handle case-insensitive matches
-        const normalisedCode = code.toUpperCase();
-
-        const discountCode = discountManager._discounts[normalisedCode];
-
-        if (discountCode) {
-            discountManager._currentDiscountCode = normalisedCode;
+    _redeem: async (code) => {
+        try {
+            const response = await fetch(discountForm.dataset.discountUrl, {
+                method: "POST",
+                headers: { "Content-Type": "application/json", "X-CSRFToken": csrfInput?.value },
+                body: JSON.stringify({ discountCode: code }),
+            });
+            return await response.json();
+
+        } catch (error) {
+            console.error("Fetch error: " + error.message);
+            return null;
         }
-        return discountCode;
-
-},
-
-/**
-* Retrieves the discount code currently applied.
-* @returns {string|null} The applied discount code, or null if no discount is applied.
-*/
- getCurrentAppliedDiscountCode: () => {
-    return discountManager._currentDiscountCode;
-
-},
-
-/**
- * Checks if a discount has already been applied.
- * 
- * @returns {boolean} - Returns `true` if the discount is already applied, otherwise `false`.
- */
-isDiscountApplied: () => {
-    return discountManager._discountApplied;
-},
+    },
 
-/**
- * Retrieves the current total of the cart and extracts the currency and amount.
- * 
- * @returns {number} - The total amount of the cart. Returns `0` if no total is found.
- */
-_getCartTotal: () => {
-    const priceData = extractCurrencyAndValue(orderTotal.textContent);
-    if (priceData) {
-        discountManager._currency = priceData.currency;
-        return priceData.amount;
-    }
-    return 0;
-},
+    /**
+    * Retrieves the discount code currently applied.
+    * @returns {string|null} The applied discount code, or null if no discount is applied.
+    */
+    getCurrentAppliedDiscountCode: () => {
+        return discountManager._currentDiscountCode;
+    },
 
-/**
- * Updates the displayed cart total with the new discounted amount.
- * 
- * @param {number} amount - The new total after applying the discount.
- * @param {number} discountPercentage - The percentage of the applied discount.
- */
-_renderNewTotal: (amount, discountPercentage) => {
-    const msg = `Your ${discountPercentage}% discount has been successfully applied.`;
-    showPopupMessage(msg);
-    orderTotal.textContent = concatenateWithDelimiter(discountManager._currency, amount);
-},
+    /**
+     * Checks if a discount has already been applied.
+     * 
+     * @returns {boolean} - Returns `true` if the discount is already applied, otherwise `false`.
+     */
+    isDiscountApplied: () => {
+        return discountManager._discountApplied;
+    },
 };
 
 
@@ -192,5 +167,5 @@ return text?.split("-").join("");
 
 function validatePageElements() {
 if (!checkIfHTMLElement(spinner, "spinner")) return;
-if (!checkIfHTMLElement(orderTotal, "OrderTotal")) return;
+if (!checkIfHTMLElement(discountForm, "Discount form")) return;
 }
\ No newline at end of file
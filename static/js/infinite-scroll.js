@@ -0,0 +1,60 @@
+import fetchData from "./fetch.js";
+import { createStoreCard } from "./store-card.js";
+
+
+/**
+ * Fetches further pages of products from the product listing API whenever the `load-more`
+ * element comes into view and appends them to the cards container.
+ *
+ * The server only renders the first page of the catalog, each page returns the cursor
+ * of the next page which is kept in the `data-next-cursor` attribute of the `load-more` element.
+ * Once the last page has been fetched the `load-more` element is removed.
+ *
+ * @param {HTMLElement} cardsContainer - The element the store cards are appended to.
+ */
+export function initInfiniteScroll(cardsContainer) {
+
+    const loadMore = document.getElementById("load-more");
+
+    if (!loadMore || !("IntersectionObserver" in window)) return;
+
+    let isLoading = false;
+
+    const observer = new IntersectionObserver(async (entries) => {
+
+        if (isLoading || !entries.some((entry) => entry.isIntersecting)) return;
+
+        isLoading = true;
+        const nextCursor = await loadNextPage(loadMore, cardsContainer);
+        isLoading = false;
+
+        if (!nextCursor) {
+            observer.disconnect();
+            loadMore.remove();
+        }
+    }, { rootMargin: "400px" });
+
+    observer.observe(loadMore);
+}
+
+
+async function loadNextPage(loadMore, cardsContainer) {
+
+    const cursor = loadMore.dataset.nextCursor;
+    const url    = `${loadMore.dataset.url}?cursor=${encodeURIComponent(cursor)}`;
+
+    const responseData = await fetchData({ url: url, body: {}, method: "GET" });
+
+    if (!responseData) return null;
+
+    const fragment = document.createDocumentFragment();
+
+    responseData.PRODUCTS.forEach((product) => {
+        fragment.appendChild(createStoreCard(product, loadMore.dataset.cartIcon));
+    });
+
+    cardsContainer.appendChild(fragment);
+    loadMore.dataset.nextCursor = responseData.NEXT_CURSOR || "";
+
+    return responseData.NEXT_CURSOR;
+}
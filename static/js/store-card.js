@@ -0,0 +1,142 @@
+/**
+ * Creates a store card for a product returned by the product listing API.
+ *
+ * The markup mirrors `templates/partials/store_card.html` so that cards fetched on demand
+ * look and behave exactly like the ones rendered by the server.
+ *
+ * @param {object} product  - The product e.g { id, name, short_description, price, quantity, image, srcset }
+ * @param {string} cartIcon - The url of the cart icon image.
+ * @returns {HTMLElement}   - The store card div.
+ */
+export function createStoreCard(product, cartIcon) {
+
+    const cardDiv = document.createElement("div");
+    cardDiv.className = "store-card";
+
+    cardDiv.appendChild(createStoreCardHead(product));
+    cardDiv.appendChild(createStoreCardBody(product));
+    cardDiv.appendChild(createStoreCardFooter(product, cartIcon));
+
+    return cardDiv;
+}
+
+
+function createStoreCardHead(product) {
+
+    const headDiv = document.createElement("div");
+    const h3      = document.createElement("h3");
+
+    headDiv.className = "head";
+    h3.textContent    = product.name;
+
+    headDiv.appendChild(h3);
+    return headDiv;
+}
+
+
+function createStoreCardBody(product) {
+
+    const bodyDiv     = document.createElement("div");
+    const description = document.createElement("p");
+
+    bodyDiv.className = "body";
+
+    description.className   = "padding-bottom-sm product-description";
+    description.textContent = product.short_description;
+
+    bodyDiv.appendChild(createPicture(product));
+    bodyDiv.appendChild(description);
+    bodyDiv.appendChild(createLabelledPTag("Quantity: ", product.quantity));
+    bodyDiv.appendChild(createLabelledPTag("Price: ", `£${product.price}`));
+
+    return bodyDiv;
+}
+
+
+/**
+ * Creates the `<picture>` of a product, letting the browser pick the best sized WebP or JPEG
+ * variant from the product's `srcset`.
+ */
+function createPicture(product) {
+
+    const SIZES   = "(max-width: 600px) 100vw, 25vw";
+    const picture = document.createElement("picture");
+    const img     = document.createElement("img");
+    const srcset  = product.srcset || {};
+
+    if (srcset.webp) {
+        const source  = document.createElement("source");
+        source.type   = "image/webp";
+        source.srcset = srcset.webp;
+        source.sizes  = SIZES;
+        picture.appendChild(source);
+    }
+
+    img.src       = product.image;
+    img.alt       = "";
+    img.className = "store-image";
+    img.loading   = "lazy";
+
+    if (srcset.jpeg) {
+        img.srcset = srcset.jpeg;
+        img.sizes  = SIZES;
+    }
+
+    picture.appendChild(img);
+    return picture;
+}
+
+
+function createStoreCardFooter(product, cartIcon) {
+
+    const footerDiv = document.createElement("div");
+    const button    = document.createElement("button");
+    const span      = document.createElement("span");
+    const img       = document.createElement("img");
+    const spinner   = document.createElement("div");
+
+    const spinnerID = `${product.id}-spinner`;
+    const cartImgID = `${product.id}-cart-img`;
+
+    footerDiv.className = "footer";
+
+    button.id                  = `${product.id}-id`;
+    button.className           = "capitalize add-to-cart";
+    button.dataset.spinner     = spinnerID;
+    button.dataset.cartimg     = cartImgID;
+    button.dataset.productid   = product.id;
+
+    span.className       = "cart-img-span";
+    span.dataset.spinner = spinnerID;
+
+    img.src             = cartIcon;
+    img.alt             = "icon image";
+    img.id              = cartImgID;
+    img.className       = "icon cart-image-btn";
+    img.dataset.spinner = spinnerID;
+
+    spinner.className = "spinner2";
+    spinner.id        = spinnerID;
+
+    span.appendChild(img);
+    button.appendChild(span);
+    button.appendChild(spinner);
+    footerDiv.appendChild(button);
+
+    return footerDiv;
+}
+
+
+function createLabelledPTag(label, value) {
+
+    const pTag = document.createElement("p");
+    const span = document.createElement("span");
+
+    span.className   = "bold";
+    span.textContent = label;
+
+    pTag.appendChild(span);
+    pTag.appendChild(document.createTextNode(` ${value}`));
+
+    return pTag;
+}
@@ -2,12 +2,14 @@ import fetchData from "./fetch.js";
 import {checkIfHTMLElement, displaySpinnerFor} from "./utils.js";
 import { setCartNavIconQuantity } from "./cart-visuals..js";
 import { showPopupMessage } from "./messages.js";
+import { initInfiniteScroll } from "./infinite-scroll.js";
 
 const productSection = document.getElementById("products");
 const CSRF_TOKEN     = document.querySelector("input[name='csrfmiddlewaretoken'").value;
 
 validatePageElements();
 
+initInfiniteScroll(productSection.querySelector(".cards"));
 
 productSection.addEventListener("click", handleProductDelegation);
 
@@ -79,14 +81,9 @@ async function sendProdutDataToBackend(element) {
     const product = element.dataset;
     const url     = "store/basket/add/";
 
+    // The backend resolves the rest of the product data from the product id
     const productObj = {
-       
         productID:product.productid,
-        name:product.name,
-        description:product.description,
-        price:product.price,
-        stock:parseInt(product.stock),
-        productImage:product.productimage,   
     }
     return await fetchData({url: url, csrfToken: CSRF_TOKEN, body: productObj, method: "POST" })
   
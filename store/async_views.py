@@ -0,0 +1,88 @@
+"""
+The async versions of the storefront views, routed instead of `store.views` when `ASYNC_VIEWS` is on.
+
+Under ASGI a sync view is run in a thread (through `sync_to_async`), one per request in flight.
+These views run on the event loop instead: the catalog is read with the async cache methods and
+queried with the async ORM on a miss, the guest session and the cart are loaded and saved with
+the async session and cart storage methods, and products are resolved with `product_index.aget`.
+
+They behave exactly like their sync versions in `store.views`, which remain the ones used under WSGI.
+"""
+import json
+
+from django.conf import settings
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+
+from utils.context_processors import aget_cart_total
+from utils.sessions import GUEST_SESSION_KEY, aensure_guest_session
+from utils.validator import avalidate_csrf_token
+
+from product.views_helper import CartRequestSession
+from store.catalog_cache import aget_catalog
+from store.etags import acondition, aget_home_etag
+from store.views import _create_json
+
+
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=aget_home_etag)
+async def home(request):
+    """The async version of `store.views.home`."""
+    guest      = await request.session.aget(GUEST_SESSION_KEY, {})
+    csrf_token = guest.get("CSRF_TOKEN") or get_token(request)
+    page_size  = settings.STORE_PAGE_SIZE if settings.STORE_INFINITE_SCROLL else None
+    catalog    = await aget_catalog(page_size)
+    
+    # Passed in the context since the lazy `cart_total` of the context processor can't be read here
+    context = {
+        "cards_html": catalog["cards_html"],
+        "total": catalog["total"],
+        "next_cursor": catalog["next_cursor"],
+        "csrf_token": csrf_token,
+        "cart_total": await aget_cart_total(request),
+    }
+    return render(request, "store.html", context=context)
+
+
+async def add_to_basket(request):
+    """The async version of `store.views.add_to_basket`."""
+    cart = await CartRequestSession.acreate(request)
+    
+    if request.method != "POST":
+        return _create_json(cart=cart, error='Only a POST response is allowed', status_code=405)
+
+    response = await avalidate_csrf_token(request)
+    
+    if response.get("error"):
+        
+        FORBIDDEN_CODE = 403
+        
+        return _create_json(cart=cart, 
+                            status_code=FORBIDDEN_CODE, 
+                            error=response.get("error", ""), 
+                            message=response.get("error", ""), 
+                            is_success=response.get("is_valid", False),
+                            )
+    
+    await aensure_guest_session(request, response["token"])
+    
+    product_data = json.loads(request.body.decode("utf-8"))
+
+    if not product_data:
+        
+        error = 'Something went wrong and no product data was not received'
+        return _create_json(error=error, cart=cart, status_code=405)
+    
+    try:
+        if settings.CART_SERVER_SIDE_LOOKUP:
+            await cart.aadd_product_by_id(product_data.get("productID"))
+        else:
+            await cart.aadd_to_session(product_data)
+        
+    except KeyError as error:
+        return _create_json(cart=cart, error=str(error), status_code=405)
+     
+    except ValueError as error:
+        return _create_json(cart=cart, error=str(error), status_code=405)
+    return _create_json(cart=cart, message='Added product to cart request session', is_success=True, status_code=200)
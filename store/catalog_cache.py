@@ -0,0 +1,246 @@
+import logging
+
+from datetime import datetime, timedelta
+from threading import Lock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max, Min, Q
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.timezone import now
+
+from product.models import Discount, Product
+from store.listing import DEFAULT_ORDER, ORDERS, encode_cursor, get_ordered_products
+
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY  = "catalog:version"
+CATALOG_ENTRY_KEY    = "catalog:entry:{version}:{page_size}"
+STORE_CARD_TEMPLATE  = "partials/store_card.html"
+
+
+def _get_cache():
+    """Returns the cache used to hold the storefront catalog."""
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+class DiscountEpoch:
+    """
+    The last discount boundary (a `start_date` or `end_date`) that has passed, held in-process
+    until the next boundary is reached.
+
+    A discount starting or ending changes the prices in the catalog without any product being
+    saved by the web process: the products are re-priced by the discount scheduler (see
+    `product.discount_scheduler`), a process of its own whose catalog version bumps never reach
+    the web processes when the cache is local to each process. The epoch is part of the catalog
+    version instead, so every process moves on to a new version once a boundary has passed.
+
+    For `DISCOUNT_TRANSITION_GRACE` seconds after a boundary, the time the scheduler is given to
+    re-price the products, the epoch also changes every `DISCOUNT_TRANSITION_STEP` seconds, so a
+    catalog built before the scheduler committed is not kept until the next boundary.
+
+    Finding the boundaries costs one query, once per boundary and process.
+    """
+    def __init__(self):
+        self._epoch       = None
+        self._valid_until = None
+        self._lock        = Lock()
+
+    def get(self, at: datetime = None) -> str:
+        """Returns the current epoch, finding the boundaries around the given time (defaults to now) once it has expired."""
+        at = at or now()
+
+        with self._lock:
+            if self._valid_until is None or at >= self._valid_until:
+                self._epoch, self._valid_until = self._load(at)
+            return self._epoch
+
+    async def aget(self, at: datetime = None) -> str:
+        """The async version of `get`, the boundaries are only queried (in a thread) once the epoch has expired."""
+        at = at or now()
+
+        if self._valid_until is None or at >= self._valid_until:
+            return await sync_to_async(self.get)(at)
+        return self._epoch
+
+    def invalidate(self) -> None:
+        """Drops the epoch, the boundaries are queried again on the next read e.g. after a discount's dates changed."""
+        with self._lock:
+            self._valid_until = None
+
+    @staticmethod
+    def _load(at: datetime) -> tuple:
+        """Returns the epoch at the given time and the time it expires at."""
+        boundaries = Discount.objects.aggregate(last_start=Max("start_date", filter=Q(start_date__lte=at)),
+                                                last_end=Max("end_date", filter=Q(end_date__lte=at)),
+                                                next_start=Min("start_date", filter=Q(start_date__gt=at)),
+                                                next_end=Min("end_date", filter=Q(end_date__gt=at)),
+                                                )
+        passed   = [date for date in (boundaries["last_start"], boundaries["last_end"]) if date]
+        upcoming = [date for date in (boundaries["next_start"], boundaries["next_end"]) if date]
+
+        last        = max(passed) if passed else None
+        valid_until = min(upcoming) if upcoming else at + timedelta(days=1)
+        epoch       = f"{last.timestamp():.0f}" if last else "0"
+        grace       = getattr(settings, "DISCOUNT_TRANSITION_GRACE", 60)
+
+        if last and at < last + timedelta(seconds=grace):
+            step        = getattr(settings, "DISCOUNT_TRANSITION_STEP", 5)
+            step_index  = int((at - last).total_seconds() // step)
+            epoch       = f"{epoch}:{step_index}"
+            valid_until = min(valid_until, last + timedelta(seconds=(step_index + 1) * step))
+
+        return epoch, valid_until
+
+
+discount_epoch = DiscountEpoch()
+
+
+def _get_counter() -> int:
+    return _get_cache().get_or_set(CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+def get_catalog_version() -> str:
+    """
+    Returns the current catalog version.
+
+    The version is made of a counter that is bumped every time a `Product` or a `Discount`
+    changes or the stock of a product is reserved or released, and of the discount epoch, which changes when a discount starts or ends (see
+    `DiscountEpoch`). Every cached catalog entry is keyed by the version it was built from,
+    so bumping the counter invalidates all of them at once without having to track or
+    delete the individual keys.
+    """
+    return f"{_get_counter()}.{discount_epoch.get()}"
+
+
+async def aget_catalog_version() -> str:
+    """The async version of `get_catalog_version`."""
+    return f"{await _get_cache().aget_or_set(CATALOG_VERSION_KEY, 1, timeout=None)}.{await discount_epoch.aget()}"
+
+
+def invalidate_catalog() -> int:
+    """
+    Invalidates the cached catalog by bumping the catalog version counter.
+
+    Returns:
+        int: The new value of the counter.
+    """
+    cache = _get_cache()
+    discount_epoch.invalidate()
+
+    try:
+        version = cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # The key was evicted (or never set), start again from a value that can't
+        # collide with an entry built before the eviction.
+        version = _get_counter() + 1
+        cache.set(CATALOG_VERSION_KEY, version, timeout=None)
+
+    logger.debug(f"Catalog cache invalidated, now at version {version}")
+    return version
+
+
+def build_catalog_entry(page_size: int = None) -> dict:
+    """
+    Queries the products and renders each one into its `store-card` fragment.
+
+    Args:
+        page_size (int, optional): When given only the first page of products is rendered, the
+                                   rest are fetched by the client through the product listing API.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'cards' (list): The rendered `store-card` html fragments, one per product.
+            - 'total' (int): The number of products in the catalog.
+            - 'next_cursor' (str | None): The listing cursor of the product after the rendered
+                                           ones, or None if every product was rendered.
+    """
+    products = get_ordered_products(DEFAULT_ORDER)
+
+    if page_size:
+        products = list(products[:page_size])
+        total    = Product.objects.count() if len(products) == page_size else len(products)
+    else:
+        products = list(products)
+        total    = len(products)
+
+    return _render_catalog_entry(products, total)
+
+
+async def abuild_catalog_entry(page_size: int = None) -> dict:
+    """The async version of `build_catalog_entry`, the products are queried with the async ORM."""
+    products = get_ordered_products(DEFAULT_ORDER)
+
+    if page_size:
+        products = [product async for product in products[:page_size]]
+        total    = await Product.objects.acount() if len(products) == page_size else len(products)
+    else:
+        products = [product async for product in products]
+        total    = len(products)
+
+    return _render_catalog_entry(products, total)
+
+
+def _render_catalog_entry(products: list, total: int) -> dict:
+    """Renders the `store-card` of each product, see `build_catalog_entry`."""
+    cards       = [render_to_string(STORE_CARD_TEMPLATE, {"product": product}) for product in products]
+    next_cursor = None
+
+    if len(products) < total:
+        last        = products[-1]
+        next_cursor = encode_cursor(DEFAULT_ORDER, getattr(last, ORDERS[DEFAULT_ORDER]), last.id)
+
+    return {"cards": cards, "total": total, "next_cursor": next_cursor}
+
+
+def get_catalog(page_size: int = None) -> dict:
+    """
+    Returns the rendered storefront catalog, building and caching it on a miss.
+
+    In the steady state (a warm cache) this costs zero catalog queries, since both the
+    rendered product cards and the product count are read straight from the cache.
+
+    Args:
+        page_size (int, optional): When given only the first page of products is rendered.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'cards_html' (SafeString): The rendered `store-card` fragments joined together.
+            - 'total' (int): The number of products in the catalog.
+            - 'next_cursor' (str | None): The listing cursor of the next page of products.
+    """
+    cache = _get_cache()
+    key   = CATALOG_ENTRY_KEY.format(version=get_catalog_version(), page_size=page_size or "all")
+    entry = cache.get(key)
+
+    if entry is None:
+        logger.debug(f"Catalog cache miss for key {key}, rendering the catalog")
+        entry = build_catalog_entry(page_size)
+        cache.set(key, entry, timeout=getattr(settings, "CATALOG_CACHE_TIMEOUT", None))
+
+    return _to_catalog(entry)
+
+
+async def aget_catalog(page_size: int = None) -> dict:
+    """The async version of `get_catalog`, used by the async storefront view."""
+    cache = _get_cache()
+    key   = CATALOG_ENTRY_KEY.format(version=await aget_catalog_version(), page_size=page_size or "all")
+    entry = await cache.aget(key)
+
+    if entry is None:
+        logger.debug(f"Catalog cache miss for key {key}, rendering the catalog")
+        entry = await abuild_catalog_entry(page_size)
+        await cache.aset(key, entry, timeout=getattr(settings, "CATALOG_CACHE_TIMEOUT", None))
+
+    return _to_catalog(entry)
+
+
+def _to_catalog(entry: dict) -> dict:
+    return {
+        "cards_html": mark_safe("".join(entry["cards"])),
+        "total": entry["total"],
+        "next_cursor": entry["next_cursor"],
+    }
@@ -0,0 +1,123 @@
+"""
+The validators used for conditional GETs of the storefront and cart pages.
+
+Each page is given an ETag built from everything its HTML depends on, so that a browser
+revalidating a page it already has gets an empty `304 Not Modified` instead of the full page.
+The ETag is worked out from a handful of small values, before the view runs and without
+touching the catalog or rendering a template:
+
+    - the catalog version, bumped every time a `Product` or a `Discount` changes, stock is
+      reserved or released and when a discount starts or ends (see `store.catalog_cache`);
+    - the cart, either its item count (the storefront) or the hash of its content stored with
+      the cart, the live stock of its products and the discount taken off its total (the cart
+      page, see `CartRequestSession.content_hash`, `CartRequestSession.get_stock_levels` and
+      `CartRequestSession.get_discount_percentage`);
+    - the CSRF secret of the visitor, since both pages embed a CSRF token;
+    - the hash of the static files manifest and `PAGE_ETAG_VERSION`, which change on a deploy.
+
+The views are wrapped with `django.views.decorators.http.condition`, which compares the ETag
+with the `If-None-Match` header of the request. The async views are wrapped with `acondition`
+instead, since their ETag is worked out with the async session and cache methods.
+"""
+import hashlib
+
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, quote_etag
+
+from product.views_helper import CartRequestSession
+from store.catalog_cache import aget_catalog_version, get_catalog_version
+from utils.context_processors import aget_cart_total, get_cart_total
+from utils.sessions import GUEST_SESSION_KEY
+
+
+def make_etag(*parts) -> str:
+    """Returns a short digest of the given values, to be used as an ETag."""
+    content = "|".join(str(part) for part in parts)
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _get_csrf_secret(request) -> str:
+    """
+    Returns the CSRF secret of the visitor, creating one (and its cookie) if they don't have one yet.
+
+    The token rendered in a page is masked differently on every request, but every masking
+    of the same secret is equally valid, so the page only changes when the secret does.
+    """
+    get_token(request)
+    return request.META.get("CSRF_COOKIE", "")
+
+
+def _get_deploy_version() -> str:
+    return f"{getattr(staticfiles_storage, 'manifest_hash', '')}:{getattr(settings, 'PAGE_ETAG_VERSION', 1)}"
+
+
+def get_home_etag(request) -> str:
+    """Returns the ETag of the storefront page, see `store.views.home`."""
+    page_size  = settings.STORE_PAGE_SIZE if settings.STORE_INFINITE_SCROLL else None
+    csrf_token = request.session.get(GUEST_SESSION_KEY, {}).get("CSRF_TOKEN") or _get_csrf_secret(request)
+
+    return make_etag("home", get_catalog_version(), page_size, get_cart_total(request), csrf_token, _get_deploy_version())
+
+
+def get_cart_etag(request) -> str:
+    """Returns the ETag of the cart page, see `cart.views.cart`."""
+    cart  = CartRequestSession(request)
+
+    stock = sorted(cart.get_stock_levels().items())
+
+    return make_etag("cart", get_catalog_version(), cart.content_hash, stock, cart.get_discount_percentage(),
+                     _get_csrf_secret(request), _get_deploy_version())
+
+
+async def aget_home_etag(request) -> str:
+    """The async version of `get_home_etag`."""
+    page_size  = settings.STORE_PAGE_SIZE if settings.STORE_INFINITE_SCROLL else None
+    csrf_token = (await request.session.aget(GUEST_SESSION_KEY, {})).get("CSRF_TOKEN") or _get_csrf_secret(request)
+
+    return make_etag("home", await aget_catalog_version(), page_size, await aget_cart_total(request), csrf_token, _get_deploy_version())
+
+
+async def aget_cart_etag(request) -> str:
+    """The async version of `get_cart_etag`."""
+    cart  = await CartRequestSession.acreate(request)
+    stock = sorted((await cart.aget_stock_levels()).items())
+
+    return make_etag("cart", await aget_catalog_version(), cart.content_hash, stock, await cart.aget_discount_percentage(),
+                     _get_csrf_secret(request), _get_deploy_version())
+
+
+def acondition(etag_func):
+    """
+    The async counterpart of `condition(etag_func=...)` for an async view whose ETag function
+    is a coroutine. A GET or HEAD whose `If-None-Match` matches the ETag is answered with a 304
+    without calling the view.
+
+    Example Usage:
+
+        @acondition(etag_func=aget_home_etag)
+        async def home(request):
+            ...
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = None
+
+            if request.method in ("GET", "HEAD"):
+                etag     = quote_etag(await etag_func(request, *args, **kwargs))
+                response = get_conditional_response(request, etag=etag)
+
+                if response is not None:
+                    return response
+
+            response = await view(request, *args, **kwargs)
+
+            if etag and response.status_code == 200 and not response.has_header("ETag"):
+                response.headers["ETag"] = etag
+            return response
+        return inner
+    return decorator
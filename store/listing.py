@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination over the product catalog.
+
+Rather than an `OFFSET`, which makes the database walk and throw away every row before the
+requested page, each page continues from the sort key of the last product on the previous
+page. The supported orders each have an index on `(column, id)` on `Product.Meta`, so every
+page is a single index range scan no matter how deep into the catalog it is.
+
+The cursor handed to the client is the signed sort key of the last product of a page, which
+makes it opaque and tamper-proof.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.db.models.functions import Substr
+
+from product.models import Product
+
+
+CURSOR_SALT       = "store.listing.cursor"
+DEFAULT_ORDER     = "name"
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE     = 100
+
+# The sort column of each order, ties are broken by the product id
+ORDERS = {
+    "name": "name",
+    "price": "effective_price",
+}
+
+# Only the columns needed to render a `store-card` are fetched
+LISTING_FIELDS = ("id", "name", "effective_price", "quantity", "image", "image_variants")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor can't be decoded or doesn't belong to the requested order."""
+    pass
+
+
+def encode_cursor(order: str, value, product_id: int) -> str:
+    """Returns the signed cursor pointing after the product with the given sort value and id."""
+    return signing.dumps([order, str(value), product_id], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(order: str, cursor: str) -> tuple:
+    """
+    Decodes a cursor created by `encode_cursor`.
+
+    Raises:
+        InvalidCursorError: If the cursor has been tampered with or belongs to another order.
+
+    Returns:
+        tuple: The sort value and the id of the last product of the previous page.
+    """
+    try:
+        cursor_order, value, product_id = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise InvalidCursorError("The cursor is invalid")
+
+    if cursor_order != order:
+        raise InvalidCursorError(f"The cursor doesn't belong to the '{order}' order")
+
+    return value, product_id
+
+
+def get_ordered_products(order: str = DEFAULT_ORDER):
+    """
+    Returns the products in the given order, ties are broken by the product id.
+
+    Raises:
+        ValueError: If the order is not one of the supported orders.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Invalid order: {order}. Expected one of {', '.join(ORDERS)}")
+
+    return Product.objects.order_by(ORDERS[order], "id")
+
+
+def get_product_page(order: str = DEFAULT_ORDER, cursor: str = None, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Returns a single page of products.
+
+    Args:
+        order (str): The order of the products, one of "name" or "price".
+        cursor (str, optional): The cursor returned with the previous page, or None for the first page.
+        page_size (int): The number of products per page, capped at `MAX_PAGE_SIZE`.
+
+    Raises:
+        ValueError: If the order is invalid.
+        InvalidCursorError: If the cursor is invalid.
+
+    Returns:
+        dict: A dictionary containing:
+            - 'products' (list): The products of the page as dictionaries.
+            - 'next_cursor' (str | None): The cursor of the next page or None if this is the last page.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    column    = ORDERS.get(order)
+    products  = get_ordered_products(order)
+
+    if cursor:
+        value, product_id = decode_cursor(order, cursor)
+        products          = products.filter(Q(**{f"{column}__gt": value}) | Q(**{column: value, "id__gt": product_id}))
+
+    # One extra row is fetched to know whether there is a next page without a separate count query
+    rows = list(products.values(*LISTING_FIELDS)
+                        .annotate(short_description=Substr("description", 1, 95))[:page_size + 1])
+
+    has_next = len(rows) > page_size
+    rows     = rows[:page_size]
+
+    return {
+        "products": [_to_json(row) for row in rows],
+        "next_cursor": encode_cursor(order, rows[-1][column], rows[-1]["id"]) if has_next else None,
+    }
+
+
+def _to_json(row: dict) -> dict:
+    """Converts a listing row into the JSON sent to the client."""
+    return {
+        "id": row["id"],
+        "name": row["name"],
+        "short_description": f"{row['short_description']}..",
+        "price": str(row["effective_price"]),
+        "quantity": row["quantity"],
+        "image": Product.get_image_url(row["image"], row["image_variants"]),
+        "srcset": Product.get_image_srcset(row["image_variants"]),
+    }
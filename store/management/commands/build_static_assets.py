@@ -0,0 +1,42 @@
+from os.path import getsize
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from utils.staticfiles import get_module_dependencies
+
+
+# The ES modules loaded by the templates, each with the modules it imports
+ENTRY_MODULES = ("js/store.js", "js/cart.js", "js/script.js")
+
+
+class Command(BaseCommand):
+    help = ("Builds the static assets for production: copies them to STATIC_ROOT with content hashed filenames, "
+            "rewrites the module imports, writes the manifest used by {% static %} and precompresses them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Delete the previously built assets first.")
+
+    def handle(self, *args, **options):
+        call_command("collectstatic", interactive=False, clear=options["clear"], verbosity=options["verbosity"])
+
+        # The manifest has just been written, reload it to resolve the hashed names below
+        staticfiles_storage.hashed_files, staticfiles_storage.manifest_hash = staticfiles_storage.load_manifest()
+
+        for entry in ENTRY_MODULES:
+            names   = [staticfiles_storage.stored_name(module) for module in (entry, *get_module_dependencies(entry))]
+            sizes   = {extension: sum(self._get_size(name, extension) for name in names) for extension in ("", ".gz", ".br")}
+            summary = f"{sizes[''] / 1024:.1f} KB, {sizes['.gz'] / 1024:.1f} KB gzip"
+
+            if staticfiles_storage.exists(names[0] + ".br"):
+                summary += f", {sizes['.br'] / 1024:.1f} KB brotli"
+
+            self.stdout.write(f"[+] {entry} -> {names[0]}: {len(names)} modules, {summary}")
+
+    @staticmethod
+    def _get_size(name: str, extension: str) -> int:
+        """Returns the size of the compressed copy of a built file, or of the file itself if it wasn't worth compressing."""
+        if staticfiles_storage.exists(name + extension):
+            return getsize(staticfiles_storage.path(name + extension))
+        return getsize(staticfiles_storage.path(name))
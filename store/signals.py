@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from product.models import Discount, Product
+from product.signals import product_stock_changed, products_bulk_updated
+from store.catalog_cache import invalidate_catalog
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+@receiver(products_bulk_updated)
+@receiver(product_stock_changed)
+def invalidate_catalog_on_change(sender, **kwargs):
+    """
+    Invalidates the cached storefront catalog whenever a product or a discount changes, or the
+    stock of a product is reserved or released, as every product card shows its stock level.
+    """
+    invalidate_catalog()
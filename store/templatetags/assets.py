@@ -0,0 +1,23 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from utils.staticfiles import get_module_dependencies
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def module_script(entry: str):
+    """
+    Renders the `<script type="module">` of an ES module, preceded by a `<link rel="modulepreload">`
+    for every module it imports so that the browser downloads the whole module graph in parallel.
+
+    Example Usage:
+
+        {% load assets %}
+        {% module_script 'js/store.js' %}
+    """
+    preloads = format_html_join("\n", '<link rel="modulepreload" href="{}">', ((static(name),) for name in get_module_dependencies(entry)))
+    return format_html('{}\n<script src="{}" type="module" defer></script>', preloads, static(entry))
@@ -1,3 +1,422 @@
-from django.test import TestCase
+import gzip
+import json
+
+from datetime import timedelta
+from os.path import exists
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.template import Context, RequestContext, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+
+from product.models import Discount, Product
+from store import async_views
+from store.catalog_cache import DiscountEpoch
+from store.listing import MAX_PAGE_SIZE, encode_cursor, get_product_page
+from utils.context_processors import update_cart_qty
+from utils.metrics import get_metrics, reset_metrics
+from utils.staticfiles import brotli, get_module_dependencies
+from utils.sessions.db import SessionStore as WriteAvoidingSessionStore
+
+
+class CartTotalContextProcessorTest(TestCase):
+
+    def setUp(self):
+        self.request         = RequestFactory().get("/")
+        self.request.session = SessionStore()
+
+    def _render(self, template):
+        context = RequestContext(self.request, processors=[update_cart_qty])
+        return Template(template).render(context)
+
+    def test_session_is_not_loaded_when_cart_total_is_not_read(self):
+        self._render("<h1>{{ title }}</h1>")
+        self.assertFalse(self.request.session.accessed)
+
+    def test_session_is_loaded_when_cart_total_is_read(self):
+        self.assertEqual(self._render("{{ cart_total }}"), "0")
+        self.assertTrue(self.request.session.accessed)
+
+    def test_cart_total_is_read_from_the_signed_cookie(self):
+        response = HttpResponse()
+        response.set_signed_cookie(settings.CART_COUNT_COOKIE_NAME, "3", salt=settings.CART_COUNT_COOKIE_SALT)
+        self.request.COOKIES[settings.CART_COUNT_COOKIE_NAME] = response.cookies[settings.CART_COUNT_COOKIE_NAME].value
+
+        self.assertEqual(self._render("{{ cart_total }}"), "3")
+        self.assertFalse(self.request.session.accessed)
+
+    def test_tampered_cookie_falls_back_to_the_session(self):
+        self.request.COOKIES[settings.CART_COUNT_COOKIE_NAME] = "99"
+
+        self.assertEqual(self._render("{{ cart_total }}"), "0")
+        self.assertTrue(self.request.session.accessed)
+
+    def test_admin_renders_never_load_the_cart_session(self):
+        with mock.patch("utils.context_processors.CartRequestSession") as cart_request_session:
+            response = self.client.get(reverse("admin:login"))
+
+        self.assertEqual(response.status_code, 200)
+        cart_request_session.assert_not_called()
+
+
+class DiscountEpochTest(TestCase):
+
+    def setUp(self):
+        self.start = now() + timedelta(hours=1)
+        self.end   = self.start + timedelta(hours=1)
+        Discount.objects.create(name="save25%", discount=25, code="SAVE25", start_date=self.start, end_date=self.end)
+
+    @override_settings(DISCOUNT_TRANSITION_GRACE=60, DISCOUNT_TRANSITION_STEP=5)
+    def test_epoch_moves_on_at_every_discount_boundary(self):
+        epoch  = DiscountEpoch()
+        epochs = [epoch.get(at=self.start - timedelta(seconds=1)),
+                  epoch.get(at=self.start + timedelta(seconds=1)),
+                  epoch.get(at=self.start + timedelta(seconds=6)),
+                  epoch.get(at=self.start + timedelta(minutes=5)),
+                  epoch.get(at=self.start + timedelta(minutes=30)),
+                  epoch.get(at=self.end + timedelta(minutes=5)),
+                  ]
+
+        # Refreshed during the grace period after the start, then stable until the end
+        self.assertEqual(len(set(epochs)), 5)
+        self.assertEqual(epochs[3], epochs[4])
+
+        with self.assertNumQueries(0):
+            epoch.get(at=self.end + timedelta(minutes=6))
+
+
+class SessionWriteAvoidanceTest(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Trainers",
+                                              description="Running trainers",
+                                              price=40,
+                                              quantity=5,
+                                              image="product/p1.jpg",
+                                              )
+        reset_metrics()
+
+    def test_unchanged_session_is_not_written(self):
+        session = WriteAvoidingSessionStore()
+        session["guest_user"] = {"CSRF_TOKEN": "token"}
+        session.save()
+
+        session = WriteAvoidingSessionStore(session.session_key)
+        session["guest_user"] = {"CSRF_TOKEN": "token"}
+        session.save()
+
+        self.assertEqual(get_metrics(), {"session.writes": 1, "session.writes_avoided": 1})
+
+    def test_read_only_requests_of_a_returning_guest_do_not_save_the_session(self):
+        self.client.get(reverse("storefront"))
+        self.client.post(reverse("add_to_basket"),
+                         {"productID": self.product.id},
+                         content_type="application/json",
+                         HTTP_X_CSRFTOKEN=self.client.cookies["csrftoken"].value,
+                         )
+        self.assertIn("session.writes", get_metrics())
+
+        # The first look at the cart stores its pricing next to it, see `CartRequestSession.get_pricing`
+        self.client.get(reverse("cart"))
+        reset_metrics()
+
+        for url in (reverse("storefront"), reverse("cart"), reverse("cart_pricing")):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertNotIn("session.writes", get_metrics())
+
+
+class AddToBasketMethodTest(TestCase):
+
+    def _assert_method_not_allowed(self, response):
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(json.loads(response.content)["NUM_OF_ITEMS_IN_CART"], 0)
+
+    def test_only_posts_are_allowed(self):
+        self._assert_method_not_allowed(self.client.get(reverse("add_to_basket")))
+
+    def test_only_posts_are_allowed_by_the_async_view(self):
+        request         = RequestFactory().get(reverse("add_to_basket"))
+        request.session = WriteAvoidingSessionStore()
+
+        self._assert_method_not_allowed(async_to_sync(async_views.add_to_basket)(request))
+
+
+class UpdateBasketTest(TestCase):
+
+    def setUp(self):
+        self.trainers = Product.objects.create(name="Trainers", description="Running trainers", price=40, quantity=5, image="product/p1.jpg")
+        self.socks    = Product.objects.create(name="Socks", description="Running socks", price=5, quantity=5, image="product/p2.jpg")
+
+        self.client.get(reverse("storefront"))
+        self.token = self.client.cookies["csrftoken"].value
+        self._update([{"op": "add", "productID": self.trainers.id, "qty": 1}])
+
+    def _update(self, operations):
+        return self.client.post(reverse("update_basket"),
+                                json.dumps({"operations": operations}),
+                                content_type="application/json",
+                                HTTP_X_CSRFTOKEN=self.token,
+                                )
+
+    def _get_cart(self, response):
+        return {item["id"]: item["qty"] for item in response.json()["ITEMS"]}
+
+    def test_valid_operations_are_applied_together(self):
+        response = self._update([{"op": "add", "productID": self.trainers.id, "qty": 2},
+                                 {"op": "set_qty", "productID": self.socks.id, "qty": 3},
+                                 ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_cart(response), {self.trainers.id: 3, self.socks.id: 3})
+        self.assertEqual(response.json()["ITEMS"][1]["name"], "Socks")
+        self.assertEqual(response.json()["TOTAL_QTY"], 6)
+
+    def test_one_invalid_operation_leaves_the_cart_unchanged(self):
+        invalid_operations = [{"op": "add", "productID": 999999},
+                              {"op": "set_qty", "productID": self.socks.id, "qty": -1},
+                              {"op": "restock", "productID": self.socks.id},
+                              ]
+
+        for invalid_operation in invalid_operations:
+            with self.subTest(invalid_operation=invalid_operation):
+                response = self._update([{"op": "add", "productID": self.trainers.id, "qty": 2},
+                                         {"op": "set_qty", "productID": self.socks.id, "qty": 3},
+                                         invalid_operation,
+                                         ])
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self._get_cart(response), {self.trainers.id: 1})
+                self.assertEqual(self.client.get(reverse("cart_pricing")).json()["NUM_OF_ITEMS_IN_CART"], 1)
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Trainers", description="Running trainers", price=40, quantity=5, image="product/p1.jpg")
+
+    def _revalidate(self, url):
+        etag = self.client.get(url)["ETag"]
+        return etag, self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_answered_with_a_304(self):
+        for url in (reverse("storefront"), reverse("cart")):
+            with self.subTest(url=url):
+                etag, response = self._revalidate(url)
+
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertEqual(response.content, b"")
+
+    def test_catalog_changes_give_the_storefront_a_new_etag(self):
+        etag, _ = self._revalidate(reverse("storefront"))
+
+        self.product.price = 35
+        self.product.save()
+
+        response = self.client.get(reverse("storefront"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_cart_changes_give_the_cart_page_a_new_etag(self):
+        etag, _ = self._revalidate(reverse("cart"))
+
+        self.client.post(reverse("add_to_basket"),
+                         {"productID": self.product.id},
+                         content_type="application/json",
+                         HTTP_X_CSRFTOKEN=self.client.cookies["csrftoken"].value,
+                         )
+        response = self.client.get(reverse("cart"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_async_storefront_is_answered_with_a_304(self):
+        # Without the CSRF middleware the secret it would read from the cookie is passed in directly
+        request         = RequestFactory().get(reverse("storefront"))
+        request.session = WriteAvoidingSessionStore()
+        etag            = async_to_sync(async_views.home)(request)["ETag"]
+
+        request         = RequestFactory().get(reverse("storefront"), HTTP_IF_NONE_MATCH=etag, CSRF_COOKIE=request.META["CSRF_COOKIE"])
+        request.session = WriteAvoidingSessionStore()
+
+        self.assertEqual(async_to_sync(async_views.home)(request).status_code, 304)
+
+    def test_reserved_stock_gives_the_storefront_a_new_etag_and_stock_level(self):
+        etag, _ = self._revalidate(reverse("storefront"))
+        self.assertContains(self.client.get(reverse("storefront")), 'data-stock="5"')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("add_to_basket"),
+                             {"productID": self.product.id},
+                             content_type="application/json",
+                             HTTP_X_CSRFTOKEN=self.client.cookies["csrftoken"].value,
+                             )
+        response = self.client.get(reverse("storefront"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data-stock="4"')
+        self.assertContains(self.client_class().get(reverse("storefront")), 'data-stock="4"')
+
+
+class ProductListTest(TestCase):
+
+    def setUp(self):
+        # Pairs of products share a name and a price, so every page boundary has to break a tie
+        for index, (name, price) in enumerate([("Socks", 5), ("Socks", 5), ("Trainers", 40), ("Trainers", 40),
+                                                ("Boots", 60), ("Boots", 60), ("Laces", 2)]):
+            Product.objects.create(name=name, description="", price=price, quantity=index, image="product/p1.jpg")
+
+    def _get_page(self, **params):
+        return self.client.get(reverse("product_list"), params)
+
+    def _walk(self, order, limit):
+        ids, cursor, num_of_pages = [], None, 0
+
+        while True:
+            params   = {"order": order, "limit": limit, **({"cursor": cursor} if cursor else {})}
+            response = self._get_page(**params).json()
+            ids.extend(product["id"] for product in response["PRODUCTS"])
+            cursor        = response["NEXT_CURSOR"]
+            num_of_pages += 1
+
+            if cursor is None:
+                return ids, num_of_pages
+
+    def test_pages_follow_on_across_tied_sort_keys(self):
+        for order, column in (("name", "name"), ("price", "effective_price")):
+            for limit in (1, 2, 3):
+                with self.subTest(order=order, limit=limit):
+                    ids, num_of_pages = self._walk(order, limit)
+
+                    self.assertEqual(ids, list(Product.objects.order_by(column, "id").values_list("id", flat=True)))
+                    self.assertEqual(num_of_pages, -(-7 // limit))
+
+    def test_last_page_has_no_next_cursor(self):
+        self.assertIsNone(self._get_page(limit=7).json()["NEXT_CURSOR"])
+        self.assertIsNotNone(self._get_page(limit=6).json()["NEXT_CURSOR"])
+
+    def test_tampered_cursors_and_cursors_of_another_order_are_refused(self):
+        cursor   = self._get_page(order="name", limit=2).json()["NEXT_CURSOR"]
+        tampered = encode_cursor("name", "Socks", 1)[:-1] + "x"
+
+        for order, cursor in (("name", tampered), ("price", cursor), ("name", "not-a-cursor")):
+            with self.subTest(order=order, cursor=cursor):
+                response = self._get_page(order=order, cursor=cursor)
+
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("ERROR", response.json())
+
+    def test_limit_is_clamped(self):
+        Product.objects.bulk_create([Product(name=f"Product {index}", description="", price=1, effective_price=1,
+                                             quantity=1, image="product/p1.jpg") for index in range(MAX_PAGE_SIZE)])
+
+        self.assertEqual(len(self._get_page(limit=MAX_PAGE_SIZE + 50).json()["PRODUCTS"]), MAX_PAGE_SIZE)
+        self.assertEqual(len(self._get_page(limit=0).json()["PRODUCTS"]), 1)
+        self.assertEqual(len(get_product_page(page_size=-5)["products"]), 1)
+        self.assertEqual(self._get_page(limit="many").status_code, 400)
+
+
+@override_settings(CART_SERVER_SIDE_LOOKUP=True)
+class AddToBasketLookupTest(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(name="Trainers", description="Running trainers", price=40, quantity=5, image="product/p1.jpg")
+
+        self.client.get(reverse("storefront"))
+        self.token = self.client.cookies["csrftoken"].value
+
+    def _add(self, product_data):
+        return self.client.post(reverse("add_to_basket"), product_data, content_type="application/json", HTTP_X_CSRFTOKEN=self.token)
+
+    def _get_items(self):
+        return self.client.post(reverse("update_basket"),
+                                {"operations": []},
+                                content_type="application/json",
+                                HTTP_X_CSRFTOKEN=self.token,
+                                ).json()["ITEMS"]
+
+    def test_client_product_data_is_ignored(self):
+        response = self._add({"productID": self.product.id, "price": "0.01", "product_name": "Free trainers", "qty": 50})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_items(), [{"id": self.product.id,
+                                              "name": "Trainers",
+                                              "description": "Running trainers",
+                                              "price": "40.00",
+                                              "current_stock": 5,  # The unit held for the visitor included
+                                              "qty": 1,
+                                              }])
+        self.assertEqual(self.client.get(reverse("cart_pricing")).json()["PRICING"]["subtotal"], "40.00")
+
+    def test_unknown_or_deleted_products_are_not_added(self):
+        deleted_id = self.product.id
+        self.product.delete()
+
+        for product_id in (deleted_id, 999999, "not-an-id", None):
+            with self.subTest(product_id=product_id):
+                response = self._add({"productID": product_id, "price": "0.01"})
+
+                self.assertNotEqual(response.status_code, 200)
+                self.assertFalse(response.json()["isSuccess"])
+                self.assertEqual(response.json()["NUM_OF_ITEMS_IN_CART"], 0)
+
+        self.assertEqual(self._get_items(), [])
+
+
+class StaticAssetsTest(TestCase):
+
+    ENTRY = "js/store.js"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.enterClassContext(TemporaryDirectory())))
+
+        get_module_dependencies.cache_clear()
+        cls.addClassCleanup(get_module_dependencies.cache_clear)
+
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def _read(self, name):
+        with staticfiles_storage.open(staticfiles_storage.stored_name(name)) as file:
+            return file.read().decode("utf-8")
+
+    def test_module_imports_point_at_the_hashed_modules(self):
+        source = self._read(self.ENTRY)
+
+        for dependency in ("js/fetch.js", "js/utils.js", "js/messages.js"):
+            name        = dependency.rsplit("/", 1)[1]
+            hashed_name = staticfiles_storage.stored_name(dependency).rsplit("/", 1)[1]
+
+            self.assertNotEqual(hashed_name, name)
+            self.assertIn(f'"./{hashed_name}"', source)
+            self.assertNotIn(f'"./{name}"', source)
+
+    def test_compressible_assets_are_precompressed(self):
+        hashed_path = staticfiles_storage.path(staticfiles_storage.stored_name(self.ENTRY))
+
+        with open(hashed_path, "rb") as file, gzip.open(f"{hashed_path}.gz") as compressed:
+            self.assertEqual(compressed.read(), file.read())
+
+        self.assertEqual(exists(f"{hashed_path}.br"), brotli is not None)
+
+    def test_module_script_preloads_the_hashed_imports(self):
+        html = Template("{% load assets %}{% module_script 'js/store.js' %}").render(Context())
+
+        self.assertIn(f'<script src="{staticfiles_storage.url(self.ENTRY)}" type="module" defer></script>', html)
+        self.assertIn(staticfiles_storage.stored_name(self.ENTRY), html)
+
+        for dependency in get_module_dependencies(self.ENTRY):
+            self.assertIn(f'<link rel="modulepreload" href="{settings.STATIC_URL}{staticfiles_storage.stored_name(dependency)}">', html)
 
-# Create your tests here.
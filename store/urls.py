@@ -1,10 +1,17 @@
-
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
 
+# The async versions of the views are routed when `ASYNC_VIEWS` is on
+page_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path("",  view=views.home, name="storefront"),
-    path("store/basket/add/", view=views.add_to_basket,  name="add_to_basket"),
+    path("",  view=page_views.home, name="storefront"),
+    path("store/basket/add/",   view=page_views.add_to_basket,  name="add_to_basket"),
+    path("store/basket/batch/", view=views.update_basket,  name="update_basket"),
+    path("store/products/",     view=views.product_list,   name="product_list"),
+    path("store/search/",       view=views.product_search, name="product_search"),
 ]
 
+
@@ -1,48 +1,106 @@
 import json
 
+from django.conf import settings
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
-from product.models import Product
+from utils.sessions import GUEST_SESSION_KEY, ensure_guest_session
 from utils.validator import validate_csrf_token
 
+from product.models import ProductDTO
+from product.search import search_products
 from product.views_helper import CartRequestSession
+from store.catalog_cache import get_catalog
+from store.etags import get_home_etag
+from store.listing import DEFAULT_ORDER, InvalidCursorError, get_product_page
 # Create your views here.
 
+# The page is revalidated on every visit, a visitor whose page is still current is sent a 304 
+# before the catalog is fetched or anything is rendered (see `store.etags`)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=get_home_etag)
 def home(request):
     
-    request.session["guest_user"] = {}
-    
-    if not request.session.session_key:
-        request.session.save()
-
-    csrf_token = get_token(request)
-    cart       = CartRequestSession(request)
-        
-    # Store the CSRF token inside the guest session because, as a guest, there is no authentication. 
-    # Without this, each call to `get_token(request)` generates a new CSRF token, instead of reusing 
-    # the one sent to the frontend from the backend, this means that CSRF_TOKEN will never match.
-    request.session["guest_user"]["CSRF_TOKEN"] = csrf_token
-    
-    products = Product.objects.all()
+    # The page only reads from the session, the guest session is created lazily on the first 
+    # cart action (see `add_to_basket`), so browsing the storefront never causes a session write. 
+    # A returning guest is given back the CSRF token stored in their session, everyone else is 
+    # given a token for the CSRF cookie.
+    csrf_token = request.session.get(GUEST_SESSION_KEY, {}).get("CSRF_TOKEN") or get_token(request)
+    page_size  = settings.STORE_PAGE_SIZE if settings.STORE_INFINITE_SCROLL else None
+    catalog    = get_catalog(page_size)
     
+    # `cart_total` is provided lazily by the `update_cart_qty` context processor
     context = {
-        "products": products.all(),
-        "total": products.count(),
+        "cards_html": catalog["cards_html"],
+        "total": catalog["total"],
+        "next_cursor": catalog["next_cursor"],
         "csrf_token": csrf_token,
-        'cart_total': cart.number_of_items_in_cart_session,
     }
     return render(request, "store.html", context=context)
 
 
+def product_list(request):
+    """
+    Returns a page of products as JSON, using keyset pagination.
+
+    Query parameters:
+        order (str): Either "name" (default) or "price".
+        cursor (str): The `next_cursor` returned with the previous page, omitted for the first page.
+        limit (int): The number of products per page.
+    """
+    if request.method != "GET":
+        return JsonResponse({"ERROR": "Only a GET request is allowed"}, status=405)
+    
+    order  = request.GET.get("order", DEFAULT_ORDER)
+    cursor = request.GET.get("cursor") or None
+    
+    try:
+        limit = int(request.GET.get("limit", settings.STORE_PAGE_SIZE))
+        page  = get_product_page(order=order, cursor=cursor, page_size=limit)
+        
+    except InvalidCursorError as error:
+        return JsonResponse({"ERROR": str(error)}, status=400)
+    
+    except ValueError as error:
+        return JsonResponse({"ERROR": str(error)}, status=400)
+    
+    return JsonResponse({"PRODUCTS": page["products"], "NEXT_CURSOR": page["next_cursor"]})
+
+
+def product_search(request):
+    """
+    Returns the products matching a search query as JSON, best first (see `product.search`).
+
+    Query parameters:
+        q (str): The words to search for, each matched as a prefix e.g. "red run".
+        limit (int): The most products to return, defaults to 20.
+    """
+    if request.method != "GET":
+        return JsonResponse({"ERROR": "Only a GET request is allowed"}, status=405)
+    
+    query = request.GET.get("q", "")
+    
+    try:
+        limit    = int(request.GET.get("limit", 20))
+        products = search_products(query, limit=limit)
+        
+    except ValueError as error:
+        return JsonResponse({"ERROR": str(error)}, status=400)
+    
+    return JsonResponse({"PRODUCTS": products, "QUERY": query})
+
+
 def add_to_basket(request):
     
+    cart = CartRequestSession(request)
+    
     if request.method != "POST":
-        return _create_json(error='Only a POST response is allowed', status_code=405)
+        return _create_json(cart=cart, error='Only a POST response is allowed', status_code=405)
 
     response  = validate_csrf_token(request)
-    cart      = CartRequestSession(request)
    
     if response.get("error"):
         
@@ -55,6 +113,8 @@ def add_to_basket(request):
                             is_success=response.get("is_valid", False),
                             )
           
+    ensure_guest_session(request, response["token"])
+    
     product_data = json.loads(request.body.decode("utf-8"))
 
     if not product_data:
@@ -63,16 +123,72 @@ def add_to_basket(request):
         return _create_json(error=error, cart=cart, status_code=405)
        
     try:
-        cart.add_to_session(product_data)
+        
+        # When the server side lookup is enabled only the `productID` sent by the client is used, 
+        # the rest of the product data is resolved on the server rather than trusting the client.
+        if settings.CART_SERVER_SIDE_LOOKUP:
+            cart.add_product_by_id(product_data.get("productID"))
+        else:
+            cart.add_to_session(product_data)
         
     except KeyError as error:
-        return _create_json(cart=cart, error=error, status_code=405)
+        return _create_json(cart=cart, error=str(error), status_code=405)
      
     except ValueError as error:
-        return _create_json(cart=cart, error=error, status_code=405)
+        return _create_json(cart=cart, error=str(error), status_code=405)
     return _create_json(cart=cart, message='Added product to cart request session', is_success=True, status_code=200)
   
         
+def update_basket(request):
+    """
+    Applies a batch of cart operations (add, set_qty, remove) atomically with a single session write.
+
+    Expects a JSON body in the form of `{"operations": [{"op": "add", "productID": 1, "qty": 2}, ...]}`
+    and returns the full resulting cart along with its pricing (see `CartRequestSession.get_pricing`).
+    """
+    if request.method != "POST":
+        return JsonResponse({"ERROR": "Only a POST request is allowed"}, status=405)
+    
+    response = validate_csrf_token(request)
+    
+    if response.get("error"):
+        FORBIDDEN_CODE = 403
+        return JsonResponse({"ERROR": response["error"], "isSuccess": False}, status=FORBIDDEN_CODE)
+    
+    ensure_guest_session(request, response["token"])
+    
+    cart = CartRequestSession(request)
+    
+    try:
+        operations = json.loads(request.body.decode("utf-8")).get("operations")
+        cart.apply_operations(operations)
+        
+    except (AttributeError, json.JSONDecodeError):
+        return _create_cart_summary_json(cart, error="Expected a JSON object with a list of operations", status_code=400)
+    
+    except KeyError as error:
+        return _create_cart_summary_json(cart, error=str(error), status_code=400)
+    
+    except ValueError as error:
+        return _create_cart_summary_json(cart, error=str(error), status_code=400)
+    
+    return _create_cart_summary_json(cart, is_success=True, message="Updated the cart")
+
+
+def _create_cart_summary_json(cart, status_code=200, error='', is_success=False, message=''):
+    items = ProductDTO.bulk_to_json(cart.get_products_from_request(to_class_object=True))
+    return JsonResponse({'ERROR': error,
+                         'isSuccess': is_success,
+                         'MESSAGE': message,
+                         'ITEMS': items,
+                         'NUM_OF_ITEMS_IN_CART': cart.number_of_items_in_cart_session,
+                         'TOTAL_QTY': sum(item["qty"] for item in items),
+                         'PRICING': cart.get_pricing().to_json(),
+                         },
+                         status=status_code,
+                         )
+
+
 def _create_json(status_code, error='', is_success=False, message='', cart=None):
     return JsonResponse({'ERROR': error, 
                          'isSuccess': is_success, 
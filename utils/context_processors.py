@@ -1,9 +1,53 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
 from product.views_helper import CartRequestSession
 
 
+def get_cart_count_from_cookie(request):
+    """
+    Returns the number of items in the cart cached in the signed cart count cookie,
+    or None if the cookie is missing or has been tampered with.
+    """
+    count = request.get_signed_cookie(settings.CART_COUNT_COOKIE_NAME, default=None, salt=settings.CART_COUNT_COOKIE_SALT)
+
+    try:
+        return int(count) if count is not None else None
+    except ValueError:
+        return None
+
+
+def get_cart_total(request):
+    """Returns the number of items in the cart, only loading the session if the cookie can't be used."""
+    count = get_cart_count_from_cookie(request)
+
+    if count is None:
+        count = CartRequestSession(request).number_of_items_in_cart_session
+    return count
+
+
+async def aget_cart_total(request):
+    """
+    The async version of `get_cart_total`.
+
+    The lazy `cart_total` of `update_cart_qty` can't load the session while an async view renders
+    its template, so the async views look it up with this function and pass it in the context.
+    """
+    count = get_cart_count_from_cookie(request)
+
+    if count is None:
+        count = (await CartRequestSession.acreate(request)).number_of_items_in_cart_session
+    return count
+
+
 def update_cart_qty(request):
-    
-    cart = CartRequestSession(request)
+    """
+    Adds the number of items in the cart to the template context as `cart_total`.
+
+    The value is lazy, so the cart (and therefore the session) is only looked up when a
+    template actually reads `cart_total`. Pages that never display it, such as the admin
+    or the error pages, never pay for it.
+    """
     return {
-        "cart_total": cart.number_of_items_in_cart_session,
-    }
\ No newline at end of file
+        "cart_total": SimpleLazyObject(lambda: get_cart_total(request)),
+    }
@@ -1,4 +1,19 @@
 
 class DiscountExpiredError(Exception):
     """A custom error for an expired discount"""
-    pass
\ No newline at end of file
+    pass
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a product doesn't have enough units left to reserve"""
+    pass
+
+
+class InvalidDiscountCodeError(ValueError):
+    """Raised when a discount code can't be redeemed against a cart"""
+    pass
+
+
+class RateLimitExceededError(Exception):
+    """Raised when a visitor makes more attempts than they are allowed to in a window of time"""
+    pass
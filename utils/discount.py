@@ -1,17 +1,27 @@
-from random import choices
+from random import SystemRandom
+from secrets import token_bytes
 from string import ascii_uppercase, digits
 
 
-def create_discount_code(length: int = 20) -> str:
+# The characters a discount code is made of by default
+DEFAULT_ALPHABET = ascii_uppercase + digits
+GROUP_SIZE       = 5
+
+# `SystemRandom` draws from the operating system's CSPRNG (`os.urandom`) so codes can't be predicted
+_system_random = SystemRandom()
+
+
+def create_discount_code(length: int = 20, alphabet: str = DEFAULT_ALPHABET) -> str:
     """
     Creates and returns a random discount code of a given length.
 
     Args:
         length (int): Determines the length of the discount code to be created.
                       Must be a positive integer.
+        alphabet (str): The characters the code is made of. Defaults to upper case letters and digits.
 
     Raises:
-        ValueError: If `length` is not a positive integer.
+        ValueError: If `length` is not a positive integer or the alphabet is empty.
 
     Returns:
         str: The generated discount code.
@@ -33,8 +43,61 @@ def create_discount_code(length: int = 20) -> str:
     if length <= 0:
         raise ValueError("Length must be a positive integer greater than 0.")
     
-    CHARS      = ascii_uppercase + digits
-    GROUP_SIZE = 5  
+    if not alphabet:
+        raise ValueError("The alphabet must contain at least one character.")
 
-    code = ''.join(choices(CHARS, k=length))
+    code = ''.join(_system_random.choices(alphabet, k=length))
     return '-'.join(code[i:i+GROUP_SIZE] for i in range(0, length, GROUP_SIZE))
+
+
+def create_discount_codes(num_of_codes: int, length: int = 20, alphabet: str = DEFAULT_ALPHABET) -> set:
+    """
+    Creates a given number of distinct random discount codes.
+
+    Codes that are generated twice are discarded and replaced, so the returned set always
+    contains exactly `num_of_codes` codes. The codes are only unique among themselves, see
+    `product.discount_codes` to create codes that are unique in the database.
+
+    Args:
+        num_of_codes (int): The number of codes to create.
+        length (int): The length of each code, excluding the dashes.
+        alphabet (str): The characters the codes are made of.
+
+    Raises:
+        ValueError: If `num_of_codes` is negative, `length` is not a positive integer, the alphabet
+                    is empty or more codes are requested than the alphabet and length can produce.
+
+    Returns:
+        set: The discount codes.
+    """
+    if num_of_codes < 0:
+        raise ValueError("The number of codes can't be negative.")
+
+    if not isinstance(length, int) or length <= 0:
+        raise ValueError("Length must be a positive integer greater than 0.")
+
+    if num_of_codes > len(set(alphabet)) ** length:
+        raise ValueError(f"Only {len(set(alphabet)) ** length} distinct codes of length {length} can be made from this alphabet.")
+
+    alphabet = ''.join(dict.fromkeys(alphabet))
+    codes    = set()
+
+    if not 0 < len(alphabet) <= 256:
+        raise ValueError("The alphabet must contain between 1 and 256 distinct characters.")
+
+    # Rather than one CSPRNG call per character, random bytes are drawn in bulk and mapped onto the
+    # alphabet. Bytes at or above `limit` are rejected so that every character is equally likely.
+    limit = 256 - (256 % len(alphabet))
+
+    while len(codes) < num_of_codes:
+        num_missing = num_of_codes - len(codes)
+        chars       = ''.join(alphabet[byte % len(alphabet)] for byte in token_bytes(num_missing * length * 2) if byte < limit)
+
+        for start in range(0, len(chars) - length + 1, length):
+            code = chars[start:start + length]
+            codes.add('-'.join(code[i:i+GROUP_SIZE] for i in range(0, length, GROUP_SIZE)))
+
+            if len(codes) == num_of_codes:
+                break
+
+    return codes
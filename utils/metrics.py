@@ -0,0 +1,30 @@
+from collections import Counter
+from threading import Lock
+
+
+_counters = Counter()
+_lock     = Lock()
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """
+    Increments an in-process counter.
+
+    Args:
+        name (str): The name of the counter e.g "session.writes_avoided".
+        amount (int): How much to increment the counter by, defaults to 1.
+    """
+    with _lock:
+        _counters[name] += amount
+
+
+def get_metrics() -> dict:
+    """Returns a snapshot of every counter and its current value."""
+    with _lock:
+        return dict(_counters)
+
+
+def reset_metrics() -> None:
+    """Resets every counter back to zero."""
+    with _lock:
+        _counters.clear()
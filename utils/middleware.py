@@ -0,0 +1,51 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+class CartCountCookieMiddleware:
+    """
+    Caches the number of items in the cart in a signed cookie (and an `X-Cart-Total` header).
+
+    Whenever a request changes the cart, `CartRequestSession` records the new count on the
+    request as `cart_total`. This middleware then stores it in a signed cookie which the
+    `update_cart_qty` context processor reads, allowing pages to display the cart count
+    without loading the session.
+
+    The middleware supports both sync and async requests, so that under ASGI the async views
+    are never switched to a thread just to run it.
+    """
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        response = self.get_response(request)
+        self._set_cart_count(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self._set_cart_count(request, response)
+        return response
+
+    @staticmethod
+    def _set_cart_count(request, response) -> None:
+        count = getattr(request, "cart_total", None)
+
+        if count is not None:
+            response.set_signed_cookie(settings.CART_COUNT_COOKIE_NAME,
+                                       str(count),
+                                       salt=settings.CART_COUNT_COOKIE_SALT,
+                                       max_age=settings.SESSION_COOKIE_AGE,
+                                       httponly=True,
+                                       samesite="Lax",
+                                       )
+            response["X-Cart-Total"] = str(count)
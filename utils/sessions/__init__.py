@@ -0,0 +1,117 @@
+"""
+Session engines that only write the session when its data actually changes.
+
+Django saves the session whenever `request.session.modified` is True, which is the case
+every time a value is assigned, even if it is the same value that was already stored.
+The engines in this package (`utils.sessions.db` and `utils.sessions.cached_db`) keep a
+snapshot of the serialized session taken when it was loaded and skip the write when the
+data is unchanged. The number of writes made and avoided are counted in `utils.metrics`
+under `session.writes` and `session.writes_avoided`. The async methods used by the async
+views (`aload`, `asave`, ...) avoid writes in the same way.
+"""
+from datetime import timedelta
+
+from django.utils.timezone import now
+
+from utils.metrics import increment
+
+
+GUEST_SESSION_KEY = "guest_user"
+
+
+class WriteAvoidingSessionMixin:
+    """
+    A mixin for the database backed session stores that skips writes of unchanged sessions.
+
+    An unchanged session is still written once it gets within half of its age of expiring,
+    so that the expiry date stored in the database keeps being extended for active visitors.
+    """
+    _loaded_data = None
+    _expire_date = None
+
+    def _serialize(self, data: dict) -> bytes:
+        return self.serializer().dumps(data)
+
+    def _get_session_from_db(self):
+        session = super()._get_session_from_db()
+
+        if session is not None:
+            self._expire_date = session.expire_date
+        return session
+
+    async def _aget_session_from_db(self):
+        session = await super()._aget_session_from_db()
+
+        if session is not None:
+            self._expire_date = session.expire_date
+        return session
+
+    def load(self):
+        data              = super().load()
+        self._loaded_data = self._serialize(data)
+        return data
+
+    async def aload(self):
+        data              = await super().aload()
+        self._loaded_data = self._serialize(data)
+        return data
+
+    def _is_expiry_fresh(self) -> bool:
+        """Returns True if the stored expiry date doesn't need to be extended yet."""
+        if self._expire_date is None:
+            return True
+        return self._expire_date - now() > timedelta(seconds=self.get_expiry_age() / 2)
+
+    def _is_unchanged(self, data: dict, must_create: bool) -> bool:
+        """Returns True if the session data is the same as when it was loaded."""
+        return not must_create and self._loaded_data is not None and self._serialize(data) == self._loaded_data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            # Creating the session calls `save` again with `must_create=True`, where the write is counted
+            return super().save(must_create=must_create)
+
+        if self._is_unchanged(self._get_session(), must_create) and self._is_expiry_fresh():
+            increment("session.writes_avoided")
+            return
+
+        super().save(must_create=must_create)
+
+        self._loaded_data = self._serialize(self._get_session())
+        increment("session.writes")
+
+    async def asave(self, must_create=False):
+        if self.session_key is None:
+            return await super().asave(must_create=must_create)
+
+        if self._is_unchanged(await self._aget_session(), must_create) and self._is_expiry_fresh():
+            increment("session.writes_avoided")
+            return
+
+        await super().asave(must_create=must_create)
+
+        self._loaded_data = self._serialize(await self._aget_session())
+        increment("session.writes")
+
+
+def ensure_guest_session(request, csrf_token: str) -> None:
+    """
+    Creates the guest session on the first cart action of a visitor.
+
+    As a guest there is no authentication, so the CSRF token used by the visitor is stored
+    inside the guest session and is used to validate their later requests. The storefront
+    no longer creates the guest session on every page view, which means that crawlers and
+    visitors that never add anything to their cart never cause a session write.
+
+    Args:
+        request (HttpRequest): The request of the visitor.
+        csrf_token (str): The CSRF token sent by the visitor.
+    """
+    if not request.session.get(GUEST_SESSION_KEY, {}).get("CSRF_TOKEN"):
+        request.session[GUEST_SESSION_KEY] = {"CSRF_TOKEN": csrf_token}
+
+
+async def aensure_guest_session(request, csrf_token: str) -> None:
+    """The async version of `ensure_guest_session`, used by the async views."""
+    if not (await request.session.aget(GUEST_SESSION_KEY, {})).get("CSRF_TOKEN"):
+        await request.session.aset(GUEST_SESSION_KEY, {"CSRF_TOKEN": csrf_token})
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import cached_db
+
+from utils.sessions import WriteAvoidingSessionMixin
+
+
+class SessionStore(WriteAvoidingSessionMixin, cached_db.SessionStore):
+    """A write-through cached session store that only writes the session when its data changes."""
@@ -0,0 +1,7 @@
+from django.contrib.sessions.backends import db
+
+from utils.sessions import WriteAvoidingSessionMixin
+
+
+class SessionStore(WriteAvoidingSessionMixin, db.SessionStore):
+    """A database backed session store that only writes the session when its data changes."""
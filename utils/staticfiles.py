@@ -0,0 +1,132 @@
+"""
+The static files storage used in production and the JavaScript module graph.
+
+`collectstatic` (or the `build_static_assets` command, which wraps it) copies every static
+file to `STATIC_ROOT` under a name containing a hash of its content e.g. `js/store.3f2a9c1d.js`,
+rewrites the `import` statements of the ES modules and the `url()`s of the CSS to point at the
+hashed names, records the mapping in `staticfiles.json` (the manifest `{% static %}` resolves
+names through) and writes a gzip (and, if the `brotli` package is installed, a brotli) copy of
+every text asset next to it. Since a hashed file never changes, it can be served with a
+far-future `Cache-Control: public, max-age=31536000, immutable`, and the web server can send
+the precompressed copies as they are (e.g. nginx's `gzip_static on;`).
+
+While `DEBUG` is on, or until the assets have been built, the files are served as they are.
+"""
+import gzip
+import re
+
+from functools import lru_cache
+from posixpath import dirname, join, normpath
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# The extensions of the files that are worth compressing and the smallest size worth compressing
+COMPRESSIBLE_EXTENSIONS = (".js", ".css", ".svg", ".json", ".txt", ".html", ".map")
+MIN_COMPRESS_SIZE       = 256
+
+# Matches the specifier of the static `import` and `export ... from` statements of an ES module
+MODULE_IMPORT_PATTERN = re.compile(r"""(?:import|export)\s*(?:[\w*\s{},]*?\s*from\s*)?['"](\.{1,2}/[^'"]+)['"]""")
+
+
+class HashedCompressedStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    A `ManifestStaticFilesStorage` that also rewrites the imports of the ES modules and writes
+    a precompressed copy of every hashed text asset.
+    """
+    support_js_module_import_aggregation = True
+
+    def stored_name(self, name):
+        """
+        Returns the hashed name of a file. Until the assets have been built (there is no manifest
+        yet) the name is returned as it is, a file missing from a built manifest is still an error.
+        """
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = []
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self._compress(hashed_name)
+
+    def _compress(self, name: str) -> None:
+        """Writes the gzip and brotli copies of a file, unless they wouldn't be any smaller."""
+        with self.open(name) as file:
+            content = file.read()
+
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+
+        compressed_copies = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+
+        if brotli is not None:
+            compressed_copies[".br"] = brotli.compress(content, quality=11)
+
+        for extension, compressed in compressed_copies.items():
+            if len(compressed) < len(content):
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(compressed))
+
+
+def _read_static_file(name: str) -> str:
+    """Returns the content of a static file, from the source directories or else from `STATIC_ROOT`."""
+    path = finders.find(name)
+
+    if path:
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+
+    with staticfiles_storage.open(name) as file:
+        return file.read().decode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def get_module_dependencies(entry: str) -> tuple:
+    """
+    Returns every module imported (directly or not) by an ES module, in the order they are
+    first imported, e.g. `("js/fetch.js", "js/utils.js", ...)` for `"js/store.js"`.
+
+    Used to emit a `<link rel="modulepreload">` for each of them, so that the browser fetches
+    the whole graph at once rather than discovering it one level of imports at a time.
+
+    Raises:
+        FileNotFoundError: If the module (or one of its imports) doesn't exist.
+    """
+    dependencies = {}
+    pending      = [entry]
+
+    while pending:
+        name = pending.pop(0)
+
+        try:
+            source = _read_static_file(name)
+        except (OSError, ValueError):
+            raise FileNotFoundError(f"The static module {name} doesn't exist")
+
+        for specifier in MODULE_IMPORT_PATTERN.findall(source):
+            dependency = normpath(join(dirname(name), specifier))
+
+            if dependency != entry and dependency not in dependencies:
+                dependencies[dependency] = True
+                pending.append(dependency)
+
+    return tuple(dependencies)
@@ -1,28 +1,57 @@
-from django.middleware.csrf import get_token
+from django.middleware.csrf import CsrfViewMiddleware
 from django.utils.crypto import constant_time_compare
 
+from utils.sessions import GUEST_SESSION_KEY
+
+
+# Only `process_view` is used, which never calls the next handler
+_csrf_middleware = CsrfViewMiddleware(lambda request: None)
+
 
 def validate_csrf_token(request):
-    
-    context = {'message': '',  'error': '', 'is_valid': False}
-    
+    correct_token = request.session.get(GUEST_SESSION_KEY, {}).get("CSRF_TOKEN")
+    return _check_csrf_token(request, correct_token)
+
+
+async def avalidate_csrf_token(request):
+    """The async version of `validate_csrf_token`, which loads the guest session without blocking."""
+    correct_token = (await request.session.aget(GUEST_SESSION_KEY, {})).get("CSRF_TOKEN")
+    return _check_csrf_token(request, correct_token)
+
+
+def _check_csrf_token(request, correct_token):
+
+    context = {'message': '',  'error': '', 'is_valid': False, 'token': ''}
+
     client_request_token = request.META.get('HTTP_X_CSRFTOKEN') or request.POST.get('csrfmiddlewaretoken')
-    
+
     if not client_request_token:
         context['error']    = 'Missing CSRF Token'
         context['is_valid'] =  False
         return context
 
-    correct_token = request.session.get("guest_user", {}).get("CSRF_TOKEN")
+    # A guest session is only created on the first cart action, until then (and for pages rendered
+    # with `{% csrf_token %}`) the token is checked against the secret held in the CSRF cookie.
+    is_valid = ((correct_token and constant_time_compare(client_request_token, correct_token))
+                or _matches_csrf_cookie(request))
 
-    if not correct_token:  
-        correct_token = get_token(request)
-
-    if constant_time_compare(client_request_token, correct_token):
+    if is_valid:
         context["message"]  = "CSRF Token is valid"
         context["is_valid"] = True
+        context["token"]    = client_request_token
     else:
         context["message"]  = "CSRF Token is received invalid, please check your CSRF_TOKEN and then try again"
         context["error"]    = "The CSRF token is received is invalid"
-    
-    return context
\ No newline at end of file
+
+    return context
+
+
+def _matches_csrf_cookie(request) -> bool:
+    """
+    Returns True if the (masked or unmasked) CSRF token of the request matches the secret in the CSRF cookie.
+
+    The check is left to Django's `CsrfViewMiddleware.process_view`, which returns None when it accepts
+    the request and a 403 response when it rejects it. A request already accepted by the middleware
+    is not checked twice.
+    """
+    return _csrf_middleware.process_view(request, None, (), {}) is None